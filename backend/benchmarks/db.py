@@ -0,0 +1,18 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def scratch_database() -> Iterator[None]:
+    # отдельная test_-база: рабочие данные бенчмарки не трогают
+    if connection.vendor != "postgresql":
+        raise SystemExit("Бенчмарк рассчитан на PostgreSQL (settings.dev)")
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,127 @@
+"""Еженедельная сводка подписок на большом графе подписок.
+
+Засевает отдельную базу PostgreSQL пользователями, миллионом подписок
+и новыми публичными желаниями через generate_series, затем прогоняет
+send_follow_digests и печатает время, число писем, запросов к БД
+и пик памяти Python (tracemalloc) для разных размеров пачки.
+Письма только встают в очередь — сброс по SMTP здесь не меряется.
+
+    uv run --package yourmirror.backend -- python -m benchmarks.follow_digest
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.db import connection
+
+from profiles.models import FollowModel, ProfileModel
+from services.mail import MAIL_FLUSH_SCHEDULED_KEY
+from services.models import QueuedEmailModel
+from tasks.digest import send_follow_digests
+from wishitems.models import WishItemModel
+from yourmirror.celery import QueryCounter
+
+from .db import scratch_database
+
+
+def seed(users: int, follows: int, items: int) -> None:
+    profiles = ProfileModel._meta.db_table
+    wishitems = WishItemModel._meta.db_table
+    edges = FollowModel._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO auth_user (password, is_superuser, username, first_name,
+                last_name, email, is_staff, is_active, date_joined)
+            SELECT '!', false, 'bench_' || g, 'bench ' || g, '',
+                'bench_' || g || '@x.ru', false, true, now()
+            FROM generate_series(1, %s) g
+            """,
+            [users],
+        )
+        # профили создает post_save у User, но массовая вставка его обходит
+        cursor.execute(
+            f"""
+            INSERT INTO {profiles} (id, user_id, created_at, updated_at,
+                wishitems_count, wishitems_public_count, wishitems_reserved_count,
+                followers_count)
+            SELECT gen_random_uuid(), id, now(), now(), 0, 0, 0, 0 FROM auth_user
+            """
+        )
+        cursor.execute(
+            f"""
+            CREATE TEMP TABLE bench_profiles AS
+            SELECT id, row_number() OVER (ORDER BY user_id) AS n FROM {profiles}
+            """
+        )
+        # каждый подписан на follows профилей подряд, без подписки на себя
+        cursor.execute(
+            f"""
+            INSERT INTO {edges} (follower_id, following_id, created_at, updated_at)
+            SELECT follower.id, following.id, now(), now()
+            FROM bench_profiles follower
+            CROSS JOIN generate_series(1, %s) k
+            JOIN bench_profiles following
+                ON following.n = 1 + (follower.n + k * 7) %% %s
+            WHERE following.n <> follower.n
+            ON CONFLICT DO NOTHING
+            """,
+            [follows, users],
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {wishitems} (id, title, description, link, price,
+                price_currency, profile_id, is_private, picture_blurhash,
+                picture_variants, created_at, updated_at)
+            SELECT gen_random_uuid(), md5(g::text), '', '', '', '', owner.id,
+                random() < 0.2, '', '{{}}', now() - random() * interval '14 days',
+                now()
+            FROM generate_series(1, %s) g
+            JOIN bench_profiles owner ON owner.n = 1 + g %% %s
+            """,
+            [items, users],
+        )
+        cursor.execute("VACUUM ANALYZE")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--follows", type=int, default=20)
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[1000])
+    args = parser.parse_args()
+
+    with scratch_database():
+        started = time.perf_counter()
+        seed(args.users, args.follows, args.items)
+        edges = FollowModel.objects.count()
+        print(f"seed: {time.perf_counter() - started:.1f}s, {edges} follow edges")
+
+        for chunk_size in args.chunk_size:
+            ProfileModel.objects.update(follow_digest_at=None)
+            QueuedEmailModel.objects.all().delete()
+            # сброс очереди не планируем: брокера в бенчмарке нет
+            cache.set(MAIL_FLUSH_SCHEDULED_KEY, 1, timeout=None)
+
+            # счетчик, а не CaptureQueriesContext: тот хранит текст всех запросов
+            counter = QueryCounter()
+            tracemalloc.start()
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                sent = send_follow_digests(chunk_size=chunk_size)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(
+                f"chunk {chunk_size:5}: {elapsed:6.1f}s  emails {sent}"
+                f"  queries {counter.queries}  peak {peak / 2**20:.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Пропускная способность почты: соединение на письмо против пачки.
+
+Поднимает локальную заглушку SMTP-сервера с задержками: рукопожатие
+при подключении (SSL и приветствие сервера) и RTT на каждую команду.
+«По одному» — send_mail на каждое письмо, как раньше делали задачи;
+«пачкой» — очередь QueuedEmailModel и flush_mail_queue.
+
+    uv run --package yourmirror.backend -- python -m benchmarks.mail_throughput
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from django.core.mail import send_mail
+from django.test import override_settings
+
+from services.models import QueuedEmailModel
+from tasks.email import flush_mail_queue
+
+from .db import scratch_database
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    server: "SMTPStandIn"
+
+    def reply(self, line: bytes) -> None:
+        time.sleep(self.server.rtt)
+        self.wfile.write(line + b"\r\n")
+
+    def handle(self) -> None:
+        time.sleep(self.server.handshake)
+        self.server.connections += 1
+        self.reply(b"220 bench ESMTP")
+        in_data = False
+        for line in self.rfile:
+            if in_data:
+                if line == b".\r\n":
+                    in_data = False
+                    self.server.messages += 1
+                    self.reply(b"250 OK")
+                continue
+            command = line[:4].upper()
+            if command == b"DATA":
+                in_data = True
+                self.reply(b"354 End data with <CR><LF>.<CR><LF>")
+            elif command == b"QUIT":
+                self.reply(b"221 Bye")
+                return
+            else:
+                self.reply(b"250 OK")
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake: float, rtt: float) -> None:
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.handshake = handshake
+        self.rtt = rtt
+        self.connections = 0
+        self.messages = 0
+
+
+@contextmanager
+def smtp_stand_in(handshake: float, rtt: float) -> Iterator[SMTPStandIn]:
+    server = SMTPStandIn(handshake, rtt)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=server.server_address[1],
+            EMAIL_USE_SSL=False,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            DEFAULT_FROM_EMAIL="bench@x.ru",
+        ):
+            yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def per_message(count: int) -> None:
+    for n in range(count):
+        send_mail(f"Желание {n}", "body", "bench@x.ru", [f"user{n}@x.ru"])
+
+
+def batched(count: int) -> None:
+    QueuedEmailModel.objects.bulk_create(
+        QueuedEmailModel(
+            subject=f"Желание {n}",
+            body="body",
+            from_email="bench@x.ru",
+            to=[f"user{n}@x.ru"],
+        )
+        for n in range(count)
+    )
+    flush_mail_queue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=300)
+    # SSL-рукопожатие и приветствие до внешнего провайдера
+    parser.add_argument("--handshake-ms", type=float, default=60)
+    parser.add_argument("--rtt-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    with scratch_database():
+        for name, send in (("per-message", per_message), ("batched", batched)):
+            with smtp_stand_in(args.handshake_ms / 1000, args.rtt_ms / 1000) as server:
+                started = time.perf_counter()
+                send(args.messages)
+                elapsed = time.perf_counter() - started
+            assert server.messages == args.messages
+            print(
+                f"{name:12} {args.messages / elapsed:8.1f} msg/s"
+                f"  {elapsed:6.2f} s  connections {server.connections}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Рендер сетки вишлиста: ссылки на картинки по одной и пачкой.
+
+Собирает в памяти сетку из 500 желаний с вариантами в двух форматах
+и рендерит wishlist/items.html на MinioMediaStorage — с публичным бакетом
+и с подписанными ссылками. «По одной» повторяет старое поведение шаблона
+(storage.url на каждую ссылку), «пачкой» — attach_picture_urls. Сеть
+не нужна: MinIO-клиент только собирает и подписывает URL.
+
+    uv run --package yourmirror.backend -- python -m benchmarks.media_urls
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any, cast
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+from django.test import override_settings
+from minio_storage.storage import MinioStorage
+
+from wishitems.images import PICTURE_VARIANT_FORMATS, PICTURE_VARIANT_WIDTHS
+from wishitems.media import variant_name
+from wishitems.models import WishItemModel, attach_picture_urls
+
+
+STORAGE_SETTINGS: dict[str, Any] = {
+    "STORAGES": {
+        "default": {"BACKEND": "minio_storage.storage.MinioMediaStorage"},
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+        },
+    },
+    "MINIO_STORAGE_ENDPOINT": "minio.local:9000",
+    "MINIO_STORAGE_ACCESS_KEY": "access",
+    "MINIO_STORAGE_SECRET_KEY": "secret",
+    "MINIO_STORAGE_USE_HTTPS": False,
+    # с регионом клиент не ходит в MinIO за его определением
+    "MINIO_STORAGE_REGION": "us-east-1",
+    "MINIO_STORAGE_MEDIA_BUCKET_NAME": "media",
+    "MINIO_STORAGE_AUTO_CREATE_MEDIA_BUCKET": False,
+    "MINIO_STORAGE_ASSUME_MEDIA_BUCKET_EXISTS": True,
+    # LocMemCache по умолчанию держит 300 ключей и вытеснил бы подписи сетки;
+    # Redis добавит к «пачкой» один get_many на страницу
+    "CACHES": {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 100_000},
+        }
+    },
+}
+
+
+class Unbatched(dict[str, str]):
+    # старое поведение: каждая ссылка — отдельный вызов storage.url
+    def __contains__(self, name: object) -> bool:
+        return True
+
+    def __getitem__(self, name: str) -> str:
+        return default_storage.url(name)
+
+
+def grid(size: int) -> list[WishItemModel]:
+    items = []
+    for n in range(size):
+        picture = f"wishitems/picture/{uuid.uuid4().hex * 2}.jpg"
+        items.append(
+            WishItemModel(
+                id=uuid.uuid4(),
+                title=f"Желание {n}",
+                picture=picture,
+                picture_width=1280,
+                picture_height=960,
+                picture_blurhash="LCHC4Zv=n5%M*XI[xcNHn%X9r?bY",
+                picture_variants={
+                    fmt: {
+                        str(width): variant_name(picture, width, fmt)
+                        for width in PICTURE_VARIANT_WIDTHS
+                    }
+                    for fmt in PICTURE_VARIANT_FORMATS
+                },
+            )
+        )
+    return items
+
+
+def render(
+    items: list[WishItemModel], attach: Callable[[list[WishItemModel]], None]
+) -> float:
+    for item in items:
+        item.__dict__.pop("_picture_urls", None)
+    started = time.perf_counter()
+    attach(items)
+    render_to_string("wishlist/items.html", {"wishitems": items})
+    return (time.perf_counter() - started) * 1000
+
+
+def unbatched(items: list[WishItemModel]) -> None:
+    for item in items:
+        item._picture_urls = Unbatched()
+
+
+def measure(items: list[WishItemModel], repeat: int) -> dict[str, float]:
+    client = cast(MinioStorage, default_storage).client
+    presign = client.presigned_get_object
+    signed = 0
+
+    def counting_presign(*args: Any, **kwargs: Any) -> str:
+        nonlocal signed
+        signed += 1
+        return str(presign(*args, **kwargs))
+
+    client.presigned_get_object = counting_presign  # type: ignore[method-assign]
+    cache.clear()
+    cold = render(items, attach_picture_urls)
+    cold_signed = signed
+
+    results = {"batched cold": cold}
+    for name, attach in (("per-url", unbatched), ("batched", attach_picture_urls)):
+        signed = 0
+        timings = [render(items, attach) for _ in range(repeat)]
+        results[name] = statistics.median(timings)
+        results[f"{name} signed"] = signed / repeat
+    results["batched cold signed"] = cold_signed
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    items = grid(args.items)
+    urls = len(items[0].picture_names()) * len(items)
+    print(f"{args.items} items, {urls} urls per render")
+
+    for mode, presigned in (("public", False), ("presigned", True)):
+        with override_settings(
+            **STORAGE_SETTINGS, MINIO_STORAGE_MEDIA_USE_PRESIGNED=presigned
+        ):
+            result = measure(items, args.repeat)
+        print(f"\n{mode}")
+        for name in ("per-url", "batched", "batched cold"):
+            print(
+                f"  {name:13} p50 {result[name]:8.2f} ms"
+                f"  signed {result[f'{name} signed']:6.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Конкурентное резервирование: пропускная способность и число победителей.
+
+Потоки одновременно бронируют общий набор желаний. Для compare-and-set
+(WishItemModel.reserve) у каждого желания должен быть ровно один победитель;
+режим --legacy повторяет старый read-modify-save и показывает, сколько
+«победителей» он раздает на одно желание.
+
+    uv run --package yourmirror.backend -- python -m benchmarks.reservation_stress
+"""
+
+import argparse
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from profiles.models import ProfileModel
+from wishitems.models import WishItemModel
+
+from .db import scratch_database
+
+
+def legacy_reserve(item: WishItemModel, profile: ProfileModel) -> bool:
+    if item.reserved_id is not None:
+        return False
+    item.reserved = profile
+    item.reserved_at = timezone.now()
+    item.save()
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--attempts", type=int, default=100)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    with scratch_database():
+        owner = User.objects.create(username="owner").profile
+        reservers = [
+            User.objects.create(username=f"reserver_{n}").profile
+            for n in range(args.threads)
+        ]
+        item_ids = [
+            item.pk
+            for item in WishItemModel.objects.bulk_create(
+                WishItemModel(title=f"item {n}", profile=owner)
+                for n in range(args.items)
+            )
+        ]
+
+        barrier = threading.Barrier(args.threads)
+
+        def worker(profile: ProfileModel) -> list[uuid.UUID]:
+            rng = random.Random(profile.pk.int)
+            won = []
+            try:
+                barrier.wait()
+                for _ in range(args.attempts):
+                    item = WishItemModel.objects.get(pk=rng.choice(item_ids))
+                    if args.legacy:
+                        success = legacy_reserve(item, profile)
+                    else:
+                        success = item.reserve(profile)
+                    if success:
+                        won.append(item.pk)
+            finally:
+                connection.close()
+            return won
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            results = list(pool.map(worker, reservers))
+        elapsed = time.perf_counter() - started
+
+    winners = Counter(pk for won in results for pk in won)
+    attempts = args.threads * args.attempts
+    contested = sum(1 for count in winners.values() if count > 1)
+
+    print(f"mode: {'legacy read-modify-save' if args.legacy else 'compare-and-set'}")
+    print(f"attempts: {attempts} in {elapsed:.2f}s ({attempts / elapsed:.0f}/s)")
+    print(f"reserved items: {len(winners)} of {args.items}")
+    print(f"items with more than one winner: {contested}")
+    if not args.legacy and contested:
+        raise SystemExit("compare-and-set выдал несколько победителей")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Планы и задержки запросов вишлиста с новыми индексами и без них.
+
+Поднимает отдельную тестовую базу PostgreSQL, засевает ее миллионами строк
+через generate_series и для каждого запроса печатает узлы плана
+из EXPLAIN ANALYZE и p50/p95 по повторным прогонам.
+
+    uv run --package yourmirror.backend -- python -m benchmarks.wishlist_indexes
+"""
+
+import argparse
+import json
+import statistics
+import time
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from profiles.models import ProfileModel
+from services.models import RegistrationTokenModel
+from wishitems.models import WishItemModel
+from wishitems.pagination import keyset_page
+
+from .db import scratch_database
+
+
+NEW_INDEXES = [
+    *(index.name for index in WishItemModel._meta.indexes),
+    *(index.name for index in RegistrationTokenModel._meta.indexes),
+]
+
+
+def seed(users: int, items: int, heavy_items: int, tokens: int) -> None:
+    profiles = ProfileModel._meta.db_table
+    wishitems = WishItemModel._meta.db_table
+    regtokens = RegistrationTokenModel._meta.db_table
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO auth_user (password, is_superuser, username, first_name,
+                last_name, email, is_staff, is_active, date_joined)
+            SELECT '!', false, 'bench_' || g, 'bench', '', 'bench_' || g || '@x.ru',
+                false, true, now()
+            FROM generate_series(1, %s) g
+            """,
+            [users],
+        )
+        # профили создает post_save у User, но массовая вставка его обходит
+        cursor.execute(
+            f"""
+            INSERT INTO {profiles} (id, user_id, created_at, updated_at,
+                wishitems_count, wishitems_public_count, wishitems_reserved_count,
+                followers_count)
+            SELECT gen_random_uuid(), id, now(), now(), 0, 0, 0, 0 FROM auth_user
+            """
+        )
+        cursor.execute(
+            f"""
+            CREATE TEMP TABLE bench_profiles AS
+            SELECT id, row_number() OVER (ORDER BY user_id) AS n FROM {profiles}
+            """
+        )
+        # один «тяжелый» вишлист + равномерный хвост по остальным
+        cursor.execute(
+            f"""
+            INSERT INTO {wishitems} (id, title, description, link, price,
+                price_currency, profile_id, reserved_id, is_private,
+                picture_blurhash, picture_variants, created_at, updated_at)
+            SELECT gen_random_uuid(), md5(g::text), '', '', '', '', owner.id,
+                CASE WHEN random() < 0.1 THEN reserver.id END, random() < 0.2,
+                '', '{{}}', now(), now()
+            FROM generate_series(1, %s) g
+            JOIN bench_profiles owner
+                ON owner.n = CASE WHEN g <= %s THEN 1 ELSE 2 + g %% (%s - 1) END
+            JOIN bench_profiles reserver ON reserver.n = 1 + (g * 7) %% %s
+            """,
+            [items + heavy_items, heavy_items, users, users],
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {regtokens} (email, first_name, password_hash, token,
+                expires_at, created_at)
+            SELECT 'token_' || g || '@x.ru', '', '', gen_random_uuid(),
+                now() + (random() * 48 - 24) * interval '1 hour', now()
+            FROM generate_series(1, %s) g
+            """,
+            [tokens],
+        )
+        cursor.execute("VACUUM ANALYZE")
+
+
+def heavy_profile_id() -> Any:
+    # в seed тяжелый вишлист достается профилю с n = 1, то есть с минимальным user_id
+    return ProfileModel.objects.order_by("user_id").values_list("id", flat=True).first()
+
+
+def workload(profile_id: Any) -> dict[str, Callable[[], Any]]:
+    owner = WishItemModel.objects.filter(profile_id=profile_id)
+    public = owner.filter(is_private=False)
+    _, deep_cursor = keyset_page(owner, size=owner.count() // 2)
+
+    return {
+        "owner first page": lambda: keyset_page(owner),
+        "public first page": lambda: keyset_page(public),
+        "owner deep page": lambda: keyset_page(owner, deep_cursor),
+        "reserved count": lambda: owner.filter(reserved__isnull=False).count(),
+        "expired tokens batch": lambda: list(
+            RegistrationTokenModel.objects.filter(expires_at__lt=timezone.now())
+            .order_by("expires_at")
+            .values_list("id", flat=True)[:1000]
+        ),
+    }
+
+
+def plan_nodes(plan: dict[str, Any]) -> Iterator[str]:
+    node = plan["Node Type"]
+    if "Index Name" in plan:
+        node += f" ({plan['Index Name']})"
+    yield node
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def measure(name: str, query: Callable[[], Any], repeat: int) -> dict[str, Any]:
+    with CaptureQueriesContext(connection) as captured:
+        query()
+    sql = captured.captured_queries[-1]["sql"]
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+        explain = cursor.fetchone()[0]
+    if isinstance(explain, str):
+        explain = json.loads(explain)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        query()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "name": name,
+        "plan": " > ".join(plan_nodes(explain[0]["Plan"])),
+        "p50": statistics.median(timings),
+        "p95": statistics.quantiles(timings, n=20)[-1],
+    }
+
+
+def run(queries: dict[str, Callable[[], Any]], repeat: int) -> list[dict[str, Any]]:
+    return [measure(name, query, repeat) for name, query in queries.items()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--items", type=int, default=2_000_000)
+    parser.add_argument("--heavy-items", type=int, default=50_000)
+    parser.add_argument("--tokens", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with scratch_database():
+        started = time.perf_counter()
+        seed(args.users, args.items, args.heavy_items, args.tokens)
+        print(f"seed: {time.perf_counter() - started:.1f}s")
+
+        queries = workload(heavy_profile_id())
+        after = run(queries, args.repeat)
+
+        with connection.cursor() as cursor:
+            for index in NEW_INDEXES:
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(index)}")
+            # до новых индексов у profile был неявный индекс FK
+            table = connection.ops.quote_name(WishItemModel._meta.db_table)
+            cursor.execute(
+                f"CREATE INDEX wishitem_profile_fk_idx ON {table} (profile_id)"
+            )
+            cursor.execute("ANALYZE")
+        before = run(queries, args.repeat)
+
+    for old, new in zip(before, after):
+        print(f"\n{old['name']}")
+        print(f"  before: p50 {old['p50']:8.2f} ms  p95 {old['p95']:8.2f} ms")
+        print(f"          {old['plan']}")
+        print(f"  after:  p50 {new['p50']:8.2f} ms  p95 {new['p95']:8.2f} ms")
+        print(f"          {new['plan']}")
+
+
+if __name__ == "__main__":
+    main()
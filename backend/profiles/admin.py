@@ -3,4 +3,21 @@ from django.contrib import admin
 from .models import FollowModel, ProfileModel
 
 admin.site.register(FollowModel)
-admin.site.register(ProfileModel)
+
+
+@admin.register(ProfileModel)
+class ProfileAdmin(admin.ModelAdmin):  # type: ignore[type-arg]
+    list_display = [
+        "__str__",
+        "wishitems_count",
+        "wishitems_public_count",
+        "wishitems_reserved_count",
+        "followers_count",
+    ]
+    list_select_related = ["user"]
+    readonly_fields = [
+        "wishitems_count",
+        "wishitems_public_count",
+        "wishitems_reserved_count",
+        "followers_count",
+    ]
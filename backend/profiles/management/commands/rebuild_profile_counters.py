@@ -0,0 +1,44 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+
+
+def _count(model: type[models.Model], fk: str, **filters: Any) -> Coalesce:
+    counts = (
+        model._default_manager.filter(**{fk: models.OuterRef("pk")}, **filters)
+        .order_by()
+        .values(fk)
+        .annotate(count=models.Count("pk"))
+        .values("count")
+    )
+    return Coalesce(models.Subquery(counts), 0)
+
+
+def rebuild_counters(
+    profile_model: type[models.Model],
+    wishitem_model: type[models.Model],
+    follow_model: type[models.Model],
+) -> int:
+    # модели передаются снаружи, чтобы функцию можно было звать из миграций
+    return profile_model._default_manager.update(
+        wishitems_count=_count(wishitem_model, "profile"),
+        wishitems_public_count=_count(wishitem_model, "profile", is_private=False),
+        wishitems_reserved_count=_count(
+            wishitem_model, "profile", reserved__isnull=False
+        ),
+        followers_count=_count(follow_model, "following"),
+    )
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает денормализованные счетчики профилей одним UPDATE"
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        from profiles.models import FollowModel, ProfileModel
+        from wishitems.models import WishItemModel
+
+        with transaction.atomic():
+            updated = rebuild_counters(ProfileModel, WishItemModel, FollowModel)
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано профилей: {updated}"))
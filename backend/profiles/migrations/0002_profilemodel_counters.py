@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+from profiles.management.commands.rebuild_profile_counters import rebuild_counters
+
+
+def fill_counters(apps, schema_editor):  # type: ignore[no-untyped-def]
+    rebuild_counters(
+        apps.get_model("profiles", "ProfileModel"),
+        apps.get_model("wishitems", "WishItemModel"),
+        apps.get_model("profiles", "FollowModel"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("profiles", "0001_initial"),
+        ("wishitems", "0003_alter_wishitemmodel_reserved_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profilemodel",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profilemodel",
+            name="wishitems_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profilemodel",
+            name="wishitems_public_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profilemodel",
+            name="wishitems_reserved_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
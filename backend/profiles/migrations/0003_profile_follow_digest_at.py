@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("profiles", "0002_profilemodel_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profilemodel",
+            name="follow_digest_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
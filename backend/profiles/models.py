@@ -6,19 +6,32 @@ import uuid
 
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 if TYPE_CHECKING:
     from wishitems.models import WishItemModel
 
 
+FOLLOWING_FEED_SIZE: int = 4
+
+
 class ProfileModel(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, unique=True)
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
 
     telegram_id = models.CharField(verbose_name="telegram ID", null=True, blank=True)
 
+    # денормализованные счетчики, меняются только через adjust_counters()
+    # и пересобираются командой rebuild_profile_counters
+    wishitems_count = models.PositiveIntegerField(default=0)
+    wishitems_public_count = models.PositiveIntegerField(default=0)
+    wishitems_reserved_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+
+    # до этого момента желания подписок уже попали в еженедельную сводку
+    follow_digest_at = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -32,6 +45,22 @@ class ProfileModel(models.Model):
             "user__first_name"
         )  # pyright: ignore[reportAttributeAccessIssue]
 
+    @property
+    def following_feed(self) -> models.QuerySet["ProfileModel"]:
+        # два запроса на любое число подписок: профили с user и один prefetch,
+        # который Django режет оконной функцией по profile_id
+        from wishitems.models import WishItemModel
+
+        return self.following.select_related("user").prefetch_related(
+            models.Prefetch(
+                "wishitems",
+                queryset=WishItemModel.objects.filter(is_private=False)[
+                    :FOLLOWING_FEED_SIZE
+                ],
+                to_attr="feed_items",
+            )
+        )
+
     def is_following(self, other_profile: ProfileModel) -> bool:
         return FollowModel.objects.filter(  # pyright: ignore[reportAttributeAccessIssue]
             follower=self, following=other_profile
@@ -45,6 +74,14 @@ class ProfileModel(models.Model):
         return f"<ProfileModel {self.user.username} / {self.user.first_name}>"
 
 
+def adjust_counters(profile_id: uuid.UUID, **deltas: int) -> None:
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if deltas:
+        ProfileModel.objects.filter(pk=profile_id).update(
+            **{field: models.F(field) + delta for field, delta in deltas.items()}
+        )
+
+
 @receiver(post_save, sender=User)
 def user_post_save(sender: User, instance: User, created: bool, **kwargs: Any) -> None:
     if created:
@@ -77,3 +114,18 @@ class FollowModel(models.Model):
 
     def __str__(self) -> str:
         return f"<FollowModel {self.follower.user.username} → {self.following.user.username}>"  # pyright: ignore[reportAttributeAccessIssue]
+
+
+@receiver(post_save, sender=FollowModel)
+def follow_post_save(
+    sender: FollowModel, instance: FollowModel, created: bool, **kwargs: Any
+) -> None:
+    if created:
+        adjust_counters(instance.following_id, followers_count=1)
+
+
+@receiver(post_delete, sender=FollowModel)
+def follow_post_delete(
+    sender: FollowModel, instance: FollowModel, **kwargs: Any
+) -> None:
+    adjust_counters(instance.following_id, followers_count=-1)
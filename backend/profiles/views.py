@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Any, cast
 
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.decorators import login_required
@@ -11,6 +11,7 @@ from django.shortcuts import get_object_or_404, render, redirect
 from django.views.generic import ListView
 
 from profiles.models import FollowModel, ProfileModel
+from wishitems.models import attach_picture_urls
 
 from .forms import UserSettingsForm
 
@@ -24,7 +25,15 @@ class FollowingView(LoginRequiredMixin, ListView):  # type: ignore[type-arg]
 
     def get_queryset(self) -> QuerySet[ProfileModel]:
         user = cast(User, self.request.user)
-        return user.profile.following
+        return user.profile.following_feed
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        # ссылки на картинки всех лент одним вызовом
+        attach_picture_urls(
+            item for profile in context["profiles"] for item in profile.feed_items
+        )
+        return context
 
 
 class FollowCreateView(LoginRequiredMixin, ListView):  # type: ignore[type-arg]
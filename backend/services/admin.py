@@ -1,5 +1,13 @@
 from django.contrib import admin
 
-from .models import RegistrationTokenModel
+from .models import (
+    OutboxTaskModel,
+    QueuedEmailModel,
+    RegistrationTokenModel,
+    ReservationNoticeModel,
+)
 
 admin.site.register(RegistrationTokenModel)
+admin.site.register(QueuedEmailModel)
+admin.site.register(OutboxTaskModel)
+admin.site.register(ReservationNoticeModel)
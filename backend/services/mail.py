@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import QueuedEmailModel, ReservationNoticeModel
+
+
+# окно, за которое письма копятся перед отправкой одной пачкой
+MAIL_BATCH_WINDOW: int = 2
+# почтовые серверы обычно рвут соединение после ~100 писем
+MAIL_BATCH_SIZE: int = 100
+# после стольких отказов сервера письмо выбрасывается
+MAIL_MAX_ATTEMPTS: int = 5
+# пачка, которую отправщик не досылал столько секунд, снова ничья:
+# воркер умер посреди SMTP-сессии
+MAIL_CLAIM_TIMEOUT: int = 10 * 60
+
+# брони одного получателя за это окно сливаются в одно письмо
+RESERVATION_DIGEST_WINDOW: int = 60
+
+MAIL_FLUSH_SCHEDULED_KEY = "mail:flush:scheduled"
+
+
+def email_row(
+    subject: str, body: str, recipient_list: list[str], html_message: str = ""
+) -> QueuedEmailModel:
+    return QueuedEmailModel(
+        subject=subject,
+        body=body,
+        html_body=html_message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=recipient_list,
+    )
+
+
+def queue_email(
+    subject: str, body: str, recipient_list: list[str], html_message: str = ""
+) -> None:
+    email_row(subject, body, recipient_list, html_message).save()
+    # сброс планируется после коммита: отправщик должен увидеть строку,
+    # даже если транзакция вызывающего затянется дольше окна пачки
+    transaction.on_commit(schedule_mail_flush)
+
+
+def queue_emails(emails: list[QueuedEmailModel]) -> None:
+    if emails:
+        QueuedEmailModel.objects.bulk_create(emails, batch_size=MAIL_BATCH_SIZE)
+        transaction.on_commit(schedule_mail_flush)
+
+
+def schedule_mail_flush() -> None:
+    # один отложенный сброс на окно, сколько бы писем ни пришло
+    if cache.add(MAIL_FLUSH_SCHEDULED_KEY, 1, timeout=MAIL_BATCH_WINDOW * 10):
+        from tasks.email import flush_mail_queue
+
+        flush_mail_queue.apply_async(countdown=MAIL_BATCH_WINDOW)
+
+
+def reservation_digest_key(email: str) -> str:
+    return f"mail:digest:{email.lower()}"
+
+
+def queue_reservation_notice(email: str, payload: dict[str, str]) -> None:
+    ReservationNoticeModel.objects.create(email=email, payload=payload)
+    # первая бронь открывает окно, остальные в него попадают
+    if cache.add(
+        reservation_digest_key(email), 1, timeout=RESERVATION_DIGEST_WINDOW * 10
+    ):
+        from tasks.email import send_reservation_digest
+
+        send_reservation_digest.apply_async(
+            (email,), countdown=RESERVATION_DIGEST_WINDOW
+        )
@@ -0,0 +1,29 @@
+from typing import Any
+
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import close_old_connections
+
+from services.outbox import OUTBOX_POLL_INTERVAL, relay_outbox
+
+
+class Command(BaseCommand):
+    help = "Переносит задачи из таблицы outbox в брокер Celery"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--once", action="store_true", help="Разобрать очередь и выйти"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["once"]:
+            relayed = relay_outbox()
+            self.stdout.write(self.style.SUCCESS(f"Отправлено задач: {relayed}"))
+            return
+
+        while True:
+            # процесс живет долго: соединение с БД могло протухнуть
+            close_old_connections()
+            if not relay_outbox():
+                time.sleep(OUTBOX_POLL_INTERVAL)
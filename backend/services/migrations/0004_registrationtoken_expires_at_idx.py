@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("services", "0003_registrationtokenmodel_wishitem"),
+        ("wishitems", "0004_wishitem_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="registrationtokenmodel",
+            index=models.Index(fields=["expires_at"], name="regtoken_expires_at_idx"),
+        ),
+    ]
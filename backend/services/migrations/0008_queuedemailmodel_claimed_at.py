@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("services", "0007_reservationnoticemodel"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="queuedemailmodel",
+            name="claimed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
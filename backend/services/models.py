@@ -2,6 +2,9 @@ from typing import Any
 
 import uuid
 
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends.base import BaseEmailBackend
 from django.db import models
 from django.utils import timezone
 from datetime import timedelta
@@ -42,3 +45,54 @@ class RegistrationTokenModel(models.Model):
     class Meta:
         verbose_name = "Registration Token"
         verbose_name_plural = "Registration Tokens"
+        indexes = [
+            models.Index(fields=["expires_at"], name="regtoken_expires_at_idx"),
+        ]
+
+
+class QueuedEmailModel(models.Model):
+    # письма ждут здесь пачкой отправки через одно SMTP-соединение,
+    # см. services.mail.queue_email и tasks.email.flush_mail_queue
+    subject = models.TextField()
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # отправщик забрал письмо; после MAIL_CLAIM_TIMEOUT его заберет следующий
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def message(self, connection: BaseEmailBackend) -> EmailMultiAlternatives:
+        message = EmailMultiAlternatives(
+            self.subject, self.body, self.from_email, self.to, connection=connection
+        )
+        if self.html_body:
+            message.attach_alternative(self.html_body, "text/html")
+        return message
+
+    def __str__(self) -> str:
+        return f"<QueuedEmailModel {self.subject} -> {', '.join(self.to)}>"
+
+
+class ReservationNoticeModel(models.Model):
+    # брони ждут здесь окна сводки: серия броней уходит одним письмом,
+    # см. tasks.email.send_reservation_digest
+    email = models.EmailField(db_index=True)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"<ReservationNoticeModel {self.email}>"
+
+
+class OutboxTaskModel(models.Model):
+    # задачи Celery, поставленные из запросов: строка коммитится вместе
+    # с данными запроса, в брокер ее переносит services.outbox.relay_outbox
+    task = models.CharField(max_length=255)
+    args = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"<OutboxTaskModel {self.task}>"
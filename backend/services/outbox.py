@@ -0,0 +1,49 @@
+from typing import Any
+
+from celery import Task, current_app
+
+from django.db import transaction
+
+from .models import OutboxTaskModel
+
+
+OUTBOX_BATCH_SIZE: int = 500
+# пауза релея, когда очередь пуста
+OUTBOX_POLL_INTERVAL: float = 0.5
+
+
+def enqueue(task: Task, *args: Any, **kwargs: Any) -> None:
+    # вместо task.delay(): запрос не ждет брокера, а задача не уйдет,
+    # если транзакция вызывающего откатится
+    if task.app.conf.task_always_eager:
+        # без брокера задача выполняется сразу, как и .delay()
+        task.delay(*args, **kwargs)
+        return
+    OutboxTaskModel.objects.create(task=task.name, args=list(args), kwargs=kwargs)
+
+
+def relay_outbox() -> int:
+    relayed = 0
+    while True:
+        with transaction.atomic():
+            # skip_locked: несколько релеев разбирают разные пачки
+            rows = list(
+                OutboxTaskModel.objects.select_for_update(skip_locked=True).order_by(
+                    "id"
+                )[:OUTBOX_BATCH_SIZE]
+            )
+            if not rows:
+                return relayed
+
+            # вся пачка уходит через одно соединение с брокером; если коммит
+            # ниже упадет, задачи отправятся повторно — они должны это терпеть
+            with current_app.producer_or_acquire() as producer:
+                for row in rows:
+                    current_app.send_task(
+                        row.task, args=row.args, kwargs=row.kwargs, producer=producer
+                    )
+            OutboxTaskModel.objects.filter(id__in=[row.id for row in rows]).delete()
+        relayed += len(rows)
+
+        if len(rows) < OUTBOX_BATCH_SIZE:
+            return relayed
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import timedelta
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, cast
 
 import uuid
 
@@ -9,18 +9,26 @@ from django.contrib.auth import login
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 from django.contrib.auth.views import LoginView
+from django.db import transaction
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render, redirect
 from django.utils import timezone
 
 from services.models import RegistrationTokenModel
-from tasks.email import send_confirmation_email, send_reservation_email
+from services.outbox import enqueue
+from tasks.email import (
+    reservation_email_payload,
+    send_confirmation_email,
+    send_reservation_email,
+)
 
 from .forms import EmailRegistrationForm
 
 if TYPE_CHECKING:
     from django.contrib.auth.forms import AuthenticationForm
 
+    from wishitems.models import WishItemModel
+
 
 class CustomLoginView(LoginView):
     redirect_authenticated_user = True
@@ -42,6 +50,7 @@ class CustomLoginView(LoginView):
         return super().form_valid(form)
 
 
+@transaction.atomic
 def register(request: HttpRequest) -> HttpResponse:
     if request.method == "POST":
         form = EmailRegistrationForm(request.POST)
@@ -88,7 +97,7 @@ def register(request: HttpRequest) -> HttpResponse:
                 confirmation_url = request.build_absolute_uri(
                     f"/auth/confirm/{registration_token.token}/"
                 )
-                send_confirmation_email.delay(email, confirmation_url)
+                enqueue(send_confirmation_email, email, confirmation_url)
                 return render(request, "registration/email_sent.html")
     else:
         form = EmailRegistrationForm()
@@ -127,6 +136,7 @@ def confirm_email(request: HttpRequest, token: uuid.UUID) -> HttpResponse:
         )
 
 
+@transaction.atomic
 def confirm_first_reservation_email(request: HttpRequest, token: str) -> HttpResponse:
     try:
         registration_token = RegistrationTokenModel.objects.get(token=token)
@@ -138,39 +148,41 @@ def confirm_first_reservation_email(request: HttpRequest, token: str) -> HttpRes
             )
 
         # for mypy [union-attr], если wishitem нет, то инстанс удалится из-за каскада
-        wishitem = registration_token.wishitem
-        if wishitem.reserved:  # type: ignore[union-attr]
+        wishitem = cast("WishItemModel", registration_token.wishitem)
+        if wishitem.reserved_id:
             return render(
                 request,
                 "registration/confirmation_failed.html",
                 {"error": "кто-то уже зарезервировал это желание"},
             )
-        else:
-            user, created = User.objects.get_or_create(
-                email=registration_token.email,
-                defaults={
-                    "username": registration_token.email,
-                },
-            )
 
-            wishitem.reserved = user.profile  # type: ignore[union-attr]
-            wishitem.save()  # type: ignore[union-attr]
+        user, created = User.objects.get_or_create(
+            email=registration_token.email,
+            defaults={
+                "username": registration_token.email,
+            },
+        )
+        if created:
+            user.set_unusable_password()
+            user.save()
+            registration_token.delete()
 
-            # Отправка письма
-            send_reservation_email.delay(
-                registration_token.email,
-                registration_token.wishitem.id,  # type: ignore[union-attr]
+        # проверка выше только отсекает очевидное, гонку решает reserve()
+        if not wishitem.reserve(user.profile):
+            return render(
+                request,
+                "registration/confirmation_failed.html",
+                {"error": "кто-то уже зарезервировал это желание"},
             )
 
-            if created:
-                user.set_unusable_password()
-                user.save()
-                registration_token.delete()
+        # Отправка письма
+        enqueue(
+            send_reservation_email,
+            registration_token.email,
+            reservation_email_payload(wishitem.id),
+        )
 
-            return redirect(
-                "wishitem_detail",
-                wishitem_id=registration_token.wishitem.id,  # type: ignore[union-attr]
-            )
+        return redirect("wishitem_detail", wishitem_id=wishitem.id)
     except RegistrationTokenModel.DoesNotExist:
         return render(
             request,
@@ -6,11 +6,67 @@ document.addEventListener("DOMContentLoaded", function () {
     const borderSign = document.getElementById("border-sign");
     const clearPreviewButton = document.getElementById("clear-preview-button");
 
-    if (!dropZone || !fileInput || !preview || !plusSign || !borderSign || !clearPreviewButton) {
+    const form = dropZone && dropZone.closest("form");
+    const uploadInput = document.getElementById("id_picture_upload");
+
+    if (!dropZone || !fileInput || !preview || !plusSign || !borderSign || !clearPreviewButton || !form || !uploadInput) {
         console.error("Missing elements");
         return;
     }
 
+    let pendingUpload = null;
+    let uploadAttempt = 0;
+
+    // Прямая загрузка в MinIO: Django получает только токен файла.
+    // Если сервер ее не поддерживает, файл уйдет вместе с формой, как раньше
+    async function uploadDirect(file, attempt) {
+        const csrfToken = form.querySelector('input[name="csrfmiddlewaretoken"]').value;
+        const request = new FormData();
+        request.append("content_type", file.type);
+        const response = await fetch(form.dataset.uploadUrl, {
+            method: "POST",
+            body: request,
+            headers: { "X-CSRFToken": csrfToken },
+        });
+        if (!response.ok) {
+            return;
+        }
+
+        const upload = await response.json();
+        const data = new FormData();
+        Object.entries(upload.fields).forEach(([name, value]) => data.append(name, value));
+        // S3 требует, чтобы файл был последним полем формы
+        data.append("file", file);
+        const stored = await fetch(upload.url, { method: "POST", body: data });
+        if (!stored.ok || attempt !== uploadAttempt) {
+            return;
+        }
+
+        uploadInput.value = upload.token;
+        fileInput.value = "";
+    }
+
+    function startUpload(file) {
+        const attempt = ++uploadAttempt;
+        uploadInput.value = "";
+        pendingUpload = uploadDirect(file, attempt)
+            .catch((e) => console.error("Direct upload failed:", e))
+            .finally(() => {
+                if (attempt === uploadAttempt) {
+                    pendingUpload = null;
+                }
+            });
+    }
+
+    form.addEventListener("submit", async function (e) {
+        if (!pendingUpload) {
+            return;
+        }
+        e.preventDefault();
+        await pendingUpload;
+        form.submit();
+    });
+
     function updatePreview(file) {
         const reader = new FileReader();
         reader.onload = function (e) {
@@ -24,6 +80,7 @@ document.addEventListener("DOMContentLoaded", function () {
             console.error("FileReader error:", e);
         };
         reader.readAsDataURL(file);
+        startUpload(file);
         const clearCheckbox = document.querySelector('input[name="picture-clear"]');
         if (clearCheckbox) {
             clearCheckbox.checked = false;
@@ -37,6 +94,9 @@ document.addEventListener("DOMContentLoaded", function () {
         plusSign.classList.remove("hidden");
         clearPreviewButton.classList.add("hidden");
         fileInput.value = "";
+        uploadAttempt++;
+        pendingUpload = null;
+        uploadInput.value = "";
         const clearCheckbox = document.querySelector('input[name="picture-clear"]');
         if (clearCheckbox) {
             clearCheckbox.checked = true;
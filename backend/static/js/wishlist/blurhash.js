@@ -0,0 +1,86 @@
+// Пока грузится картинка, карточка показывает размытое превью из blurhash.
+// Декодер по https://github.com/woltapp/blurhash/blob/master/Algorithm.md
+const BLURHASH_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~';
+const BLURHASH_SIZE = 32;
+
+const decode83 = (str) => [...str].reduce((value, char) => value * 83 + BLURHASH_CHARS.indexOf(char), 0);
+
+const toLinear = (value) => {
+    const v = value / 255;
+    return v <= 0.04045 ? v / 12.92 : Math.pow((v + 0.055) / 1.055, 2.4);
+};
+
+const toSrgb = (value) => {
+    const v = Math.max(0, Math.min(1, value));
+    return v <= 0.0031308 ? Math.round(v * 12.92 * 255) : Math.round((1.055 * Math.pow(v, 1 / 2.4) - 0.055) * 255);
+};
+
+const signPow = (value, exp) => Math.sign(value) * Math.pow(Math.abs(value), exp);
+
+function decodeBlurhash(hash, width, height) {
+    const sizeFlag = decode83(hash[0]);
+    const numX = (sizeFlag % 9) + 1;
+    const numY = Math.floor(sizeFlag / 9) + 1;
+    const maxValue = (decode83(hash[1]) + 1) / 166;
+
+    const colors = [];
+    const dc = decode83(hash.substring(2, 6));
+    colors.push([toLinear(dc >> 16), toLinear((dc >> 8) & 255), toLinear(dc & 255)]);
+    for (let i = 1; i < numX * numY; i++) {
+        const ac = decode83(hash.substring(4 + i * 2, 6 + i * 2));
+        colors.push([Math.floor(ac / 361), Math.floor(ac / 19) % 19, ac % 19]
+            .map((q) => signPow((q - 9) / 9, 2) * maxValue));
+    }
+
+    const pixels = new Uint8ClampedArray(width * height * 4);
+    for (let y = 0; y < height; y++) {
+        for (let x = 0; x < width; x++) {
+            const rgb = [0, 0, 0];
+            for (let j = 0; j < numY; j++) {
+                for (let i = 0; i < numX; i++) {
+                    const basis = Math.cos((Math.PI * x * i) / width) * Math.cos((Math.PI * y * j) / height);
+                    const color = colors[i + j * numX];
+                    rgb[0] += color[0] * basis;
+                    rgb[1] += color[1] * basis;
+                    rgb[2] += color[2] * basis;
+                }
+            }
+            const offset = 4 * (x + y * width);
+            pixels.set([toSrgb(rgb[0]), toSrgb(rgb[1]), toSrgb(rgb[2]), 255], offset);
+        }
+    }
+    return pixels;
+}
+
+function paintBlurhash(element) {
+    const canvas = document.createElement('canvas');
+    canvas.width = canvas.height = BLURHASH_SIZE;
+    const context = canvas.getContext('2d');
+    const image = context.createImageData(BLURHASH_SIZE, BLURHASH_SIZE);
+    image.data.set(decodeBlurhash(element.dataset.blurhash, BLURHASH_SIZE, BLURHASH_SIZE));
+    context.putImageData(image, 0, 0);
+
+    element.style.backgroundImage = `url(${canvas.toDataURL()})`;
+    delete element.dataset.blurhash;
+
+    // после загрузки превью больше не нужно: у object-contain видны поля
+    const img = element.querySelector('img');
+    const clear = () => { element.style.backgroundImage = ''; };
+    if (img && img.complete) {
+        clear();
+    } else if (img) {
+        img.addEventListener('load', clear, { once: true });
+    }
+}
+
+const paintAll = (root) => root.querySelectorAll('[data-blurhash]').forEach(paintBlurhash);
+
+paintAll(document);
+// бесконечная прокрутка дописывает карточки в сетку
+new MutationObserver((mutations) => {
+    mutations.forEach((mutation) => mutation.addedNodes.forEach((node) => {
+        if (node.nodeType === Node.ELEMENT_NODE) {
+            paintAll(node);
+        }
+    }));
+}).observe(document.body, { childList: true, subtree: true });
@@ -0,0 +1,29 @@
+const nextPage = document.getElementById('wishlist-next-page');
+const wishlistGrid = document.getElementById('wishlist-grid');
+const addItemButton = document.getElementById('add-item-button');
+
+let nextUrl = nextPage.dataset.nextUrl;
+let loading = false;
+
+const observer = new IntersectionObserver(async (entries) => {
+    if (!entries[0].isIntersecting || loading || !nextUrl) {
+        return;
+    }
+    loading = true;
+
+    const response = await fetch(nextUrl);
+    if (response.ok) {
+        const page = document.createElement('template');
+        page.innerHTML = await response.text();
+        wishlistGrid.insertBefore(page.content, addItemButton);
+        nextUrl = response.headers.get('X-Next-Page');
+    }
+
+    loading = false;
+    if (!nextUrl) {
+        observer.disconnect();
+        nextPage.remove();
+    }
+}, { rootMargin: '500px' });
+
+observer.observe(nextPage);
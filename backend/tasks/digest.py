@@ -0,0 +1,135 @@
+from collections import defaultdict
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from typing import Any
+
+import itertools
+import uuid
+
+from celery import shared_task
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, RowNumber
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from profiles.models import FollowModel, ProfileModel
+from services.mail import email_row, queue_emails
+from services.models import QueuedEmailModel
+from wishitems.models import WishItemModel
+
+
+FOLLOW_DIGEST_PERIOD: timedelta = timedelta(days=7)
+# подписчиков за проход: в памяти только их желания и письма
+FOLLOW_DIGEST_CHUNK_SIZE: int = 1000
+# из большого вишлиста в письмо попадают только самые новые
+FOLLOW_DIGEST_ITEMS_PER_PROFILE: int = 5
+
+
+def new_followed_items(
+    follower_ids: list[uuid.UUID], until: datetime
+) -> dict[uuid.UUID, list[dict[str, Any]]]:
+    # один запрос на пачку подписчиков: новые публичные желания всех, на кого
+    # они подписаны, с момента их прошлой сводки
+    since = Coalesce(
+        models.F("profile__following_profiles__follower__follow_digest_at"),
+        models.Value(until - FOLLOW_DIGEST_PERIOD),
+    )
+    rows = (
+        WishItemModel.objects.filter(
+            profile__following_profiles__follower_id__in=follower_ids,
+            is_private=False,
+            created_at__gt=since,
+            created_at__lte=until,
+        )
+        .annotate(
+            follower_id=models.F("profile__following_profiles__follower_id"),
+            rank=models.Window(
+                RowNumber(),
+                partition_by=[models.F("follower_id"), models.F("profile_id")],
+                order_by=models.F("created_at").desc(),
+            ),
+        )
+        .filter(rank__lte=FOLLOW_DIGEST_ITEMS_PER_PROFILE)
+        .order_by("follower_id", "profile__user__first_name", "profile_id", "rank")
+        .values("follower_id", "profile_id", "profile__user__first_name", "id", "title")
+    )
+
+    items: dict[uuid.UUID, list[dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        items[row["follower_id"]].append(dict(row))
+    return items
+
+
+def _digest_email(
+    email: str, first_name: str, rows: list[dict[str, Any]]
+) -> QueuedEmailModel:
+    profiles = [
+        {
+            "name": group[0]["profile__user__first_name"],
+            "wishlist_url": f"{settings.FULL_DOMAIN}/wishlist/{profile_id}",
+            "items": [
+                {
+                    "title": row["title"],
+                    "url": f"{settings.FULL_DOMAIN}/wishitem/{row['id']}",
+                }
+                for row in group
+            ],
+        }
+        for profile_id, group in (
+            (key, list(group))
+            for key, group in itertools.groupby(rows, key=lambda r: r["profile_id"])
+        )
+    ]
+    body = "\n\n".join(
+        f"{profile['name']}: {profile['wishlist_url']}\n"
+        + "\n".join(f"  {item['title']}: {item['url']}" for item in profile["items"])
+        for profile in profiles
+    )
+    return email_row(
+        subject="Новые желания в ваших подписках",
+        body=body,
+        recipient_list=[email],
+        html_message=render_to_string(
+            "emails/follow_digest.html",
+            {"first_name": first_name, "profiles": profiles},
+        ),
+    )
+
+
+def _followers(chunk_size: int) -> Iterator[list[tuple[uuid.UUID, str, str]]]:
+    # .iterator(): на PostgreSQL серверный курсор, подписчики не грузятся разом
+    followers = (
+        ProfileModel.objects.filter(
+            models.Exists(FollowModel.objects.filter(follower=models.OuterRef("pk")))
+        )
+        .order_by("pk")
+        .values_list("pk", "user__email", "user__first_name")
+        .iterator(chunk_size=chunk_size)
+    )
+    while chunk := list(itertools.islice(followers, chunk_size)):
+        yield chunk
+
+
+@shared_task(ignore_result=True)  # type: ignore[misc]
+def send_follow_digests(chunk_size: int = FOLLOW_DIGEST_CHUNK_SIZE) -> int:
+    # желания, созданные во время прохода, уйдут в следующую сводку
+    until = timezone.now()
+    sent = 0
+    for chunk in _followers(chunk_size):
+        items = new_followed_items([pk for pk, _, _ in chunk], until)
+        emails = [
+            _digest_email(email, first_name, items[pk])
+            for pk, email, first_name in chunk
+            if email and pk in items
+        ]
+        # письма и отметка о сводке коммитятся вместе: упавший проход
+        # продолжится без дублей
+        with transaction.atomic():
+            queue_emails(emails)
+            ProfileModel.objects.filter(pk__in=[pk for pk, _, _ in chunk]).update(
+                follow_digest_at=until
+            )
+        sent += len(emails)
+    return sent
@@ -1,22 +1,49 @@
+from datetime import timedelta
+
+import contextlib
+import logging
+import smtplib
 import uuid
 from celery import Task, shared_task
 
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.core.mail import get_connection
 from django.conf import settings
+from django.db import models, transaction
 from django.template.loader import render_to_string
+from django.utils import timezone
 
+from services.mail import (
+    MAIL_BATCH_SIZE,
+    MAIL_CLAIM_TIMEOUT,
+    MAIL_FLUSH_SCHEDULED_KEY,
+    MAIL_MAX_ATTEMPTS,
+    RESERVATION_DIGEST_WINDOW,
+    queue_email,
+    queue_reservation_notice,
+    reservation_digest_key,
+)
+from services.models import QueuedEmailModel, ReservationNoticeModel
 from wishitems.models import WishItemModel
 
 
+logger = logging.getLogger(__name__)
+
+# отказ по конкретному письму: соединение живо, остальные уходят дальше
+_REJECTED = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)  # type: ignore[misc]
 def send_confirmation_email(self: Task, email: str, confirmation_url: str) -> None:
     try:
-        send_mail(
+        queue_email(
             subject="Подтверждение регистрации",
-            message=f"Пожалуйста, подтвердите вашу регистрацию, перейдя по ссылке: {confirmation_url}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
+            body=f"Пожалуйста, подтвердите вашу регистрацию, перейдя по ссылке: {confirmation_url}",
             recipient_list=[email],
-            fail_silently=False,
         )
     except Exception as e:
         raise self.retry(exc=e)
@@ -36,43 +63,175 @@ def send_first_reservation_email(
             },
         )
 
-        send_mail(
+        queue_email(
             subject="Подтверждение почты",
-            message=f"Пожалуйста, подтвердите вашу почту, перейдя по ссылке: {confirmation_url}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
+            body=f"Пожалуйста, подтвердите вашу почту, перейдя по ссылке: {confirmation_url}",
             recipient_list=[email],
-            fail_silently=False,
             html_message=html_message,
         )
     except Exception as e:
         raise self.retry(exc=e)
 
 
+def reservation_email_payload(wishitem_id: uuid.UUID) -> dict[str, str]:
+    # снимок собирается при постановке задачи одним запросом: воркер не ходит
+    # в БД, а повтор задачи шлет то же письмо, даже если желание успели изменить
+    wishitem = (
+        WishItemModel.objects.select_related("profile__user")
+        .only("title", "profile__user__first_name")
+        .get(id=wishitem_id)
+    )
+    return {
+        "title": wishitem.title,
+        "profile": wishitem.profile.user.first_name,
+        "wishitem_url": f"{settings.FULL_DOMAIN}/wishitem/{wishitem.id}",
+        "wishlist_url": f"{settings.FULL_DOMAIN}/wishlist/{wishitem.profile_id}",
+        "register_url": f"{settings.FULL_DOMAIN}/register",
+    }
+
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)  # type: ignore[misc]
-def send_reservation_email(self: Task, email: str, wishitem_id: uuid.UUID) -> None:
+def send_reservation_email(
+    self: Task, email: str, payload: dict[str, str] | uuid.UUID | str
+) -> None:
     try:
-        wishitem = WishItemModel.objects.get(id=wishitem_id)
-        wishitem_url = f"{settings.FULL_DOMAIN}/wishitem/{wishitem.id}"
-        wishlist_url = f"{settings.FULL_DOMAIN}/wishlist/{wishitem.profile.id}"
-        register_url = f"{settings.FULL_DOMAIN}/register"
-        html_message = render_to_string(
-            "emails/reservation_email.html",
-            {
-                "wishlist_url": wishlist_url,
-                "wishitem_url": wishitem_url,
-                "register_url": register_url,
-                "title": wishitem.title,
-                "profile": wishitem.profile.user.first_name,
-            },
-        )
+        if not isinstance(payload, dict):
+            # задача поставлена до перехода на снимки и несет id желания
+            payload = reservation_email_payload(uuid.UUID(str(payload)))
+        queue_reservation_notice(email, payload)
+    except Exception as e:
+        raise self.retry(exc=e)
 
-        send_mail(
-            subject=wishitem.title,
-            message=f"Вы только что зарезервировали желание: {wishitem_url}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            fail_silently=False,
-            html_message=html_message,
-        )
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)  # type: ignore[misc]
+def send_reservation_digest(self: Task, email: str) -> None:
+    # брони, пришедшие после этой точки, откроют следующее окно
+    cache.delete(reservation_digest_key(email))
+    try:
+        with transaction.atomic():
+            notices = list(
+                ReservationNoticeModel.objects.select_for_update()
+                .filter(email=email)
+                .order_by("id")
+            )
+            if not notices:
+                return
+            items = [notice.payload for notice in notices]
+            # письмо встает в очередь в этой транзакции, сброс очереди
+            # запланируется только после ее коммита
+
+            if len(items) == 1:
+                # одна бронь — прежнее письмо про конкретное желание
+                item = items[0]
+                queue_email(
+                    subject=item["title"],
+                    body=f"Вы только что зарезервировали желание: {item['wishitem_url']}",
+                    recipient_list=[email],
+                    html_message=render_to_string(
+                        "emails/reservation_email.html", item
+                    ),
+                )
+            else:
+                queue_email(
+                    subject=f"Вы зарезервировали желаний: {len(items)}",
+                    body="Вы только что зарезервировали желания:\n"
+                    + "\n".join(
+                        f"{item['title']}: {item['wishitem_url']}" for item in items
+                    ),
+                    recipient_list=[email],
+                    html_message=render_to_string(
+                        "emails/reservation_digest.html",
+                        {"items": items, "register_url": items[0]["register_url"]},
+                    ),
+                )
+            ReservationNoticeModel.objects.filter(
+                id__in=[notice.id for notice in notices]
+            ).delete()
     except Exception as e:
         raise self.retry(exc=e)
+
+
+@shared_task(ignore_result=True)  # type: ignore[misc]
+def send_stale_reservation_digests() -> int:
+    # страховка, если отложенная сводка потерялась вместе с воркером
+    threshold = timezone.now() - timedelta(seconds=RESERVATION_DIGEST_WINDOW * 2)
+    emails = set(
+        ReservationNoticeModel.objects.filter(created_at__lt=threshold).values_list(
+            "email", flat=True
+        )
+    )
+    for email in emails:
+        send_reservation_digest.delay(email)
+    return len(emails)
+
+
+def _claim_mail_batch() -> list[QueuedEmailModel]:
+    now = timezone.now()
+    expired = now - timedelta(seconds=MAIL_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        # skip_locked: параллельные отправщики разбирают разные пачки
+        queued = list(
+            QueuedEmailModel.objects.select_for_update(skip_locked=True)
+            .filter(
+                models.Q(claimed_at__isnull=True) | models.Q(claimed_at__lt=expired)
+            )
+            .order_by("id")[:MAIL_BATCH_SIZE]
+        )
+        QueuedEmailModel.objects.filter(id__in=[email.id for email in queued]).update(
+            claimed_at=now
+        )
+    # блокировки сняты коммитом: SMTP-сессия идет без открытой транзакции
+    return queued
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)  # type: ignore[misc]
+def flush_mail_queue(self: Task) -> int:
+    # письма, поставленные после этой точки, запланируют следующий сброс
+    cache.delete(MAIL_FLUSH_SCHEDULED_KEY)
+    sent = 0
+    while True:
+        queued = _claim_mail_batch()
+        if not queued:
+            return sent
+
+        delivered: list[int] = []
+        rejected: list[int] = []
+        error: Exception | None = None
+        # одно соединение на пачку вместо SSL-рукопожатия на каждое письмо
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+            for email in queued:
+                try:
+                    connection.send_messages([email.message(connection)])
+                except _REJECTED:
+                    logger.warning("Сервер отклонил письмо %s", email.id)
+                    rejected.append(email.id)
+                else:
+                    delivered.append(email.id)
+        except Exception as e:
+            # соединение упало: отправленное удаляем, остальное ждет повтора
+            error = e
+        finally:
+            with contextlib.suppress(Exception):
+                connection.close()
+
+        with transaction.atomic():
+            QueuedEmailModel.objects.filter(id__in=delivered).delete()
+            QueuedEmailModel.objects.filter(id__in=rejected).update(
+                attempts=models.F("attempts") + 1
+            )
+            QueuedEmailModel.objects.filter(
+                id__in=rejected, attempts__gte=MAIL_MAX_ATTEMPTS
+            ).delete()
+            # неотправленное возвращаем в очередь, не дожидаясь MAIL_CLAIM_TIMEOUT
+            QueuedEmailModel.objects.filter(
+                id__in=[email.id for email in queued]
+            ).exclude(id__in=delivered).update(claimed_at=None)
+        sent += len(delivered)
+
+        if error is not None:
+            raise self.retry(exc=error)
+        # отклоненные остаются в очереди до следующего запуска
+        if rejected or len(queued) < MAIL_BATCH_SIZE:
+            return sent
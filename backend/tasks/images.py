@@ -0,0 +1,102 @@
+import uuid
+
+from celery import shared_task
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from wishitems.cache import bump_wishlist_version
+from wishitems.images import render_variants
+from wishitems.media import content_name, copy_file, is_content_name, variant_name
+from wishitems.models import (
+    WishItemModel,
+    acquire_picture,
+    claim_file,
+    discard_files,
+    release_picture,
+)
+
+
+def _promote(wishitem_id: uuid.UUID, picture_name: str, target: str) -> bool:
+    # прямая загрузка лежит под случайным именем: переводим ее на хэш содержимого
+    storage = WishItemModel._meta.get_field("picture").storage
+    claim_file(target)
+    if not storage.exists(target):
+        copy_file(storage, picture_name, target)
+
+    with transaction.atomic():
+        moved = WishItemModel.objects.filter(
+            pk=wishitem_id, picture=picture_name
+        ).update(picture=target, updated_at=timezone.now())
+        if moved:
+            # update() без сигналов: ссылки считаем сами
+            acquire_picture(target)
+            release_picture(picture_name, {})
+        else:
+            discard_files([target])
+    return bool(moved)
+
+
+@shared_task(ignore_result=True)  # type: ignore[misc]
+def generate_picture_variants(wishitem_id: uuid.UUID, picture_name: str) -> None:
+    # картинку могли заменить или удалить, пока задача ждала очереди
+    current = WishItemModel.objects.filter(pk=wishitem_id, picture=picture_name)
+    profile_id = current.values_list("profile_id", flat=True).first()
+    if profile_id is None:
+        return
+
+    storage = WishItemModel._meta.get_field("picture").storage
+    if not is_content_name(picture_name):
+        try:
+            with storage.open(picture_name) as file:
+                target = content_name(file, picture_name)
+        except FileNotFoundError:
+            return
+        if not _promote(wishitem_id, picture_name, target):
+            return
+        picture_name = target
+        current = WishItemModel.objects.filter(pk=wishitem_id, picture=picture_name)
+
+    # те же байты уже обработаны для другого желания — берем готовое
+    ready = (
+        WishItemModel.objects.filter(picture=picture_name)
+        .exclude(picture_variants={})
+        .values(
+            "picture_width", "picture_height", "picture_blurhash", "picture_variants"
+        )
+        .first()
+    )
+    if ready is None:
+        try:
+            with storage.open(picture_name) as file:
+                rendition = render_variants(file)
+        except FileNotFoundError:
+            return
+
+        variants: dict[str, dict[str, str]] = {}
+        for fmt, widths in rendition.files.items():
+            for width, content in widths.items():
+                # имя детерминировано хэшем исходника: готовый файл — те же байты.
+                # Не перезаписываем его: им уже может пользоваться другое желание
+                name = variant_name(picture_name, width, fmt)
+                if not storage.exists(name):
+                    name = storage.save(name, ContentFile(content))
+                variants.setdefault(fmt, {})[str(width)] = name
+        ready = {
+            "picture_width": rendition.width,
+            "picture_height": rendition.height,
+            "picture_blurhash": rendition.blurhash,
+            "picture_variants": variants,
+        }
+
+    # update(), а не save(): не трогаем поля, которые мог поменять пользователь
+    updated = current.update(**ready, updated_at=timezone.now())
+    if updated:
+        bump_wishlist_version(profile_id)
+    elif not WishItemModel.objects.filter(picture=picture_name).exists():
+        discard_files(
+            name
+            for widths in ready["picture_variants"].values()
+            for name in widths.values()
+        )
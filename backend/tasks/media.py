@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+import itertools
+
+from celery import shared_task
+
+from django.db import transaction
+from django.utils import timezone
+
+from wishitems.media import (
+    MEDIA_GC_BATCH_SIZE,
+    PICTURE_PREFIX,
+    VARIANTS_PREFIX,
+    delete_files,
+    list_files,
+    owner_picture_name,
+)
+from wishitems.models import OrphanedFileModel, WishItemModel, discard_files
+
+
+# свежий файл может еще ждать коммита своей записи — такой не трогаем
+MEDIA_LEAK_GRACE_PERIOD: timedelta = timedelta(days=1)
+
+
+def _referenced(names: list[str]) -> set[str]:
+    # вариант жив, пока жива его исходная картинка
+    owners = {name: owner_picture_name(name) for name in names}
+    pictures = set(
+        WishItemModel.objects.filter(picture__in=set(owners.values())).values_list(
+            "picture", flat=True
+        )
+    )
+    return {name for name, owner in owners.items() if owner in pictures}
+
+
+@shared_task(ignore_result=True)  # type: ignore[misc]
+def collect_media_garbage() -> int:
+    storage = WishItemModel._meta.get_field("picture").storage
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            # skip_locked: параллельные сборщики разбирают разные пачки
+            names = list(
+                OrphanedFileModel.objects.select_for_update(skip_locked=True)
+                .order_by("created_at")
+                .values_list("name", flat=True)[:MEDIA_GC_BATCH_SIZE]
+            )
+            if not names:
+                return deleted
+
+            # на файл снова могли сослаться, пока он ждал в очереди
+            referenced = _referenced(names)
+            failed = set(
+                delete_files(
+                    storage, [name for name in names if name not in referenced]
+                )
+            )
+            OrphanedFileModel.objects.filter(name__in=names).exclude(
+                name__in=failed
+            ).delete()
+            deleted += len(names) - len(referenced) - len(failed)
+
+        # неудачные остаются в очереди до следующего запуска
+        if failed or len(names) < MEDIA_GC_BATCH_SIZE:
+            return deleted
+
+
+@shared_task(ignore_result=True)  # type: ignore[misc]
+def sweep_media_leaks() -> int:
+    # сверяет префиксы картинок и вариантов с БД: находит файлы, потерянные
+    # мимо сигналов (update() без сигналов, упавшие запросы после загрузки)
+    storage = WishItemModel._meta.get_field("picture").storage
+    threshold = timezone.now() - MEDIA_LEAK_GRACE_PERIOD
+    stale = (
+        name
+        for prefix in (PICTURE_PREFIX, VARIANTS_PREFIX)
+        for name, modified in list_files(storage, prefix)
+        if modified < threshold
+    )
+
+    leaked = 0
+    while chunk := list(itertools.islice(stale, MEDIA_GC_BATCH_SIZE)):
+        referenced = _referenced(chunk)
+        with transaction.atomic():
+            discard_files(name for name in chunk if name not in referenced)
+        leaked += len(chunk) - len(referenced)
+    return leaked
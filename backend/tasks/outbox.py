@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from services.outbox import relay_outbox
+
+
+@shared_task(ignore_result=True)  # type: ignore[misc]
+def relay_outbox_task() -> int:
+    # страховка, если процесс relay_outbox не запущен или упал
+    return relay_outbox()
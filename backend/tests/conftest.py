@@ -7,6 +7,7 @@ from django.core.mail import EmailMessage
 import pytest
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db.models import QuerySet
 from django.http import HttpResponse, HttpResponseRedirect
 from django.urls import reverse
@@ -18,6 +19,11 @@ from tests.values import VarStr
 pytest_plugins = ["tests.factories"]
 
 
+@pytest.fixture(autouse=True)
+def clear_cache() -> None:
+    cache.clear()
+
+
 @runtime_checkable
 class BasicAssertsReverse(Protocol):
     def __call__(
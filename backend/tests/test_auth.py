@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import timedelta
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Any, cast
 
 import pytest
 
@@ -65,6 +65,7 @@ def test_register_view_post(
     asserts_registration_token: Callable[[QuerySet[RegistrationTokenModel]], None],
     basic_asserts_template: BasicAssertsTemplate,
     asserts_task_emails: AssertsTaskEmails,
+    django_capture_on_commit_callbacks: Callable[..., Any],
 ) -> None:
     url = reverse("register")
     data = {
@@ -73,7 +74,8 @@ def test_register_view_post(
         "password1": VarStr.USER_PASSWORD,
         "password2": VarStr.USER_PASSWORD,
     }
-    response = client.post(url, data)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(url, data)
     basic_asserts_template(cast(HttpResponse, response), VarStr.USER_REG_EMAIL_SENT)
     asserts_task_emails(
         mail.outbox, VarStr.CONFIRMATION_EMAIL_SUBJECT, VarStr.USER_EMAIL
@@ -91,6 +93,7 @@ def test_register_view_post_expired_tok(
     asserts_registration_token: Callable[[QuerySet[RegistrationTokenModel]], None],
     basic_asserts_template: BasicAssertsTemplate,
     asserts_task_emails: AssertsTaskEmails,
+    django_capture_on_commit_callbacks: Callable[..., Any],
 ) -> None:
     reg_token = cast(
         RegistrationTokenModel,
@@ -108,7 +111,8 @@ def test_register_view_post_expired_tok(
         "password1": VarStr.USER_PASSWORD,
         "password2": VarStr.USER_PASSWORD,
     }
-    response = client.post(url, data)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(url, data)
     basic_asserts_template(cast(HttpResponse, response), VarStr.USER_REG_EMAIL_SENT)
     asserts_task_emails(
         mail.outbox, VarStr.CONFIRMATION_EMAIL_SUBJECT, VarStr.USER_EMAIL
@@ -1,18 +1,27 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, cast
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, cast
 
 import pytest
 
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.management import call_command
 from django.urls import reverse
 from django.http import HttpResponseRedirect
 from django.contrib.auth.models import User
+from django.utils import timezone
 
-from profiles.models import FollowModel
-from tests.factories import UserFactory
+from profiles.models import FOLLOWING_FEED_SIZE, FollowModel, ProfileModel
+from tasks.digest import FOLLOW_DIGEST_ITEMS_PER_PROFILE, send_follow_digests
+from wishitems.models import WishItemModel
+from tests.factories import UserFactory, WishItemFactory
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
     from django.test import Client
+    from pytest_django import DjangoAssertNumQueries
     from tests.conftest import BasicAssertsReverse
 
 
@@ -36,6 +45,87 @@ def test_follow_model() -> None:
     assert profile_1.is_following(profile_2) is False
 
 
+def test_following_feed(django_assert_num_queries: DjangoAssertNumQueries) -> None:
+    user, *others = UserFactory.create_batch(4)
+    for other in others:
+        FollowModel.objects.create(  # pyright: ignore[reportAttributeAccessIssue]
+            follower=user.profile, following=other.profile
+        )
+    WishItemFactory.create_batch(FOLLOWING_FEED_SIZE + 2, profile=others[0].profile)
+    WishItemFactory(profile=others[1].profile, is_private=True)
+
+    with django_assert_num_queries(2):
+        feed = {p.id: p for p in user.profile.following_feed}
+        for profile in feed.values():
+            assert profile.user.username
+            for item in profile.feed_items:  # type: ignore[attr-defined]
+                assert not item.is_private
+
+    feed_items = {p_id: p.feed_items for p_id, p in feed.items()}  # type: ignore[attr-defined]
+    assert len(feed_items[others[0].profile.id]) == FOLLOWING_FEED_SIZE
+    assert feed_items[others[1].profile.id] == []
+    assert feed_items[others[2].profile.id] == []
+
+
+def counters(profile: ProfileModel) -> tuple[int, int, int, int]:
+    profile.refresh_from_db()
+    return (
+        profile.wishitems_count,
+        profile.wishitems_public_count,
+        profile.wishitems_reserved_count,
+        profile.followers_count,
+    )
+
+
+def test_profile_counters() -> None:
+    user_1, user_2 = UserFactory.create_batch(2)
+    profile_1, profile_2 = user_1.profile, user_2.profile
+
+    wishitem, private = WishItemFactory.create_batch(2, profile=profile_1)
+    private.is_private = True
+    private.save()
+    assert counters(profile_1) == (2, 1, 0, 0)
+
+    wishitem.reserved = profile_2
+    wishitem.save()
+    wishitem.save()
+    assert counters(profile_1) == (2, 1, 1, 0)
+
+    follow = FollowModel.objects.create(  # pyright: ignore[reportAttributeAccessIssue]
+        follower=profile_2, following=profile_1
+    )
+    assert counters(profile_1) == (2, 1, 1, 1)
+    assert counters(profile_2) == (0, 0, 0, 0)
+
+    follow.delete()
+    private.delete()
+    assert counters(profile_1) == (1, 1, 1, 0)
+
+    user_2.delete()
+    assert counters(profile_1) == (1, 1, 0, 0)
+
+
+def test_rebuild_profile_counters() -> None:
+    user_1, user_2 = UserFactory.create_batch(2)
+    WishItemFactory.create_batch(3, profile=user_1.profile)
+    WishItemFactory(profile=user_1.profile, is_private=True, reserved=user_2.profile)
+    FollowModel.objects.create(  # pyright: ignore[reportAttributeAccessIssue]
+        follower=user_2.profile, following=user_1.profile
+    )
+    expected = counters(user_1.profile)
+    assert expected == (4, 3, 1, 1)
+
+    ProfileModel.objects.update(
+        wishitems_count=0,
+        wishitems_public_count=0,
+        wishitems_reserved_count=0,
+        followers_count=0,
+    )
+    call_command("rebuild_profile_counters")
+    assert counters(user_1.profile) == expected
+    assert counters(user_2.profile) == (0, 0, 0, 0)
+
+
 # VIEWS
 def test_follow_create_view(
     client: Client, basic_asserts_reverse: BasicAssertsReverse
@@ -95,6 +185,26 @@ def test_following_view(client: Client) -> None:
     assert list(response.context["profiles"]) == list(profile_1.following)
 
 
+def test_following_view_num_queries(
+    client: Client, django_assert_num_queries: DjangoAssertNumQueries
+) -> None:
+    user = cast(User, UserFactory())
+    client.force_login(user)
+    url = reverse("following")
+
+    # сессия, пользователь, профиль, подписки с user, prefetch желаний
+    for followed in (1, 10):
+        for other in UserFactory.create_batch(followed):
+            FollowModel.objects.create(  # pyright: ignore[reportAttributeAccessIssue]
+                follower=user.profile, following=other.profile
+            )
+            WishItemFactory.create_batch(2, profile=other.profile)
+
+        with django_assert_num_queries(5):
+            response = client.get(url)
+    assert len(response.context["profiles"]) == 11
+
+
 # ANONYMOUS VIEWS
 @pytest.mark.parametrize(
     ("url_name", "profile_id"),
@@ -127,3 +237,48 @@ def test_profile_views_login_req(
         url = reverse(url_name)
     response = client.post(url)
     basic_asserts_reverse(cast(HttpResponseRedirect, response), "login")
+
+
+# FOLLOW DIGEST
+def test_send_follow_digests(
+    django_capture_on_commit_callbacks: Callable[..., Any],
+) -> None:
+    follower, no_email, lonely, friend, busy = UserFactory.create_batch(5)
+    User.objects.filter(pk=no_email.pk).update(email="")
+    for user in (follower, no_email):
+        for following in (friend, busy):
+            FollowModel.objects.create(  # pyright: ignore[reportAttributeAccessIssue]
+                follower=user.profile, following=following.profile
+            )
+
+    new = WishItemFactory.create_batch(2, profile=friend.profile)
+    private = cast(
+        WishItemModel, WishItemFactory(profile=friend.profile, is_private=True)
+    )
+    old = cast(WishItemModel, WishItemFactory(profile=friend.profile))
+    WishItemModel.objects.filter(pk=old.pk).update(
+        created_at=timezone.now() - timedelta(days=8)
+    )
+    WishItemFactory.create_batch(
+        FOLLOW_DIGEST_ITEMS_PER_PROFILE + 2, profile=busy.profile
+    )
+
+    # пачка в одного подписчика: проверяем склейку между пачками
+    with django_capture_on_commit_callbacks(execute=True):
+        assert send_follow_digests(chunk_size=1) == 1
+
+    (digest,) = mail.outbox
+    assert digest.to == [follower.email]
+    html = str(cast(EmailMultiAlternatives, digest).alternatives[0][0])
+    assert all(item.title in html for item in new)
+    assert private.title not in html and old.title not in html
+    assert html.count("/wishitem/") == 2 + FOLLOW_DIGEST_ITEMS_PER_PROFILE
+
+    marked = ProfileModel.objects.filter(follow_digest_at__isnull=False)
+    assert set(marked) == {follower.profile, no_email.profile}
+    assert lonely.profile not in marked
+
+    # повторный проход не шлет уже отправленное
+    assert send_follow_digests() == 0
+    WishItemFactory(profile=friend.profile)
+    assert send_follow_digests() == 1
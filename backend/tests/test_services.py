@@ -1,13 +1,21 @@
 from __future__ import annotations
 
+from collections.abc import Callable
 from datetime import timedelta
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Any, cast
 
+import contextlib
+import logging
+import smtplib
 import uuid
 import pytest
 
 from django.contrib.auth.models import User
 from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import transaction
 from django.http import HttpResponse, HttpResponseRedirect
 from django.urls import reverse
 from django.utils import timezone
@@ -15,11 +23,32 @@ from django.utils import timezone
 from tests.factories import RegistrationTokenFactory, UserFactory, WishItemFactory
 from tests.values import VarStr
 
-from services.models import RegistrationTokenModel
+from services.mail import (
+    MAIL_CLAIM_TIMEOUT,
+    MAIL_FLUSH_SCHEDULED_KEY,
+    MAIL_MAX_ATTEMPTS,
+    queue_email,
+    reservation_digest_key,
+)
+from services import outbox
+from services.models import (
+    OutboxTaskModel,
+    QueuedEmailModel,
+    RegistrationTokenModel,
+    ReservationNoticeModel,
+)
+from tasks import email as email_tasks
+from yourmirror.celery import app as celery_app
+from tasks.email import (
+    reservation_email_payload,
+    send_reservation_digest,
+    send_reservation_email,
+)
 from wishitems.models import WishItemModel
 
 if TYPE_CHECKING:
     from django.test import Client
+    from pytest_django import DjangoAssertNumQueries
     from tests.conftest import (
         BasicAssertsTemplate,
         BasicAssertsReverse,
@@ -73,6 +102,7 @@ def test_confirm_first_reservation_email_view(
     basic_asserts_reverse: BasicAssertsReverse,
     asserts_user: AssertsUser,
     asserts_task_emails: AssertsTaskEmails,
+    django_capture_on_commit_callbacks: Callable[..., Any],
 ) -> None:
     wishitem = cast(WishItemModel, WishItemFactory())
     reg_token = cast(
@@ -84,7 +114,8 @@ def test_confirm_first_reservation_email_view(
     )
 
     url = reverse("confirm_first_reservation_email", kwargs={"token": reg_token.token})
-    response = client.get(url)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.get(url)
     basic_asserts_reverse(
         cast(HttpResponseRedirect, response),
         "wishitem_detail",
@@ -187,3 +218,268 @@ def test_confirms_with_invalid_token(
     basic_asserts_template(
         cast(HttpResponse, response), VarStr.CONFIRM_EMAIL_INVALID_TOK
     )
+
+
+# MAIL QUEUE
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self) -> bool:
+        CountingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages: Any) -> int:
+        if any("rejected@" in address for m in messages for address in m.to):
+            raise smtplib.SMTPRecipientsRefused({})
+        return super().send_messages(messages)
+
+
+@pytest.fixture
+def counting_backend(monkeypatch: pytest.MonkeyPatch) -> type[CountingBackend]:
+    CountingBackend.opened = 0
+    monkeypatch.setattr(
+        email_tasks, "get_connection", lambda **kwargs: CountingBackend(**kwargs)
+    )
+    return CountingBackend
+
+
+def test_mail_queue_sends_batch_over_one_connection(
+    counting_backend: type[CountingBackend],
+) -> None:
+    # сброс уже запланирован: письма копятся в очереди
+    cache.set(MAIL_FLUSH_SCHEDULED_KEY, 1)
+    for n in range(3):
+        queue_email(f"subject {n}", "body", [f"user{n}@x.ru"], html_message="<p>")
+    assert not mail.outbox
+    assert QueuedEmailModel.objects.count() == 3
+
+    assert email_tasks.flush_mail_queue() == 3
+
+    assert counting_backend.opened == 1
+    assert [m.subject for m in mail.outbox] == ["subject 0", "subject 1", "subject 2"]
+    assert cast(EmailMultiAlternatives, mail.outbox[0]).alternatives[0][0] == "<p>"
+    assert not QueuedEmailModel.objects.exists()
+    # следующее письмо снова планирует сброс
+    assert cache.get(MAIL_FLUSH_SCHEDULED_KEY) is None
+
+
+def test_mail_flush_scheduled_after_commit(
+    django_capture_on_commit_callbacks: Callable[..., Any],
+) -> None:
+    with django_capture_on_commit_callbacks() as callbacks:
+        with transaction.atomic():
+            queue_email("subject", "body", ["user@x.ru"])
+        # транзакция вызывающего не закоммичена: отправщик строку не увидит
+        assert cache.get(MAIL_FLUSH_SCHEDULED_KEY) is None
+
+    for callback in callbacks:
+        callback()
+    assert [m.subject for m in mail.outbox] == ["subject"]
+    assert not QueuedEmailModel.objects.exists()
+
+
+def test_mail_queue_keeps_rejected(counting_backend: type[CountingBackend]) -> None:
+    cache.set(MAIL_FLUSH_SCHEDULED_KEY, 1)
+    queue_email("bad", "body", ["rejected@x.ru"])
+    queue_email("good", "body", ["user@x.ru"])
+
+    assert email_tasks.flush_mail_queue() == 1
+
+    assert [m.subject for m in mail.outbox] == ["good"]
+    assert QueuedEmailModel.objects.get().attempts == 1
+
+    QueuedEmailModel.objects.update(attempts=MAIL_MAX_ATTEMPTS - 1)
+    email_tasks.flush_mail_queue()
+    assert not QueuedEmailModel.objects.exists()
+
+
+def test_mail_queue_claims_rows_before_sending(
+    counting_backend: type[CountingBackend], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cache.set(MAIL_FLUSH_SCHEDULED_KEY, 1)
+    queue_email("taken", "body", ["user@x.ru"])
+    queue_email("free", "body", ["user@x.ru"])
+    # эту пачку прямо сейчас отправляет другой воркер
+    QueuedEmailModel.objects.filter(subject="taken").update(claimed_at=timezone.now())
+    claimed: list[str] = []
+
+    def send_messages(self: EmailBackend, messages: Any) -> int:
+        claimed.extend(
+            QueuedEmailModel.objects.filter(claimed_at__isnull=False).values_list(
+                "subject", flat=True
+            )
+        )
+        return EmailBackend.send_messages(self, messages)
+
+    monkeypatch.setattr(counting_backend, "send_messages", send_messages)
+
+    assert email_tasks.flush_mail_queue() == 1
+    assert [m.subject for m in mail.outbox] == ["free"]
+    # письмо помечено до SMTP-сессии, блокировки на ней не держатся
+    assert sorted(claimed) == ["free", "taken"]
+
+    # воркер умер посреди отправки: по таймауту письмо снова ничье
+    QueuedEmailModel.objects.update(
+        claimed_at=timezone.now() - timedelta(seconds=MAIL_CLAIM_TIMEOUT + 1)
+    )
+    assert email_tasks.flush_mail_queue() == 1
+    assert [m.subject for m in mail.outbox] == ["free", "taken"]
+
+
+def test_mail_queue_releases_claim_on_failure(
+    counting_backend: type[CountingBackend], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cache.set(MAIL_FLUSH_SCHEDULED_KEY, 1)
+    queue_email("subject", "body", ["user@x.ru"])
+
+    def open(self: EmailBackend) -> bool:
+        raise smtplib.SMTPServerDisconnected()
+
+    monkeypatch.setattr(counting_backend, "open", open)
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        email_tasks.flush_mail_queue()
+    # следующий запуск не ждет таймаута захвата
+    assert QueuedEmailModel.objects.get().claimed_at is None
+
+
+# RESERVATION EMAIL PAYLOAD
+def test_reservation_email_payload_single_query(
+    django_assert_num_queries: DjangoAssertNumQueries,
+) -> None:
+    wishitem = cast(WishItemModel, WishItemFactory())
+
+    with django_assert_num_queries(1):
+        payload = reservation_email_payload(wishitem.id)
+
+    assert payload["title"] == wishitem.title
+    assert payload["profile"] == wishitem.profile.user.first_name
+    assert payload["wishlist_url"].endswith(f"/wishlist/{wishitem.profile_id}")
+
+
+def test_send_reservation_email_from_snapshot(caplog: pytest.LogCaptureFixture) -> None:
+    wishitem = cast(WishItemModel, WishItemFactory())
+    payload = reservation_email_payload(wishitem.id)
+    # письмо уходит как есть, даже если желание успели поменять
+    WishItemModel.objects.filter(id=wishitem.id).update(title="changed")
+    cache.set(MAIL_FLUSH_SCHEDULED_KEY, 1)
+    cache.set(reservation_digest_key(VarStr.USER_EMAIL), 1)
+
+    with caplog.at_level(logging.INFO, logger="tasks.metrics"):
+        send_reservation_email.delay(VarStr.USER_EMAIL, payload)
+    # единственный запрос воркера — бронь в окно сводки
+    (record,) = caplog.records
+    assert record.task == send_reservation_email.name  # type: ignore[attr-defined]
+    assert record.db_queries == 1  # type: ignore[attr-defined]
+
+    send_reservation_digest(VarStr.USER_EMAIL)
+    queued = QueuedEmailModel.objects.get()
+    assert queued.subject == wishitem.title
+    assert payload["wishitem_url"] in queued.body
+
+
+# RESERVATION DIGEST
+def test_reservation_digest_coalesces_per_recipient(
+    django_capture_on_commit_callbacks: Callable[..., Any],
+) -> None:
+    wishitems = [cast(WishItemModel, WishItemFactory()) for _ in range(3)]
+    other = cast(WishItemModel, WishItemFactory())
+    # окно сводки уже открыто: брони копятся
+    cache.set(reservation_digest_key(VarStr.USER_EMAIL), 1)
+    for wishitem in wishitems:
+        send_reservation_email.delay(
+            VarStr.USER_EMAIL, reservation_email_payload(wishitem.id)
+        )
+    # у другого получателя свое окно и свое письмо
+    with django_capture_on_commit_callbacks(execute=True):
+        send_reservation_email.delay("other@x.ru", reservation_email_payload(other.id))
+    assert [m.to for m in mail.outbox] == [["other@x.ru"]]
+    assert mail.outbox[0].subject == other.title
+
+    with django_capture_on_commit_callbacks(execute=True):
+        send_reservation_digest(VarStr.USER_EMAIL)
+
+    assert len(mail.outbox) == 2
+    digest = cast(EmailMultiAlternatives, mail.outbox[1])
+    assert digest.to == [VarStr.USER_EMAIL]
+    assert "3" in digest.subject
+    html = str(digest.alternatives[0][0])
+    assert all(wishitem.title in html for wishitem in wishitems)
+    assert not ReservationNoticeModel.objects.exists()
+    # следующая бронь откроет новое окно
+    assert cache.get(reservation_digest_key(VarStr.USER_EMAIL)) is None
+
+
+# OUTBOX
+@pytest.fixture
+def broker_outbox(monkeypatch: pytest.MonkeyPatch) -> list[tuple[str, Any]]:
+    # как в проде: задачи идут через брокер, а не выполняются на месте
+    monkeypatch.setattr(
+        send_reservation_email.app.conf, "CELERY_TASK_ALWAYS_EAGER", False
+    )
+    published: list[tuple[str, Any]] = []
+
+    class Broker:
+        def producer_or_acquire(self) -> Any:
+            return contextlib.nullcontext("producer")
+
+        def send_task(self, name: str, **options: Any) -> None:
+            published.append((name, options))
+
+    monkeypatch.setattr(outbox, "current_app", Broker())
+    return published
+
+
+def test_reservation_goes_through_outbox(
+    client: Client, broker_outbox: list[tuple[str, Any]]
+) -> None:
+    user = cast(User, UserFactory())
+    client.force_login(user)
+    wishitem = cast(WishItemModel, WishItemFactory())
+
+    client.post(reverse("wishitem_detail", kwargs={"wishitem_id": wishitem.id}))
+
+    # запрос только пишет строку: ни брокера, ни письма
+    assert not broker_outbox
+    assert not mail.outbox
+    row = OutboxTaskModel.objects.get()
+    assert row.task == send_reservation_email.name
+    assert row.args[0] == user.email
+    assert row.args[1]["title"] == wishitem.title
+
+    assert outbox.relay_outbox() == 1
+    assert broker_outbox == [
+        (
+            send_reservation_email.name,
+            {"args": row.args, "kwargs": {}, "producer": "producer"},
+        )
+    ]
+    assert not OutboxTaskModel.objects.exists()
+
+
+def test_outbox_rolls_back_with_transaction(
+    broker_outbox: list[tuple[str, Any]],
+) -> None:
+    with contextlib.suppress(RuntimeError), transaction.atomic():
+        outbox.enqueue(send_reservation_email, VarStr.USER_EMAIL, {"title": "x"})
+        raise RuntimeError
+
+    assert not OutboxTaskModel.objects.exists()
+    assert outbox.relay_outbox() == 0
+
+
+# CELERY
+def test_celery_beat_schedule() -> None:
+    # CELERY_* из settings того же модуля, что и у воркера и beat
+    celery_app.loader.import_default_modules()
+    tasks = {entry["task"] for entry in celery_app.conf.beat_schedule.values()}
+
+    assert tasks == {
+        "tasks.media.collect_media_garbage",
+        "tasks.media.sweep_media_leaks",
+        "tasks.email.flush_mail_queue",
+        "tasks.email.send_stale_reservation_digests",
+        "tasks.digest.send_follow_digests",
+        "tasks.outbox.relay_outbox_task",
+    }
+    assert tasks <= set(celery_app.tasks)
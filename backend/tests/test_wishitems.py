@@ -1,27 +1,72 @@
 from __future__ import annotations
 
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from typing import TYPE_CHECKING, Any, cast
 
+import base64
+import io
+import json
+import os
+import random
+import threading
+import time
+
 import pytest
+from minio import Minio
+from minio_storage.storage import MinioStorage
+from PIL import Image
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
 from django.db.models import QuerySet
 from django.http import HttpResponse, HttpResponseRedirect
 from django.urls import reverse
 from django.utils import timezone
 
 from services.models import RegistrationTokenModel
+from tasks import media as media_tasks
+from tasks.images import generate_picture_variants
 from wishitems.forms import CustomClearableFileInput, WishItemForm
-from wishitems.models import WishItemModel
+from wishitems.images import blurhash
+from wishitems.media import (
+    PICTURE_PREFIX,
+    PICTURE_UPLOAD_MAX_SIZE,
+    VARIANTS_PREFIX,
+    content_name,
+    delete_files,
+    media_page_timeout,
+    media_url_epoch,
+    media_urls,
+    presigned_upload,
+    sign_upload,
+    variant_name,
+)
+from wishitems.models import (
+    PICTURE_GENERATED_FIELDS,
+    OrphanedFileModel,
+    StoredPictureModel,
+    WishItemModel,
+    attach_picture_urls,
+    upload_to_wishlist,
+)
 
-from tests.factories import RegistrationTokenFactory, UserFactory, WishItemFactory
+from tests.factories import (
+    RegistrationTokenFactory,
+    UserFactory,
+    WishItemFactory,
+    faker_image_file,
+)
 from tests.values import VarStr
 
 if TYPE_CHECKING:
     from django.test import Client
+    from pytest_django import DjangoAssertNumQueries
     from tests.conftest import (
         BasicAssertsTemplate,
         BasicAssertsReverse,
@@ -45,6 +90,8 @@ def test_wishitem_form() -> None:
     }
     form = WishItemForm(data=form_data)
     assert form.is_valid()
+    # размеры, blurhash и варианты пишет фоновая задача, а не пользователь
+    assert not set(form.fields) & set(PICTURE_GENERATED_FIELDS)
 
     form.save(profile=user.profile)
     assert len(WishItemModel.objects.filter(profile=user.profile)) == 1
@@ -185,6 +232,30 @@ def test_wishitem_detail_view_my_without_buttons(
     basic_asserts_template_with_not(cast(HttpResponse, response), word)
 
 
+def test_wishitem_detail_view_not_modified(client: Client) -> None:
+    user_1, user_2 = UserFactory.create_batch(2)
+    wishitem = cast(WishItemModel, WishItemFactory())
+    url = reverse("wishitem_detail", kwargs={"wishitem_id": wishitem.id})
+    client.force_login(user_1)
+    client.get(url)  # первый ответ выставляет csrf-cookie, она входит в ETag
+
+    response = client.get(url)
+    etag = response["ETag"]
+    assert response["Last-Modified"]
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    client.force_login(user_2)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    etag = response["ETag"]
+
+    client.post(url)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert VarStr.WISHITEM_RESERVED_BY_USER.encode() in response.content
+
+
 # ANONYMOUS VIEW
 @pytest.mark.parametrize(
     "word",
@@ -204,6 +275,21 @@ def test_wishitem_detail_view_anon_without_buttons(
     basic_asserts_template_with_not(cast(HttpResponse, response), word)
 
 
+def test_wishitem_detail_view_anon_not_modified_csrf(client: Client) -> None:
+    wishitem = cast(WishItemModel, WishItemFactory())
+    url = reverse("wishitem_detail", kwargs={"wishitem_id": wishitem.id})
+    client.get(url)  # выставляет csrf-cookie для формы брони
+
+    etag = client.get(url)["ETag"]
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    # вход и выход меняют токен: страница со старым токеном не годится
+    client.cookies[settings.CSRF_COOKIE_NAME] = "r" * 32
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+
 def test_wishitem_detail_view_anon_private(client: Client) -> None:
     wishitem = cast(WishItemModel, WishItemFactory(is_private=True))
 
@@ -254,6 +340,7 @@ def test_wishitem_detail_post_to_reserve(
     basic_asserts_template: BasicAssertsTemplate,
     basic_asserts_reverse: BasicAssertsReverse,
     asserts_task_emails: AssertsTaskEmails,
+    django_capture_on_commit_callbacks: Callable[..., Any],
 ) -> None:
     user = cast(User, UserFactory())
     client.force_login(user)
@@ -261,7 +348,8 @@ def test_wishitem_detail_post_to_reserve(
     assert not wishitem.reserved
 
     url = reverse("wishitem_detail", kwargs={"wishitem_id": wishitem.id})
-    response = client.post(url)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(url)
     basic_asserts_reverse(
         cast(HttpResponseRedirect, response),
         "wishitem_detail",
@@ -346,13 +434,15 @@ def test_wishitem_detail_post_to_reserve_without_auth(
     basic_asserts_template: BasicAssertsTemplate,
     basic_asserts_reverse: BasicAssertsReverse,
     asserts_task_emails: AssertsTaskEmails,
+    django_capture_on_commit_callbacks: Callable[..., Any],
 ) -> None:
     user = cast(User, UserFactory())
     wishitem = cast(WishItemModel, WishItemFactory())
     assert not wishitem.reserved
 
     url = reverse("wishitem_detail", kwargs={"wishitem_id": wishitem.id})
-    response = client.post(url, data={"email": user.email})
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(url, data={"email": user.email})
     basic_asserts_reverse(
         cast(HttpResponseRedirect, response),
         "wishitem_detail",
@@ -369,12 +459,14 @@ def test_wishitem_detail_post_to_reserve_anon(
     basic_asserts_template: BasicAssertsTemplate,
     asserts_registration_token: Callable[[QuerySet[RegistrationTokenModel]], None],
     asserts_task_emails: AssertsTaskEmails,
+    django_capture_on_commit_callbacks: Callable[..., Any],
 ) -> None:
     wishitem = cast(WishItemModel, WishItemFactory())
     assert not wishitem.reserved
 
     url = reverse("wishitem_detail", kwargs={"wishitem_id": wishitem.id})
-    response = client.post(url, data={"email": VarStr.USER_EMAIL})
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(url, data={"email": VarStr.USER_EMAIL})
     basic_asserts_template(
         cast(HttpResponse, response), VarStr.WISHITEM_FIRST_RESERVATION_EMAIL
     )
@@ -465,3 +557,496 @@ def test_wishitem_detail_post_to_reserve_anon_only_last_item(
     )
     asserts_registration_token(reg_tokens)
     assert reg_tokens[0].wishitem == wishitem_2
+
+
+# COMPARE-AND-SET RESERVATION
+def test_wishitem_reserve_stale_instance_loses() -> None:
+    user_1, user_2 = UserFactory.create_batch(2)
+    wishitem = cast(WishItemModel, WishItemFactory())
+    first = WishItemModel.objects.get(pk=wishitem.pk)
+    second = WishItemModel.objects.get(pk=wishitem.pk)
+
+    assert first.reserve(user_1.profile)
+    assert not second.reserve(user_2.profile)
+    assert not second.unreserve(user_2.profile)
+
+    wishitem.refresh_from_db()
+    assert wishitem.reserved == user_1.profile
+    assert wishitem.updated_at == first.updated_at
+    wishitem.profile.refresh_from_db()
+    assert wishitem.profile.wishitems_reserved_count == 1
+
+    assert second.unreserve(user_1.profile)
+    wishitem.refresh_from_db()
+    assert wishitem.reserved is None
+    wishitem.profile.refresh_from_db()
+    assert wishitem.profile.wishitems_reserved_count == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_wishitem_reserve_concurrent_single_winner() -> None:
+    workers = 8
+    users = UserFactory.create_batch(workers)
+    wishitem = cast(WishItemModel, WishItemFactory())
+    barrier = threading.Barrier(workers)
+
+    def attempt(user: User) -> bool:
+        try:
+            item = WishItemModel.objects.get(pk=wishitem.pk)
+            barrier.wait()
+            # sqlite в shared cache не ждет блокировку, а сразу падает,
+            # повторяем как busy_timeout; у postgres строка просто блокируется
+            while True:
+                try:
+                    return item.reserve(user.profile)
+                except OperationalError:
+                    time.sleep(0.001)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(attempt, users))
+
+    assert results.count(True) == 1
+    wishitem.refresh_from_db()
+    assert wishitem.reserved == users[results.index(True)].profile
+    wishitem.profile.refresh_from_db()
+    assert wishitem.profile.wishitems_reserved_count == 1
+
+
+# PICTURE CLEANUP
+@pytest.fixture
+def media_root(settings: Any, tmp_path: Any) -> Any:
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def test_wishitem_save_without_picture_change(
+    media_root: Any,
+    django_assert_num_queries: DjangoAssertNumQueries,
+    django_capture_on_commit_callbacks: Callable[..., Any],
+) -> None:
+    wishitem = cast(WishItemModel, WishItemFactory(picture=faker_image_file()))
+    wishitem = WishItemModel.objects.get(pk=wishitem.pk)
+
+    wishitem.title = VarStr.WISHITEM_TITLE
+    with django_capture_on_commit_callbacks() as callbacks:
+        with django_assert_num_queries(1):
+            wishitem.save()
+
+    assert callbacks == []
+    assert wishitem.picture.storage.exists(cast(str, wishitem.picture.name))
+
+
+def test_wishitem_picture_replaced_after_commit(
+    media_root: Any, django_capture_on_commit_callbacks: Callable[..., Any]
+) -> None:
+    with django_capture_on_commit_callbacks(execute=True):
+        wishitem = cast(WishItemModel, WishItemFactory(picture=faker_image_file()))
+    wishitem.refresh_from_db()
+    storage = wishitem.picture.storage
+    old_names = [
+        cast(str, wishitem.picture.name),
+        *(
+            name
+            for widths in wishitem.picture_variants.values()
+            for name in widths.values()
+        ),
+    ]
+    assert len(old_names) > 1
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        wishitem.picture = faker_image_file()
+        wishitem.save()
+        assert all(storage.exists(name) for name in old_names)
+        assert OrphanedFileModel.objects.count() == len(old_names)
+        assert wishitem.picture_variants == {}
+
+    for callback in callbacks:
+        callback()
+    assert not any(storage.exists(name) for name in old_names)
+    assert storage.exists(cast(str, wishitem.picture.name))
+    assert not OrphanedFileModel.objects.exists()
+
+    # повторное сохранение уже сравнивает с новым файлом
+    with django_capture_on_commit_callbacks() as callbacks:
+        wishitem.save()
+    assert callbacks == []
+
+
+def test_profile_delete_collects_pictures_in_one_batch(
+    media_root: Any,
+    monkeypatch: pytest.MonkeyPatch,
+    django_capture_on_commit_callbacks: Callable[..., Any],
+) -> None:
+    user = cast(User, UserFactory())
+    wishitems = [
+        cast(
+            WishItemModel,
+            WishItemFactory(profile=user.profile, picture=faker_image_file()),
+        )
+        for _ in range(3)
+    ]
+    storage = wishitems[0].picture.storage
+    names = [cast(str, wishitem.picture.name) for wishitem in wishitems]
+
+    batches: list[list[str]] = []
+
+    def fake_delete_files(storage: Any, names: Any) -> list[str]:
+        batches.append(list(names))
+        return delete_files(storage, batches[-1])
+
+    monkeypatch.setattr(media_tasks, "delete_files", fake_delete_files)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user.delete()
+
+    assert [sorted(batch) for batch in batches] == [sorted(names)]
+    assert not any(storage.exists(name) for name in names)
+    assert not OrphanedFileModel.objects.exists()
+
+
+def test_collect_media_garbage_skips_referenced(media_root: Any) -> None:
+    wishitem = cast(WishItemModel, WishItemFactory(picture=faker_image_file()))
+    name = cast(str, wishitem.picture.name)
+    OrphanedFileModel.objects.create(name=name)
+
+    assert media_tasks.collect_media_garbage() == 0
+    assert wishitem.picture.storage.exists(name)
+    assert not OrphanedFileModel.objects.exists()
+
+
+def test_sweep_media_leaks(
+    media_root: Any, django_capture_on_commit_callbacks: Callable[..., Any]
+) -> None:
+    wishitem = cast(WishItemModel, WishItemFactory(picture=faker_image_file()))
+    storage = wishitem.picture.storage
+    leaked = storage.save(f"{PICTURE_PREFIX}leaked.png", faker_image_file())
+    fresh = storage.save(f"{PICTURE_PREFIX}fresh.png", faker_image_file())
+
+    old = time.time() - media_tasks.MEDIA_LEAK_GRACE_PERIOD.total_seconds() - 60
+    for name in (leaked, cast(str, wishitem.picture.name)):
+        os.utime(storage.path(name), (old, old))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert media_tasks.sweep_media_leaks() == 1
+
+    assert not storage.exists(leaked)
+    assert storage.exists(fresh)
+    assert storage.exists(cast(str, wishitem.picture.name))
+
+
+# PICTURE VARIANTS
+def test_blurhash_matches_reference() -> None:
+    random.seed(1)
+    image = Image.new("RGB", (32, 24))
+    image.putdata(
+        [(random.randint(0, 255), x % 255, x * 7 % 255) for x in range(32 * 24)]
+    )
+
+    # эталон посчитан библиотекой blurhash из woltapp
+    assert blurhash(image) == "LCHC4Zv=n5%M*XI[xcNHn%X9r?bY"
+
+
+def test_wishitem_picture_variants(
+    client: Client,
+    media_root: Any,
+    django_capture_on_commit_callbacks: Callable[..., Any],
+) -> None:
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 400), "red").save(buffer, "PNG")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        wishitem = cast(
+            WishItemModel,
+            WishItemFactory(picture=ContentFile(buffer.getvalue(), "big.png")),
+        )
+    wishitem.refresh_from_db()
+    storage = wishitem.picture.storage
+
+    assert (wishitem.picture_width, wishitem.picture_height) == (800, 400)
+    assert len(wishitem.picture_blurhash) == 28
+    assert set(wishitem.picture_variants["webp"]) == {"320", "640"}
+    for widths in wishitem.picture_variants.values():
+        for width, name in widths.items():
+            with storage.open(name) as file, Image.open(file) as variant:
+                assert variant.width == int(width)
+
+    response = client.get(
+        reverse("wishlist_profile", kwargs={"profile_id": wishitem.profile.id})
+    )
+    content = response.content.decode()
+    assert f'data-blurhash="{wishitem.picture_blurhash}"' in content
+    assert 'type="image/webp"' in content
+    assert f"{storage.url(wishitem.picture_variants['webp']['640'])} 640w" in content
+    assert 'sizes="500px"' in content
+
+
+def test_generate_picture_variants_stale(media_root: Any) -> None:
+    wishitem = cast(WishItemModel, WishItemFactory(picture=faker_image_file()))
+
+    generate_picture_variants(wishitem.id, "wishitems/picture/replaced.png")
+
+    wishitem.refresh_from_db()
+    assert wishitem.picture_variants == {}
+    assert not wishitem.picture.storage.exists(VARIANTS_PREFIX)
+
+
+def test_generate_picture_variants_keeps_existing_files(media_root: Any) -> None:
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 400), "red").save(buffer, "PNG")
+    wishitem = cast(
+        WishItemModel,
+        WishItemFactory(picture=ContentFile(buffer.getvalue(), "big.png")),
+    )
+    storage = wishitem.picture.storage
+    # вариант тех же байтов уже отдается другому желанию
+    name = storage.save(
+        variant_name(wishitem.picture.name or "", 320, "webp"), ContentFile(b"ready")
+    )
+
+    generate_picture_variants(wishitem.id, wishitem.picture.name)
+
+    wishitem.refresh_from_db()
+    assert wishitem.picture_variants["webp"]["320"] == name
+    with storage.open(name) as file:
+        assert file.read() == b"ready"
+
+
+# DIRECT UPLOAD
+def test_presigned_upload_policy() -> None:
+    client = Minio(
+        "minio.local:9000", "access", "secret", secure=False, region="us-east-1"
+    )
+    storage = MinioStorage(client, "media", assume_bucket_exists=True)
+    name = upload_to_wishlist(None, "upload.png")
+
+    upload = cast(dict[str, Any], presigned_upload(storage, name, "image/png"))
+
+    assert upload["url"] == "http://minio.local:9000/media/"
+    assert upload["fields"]["key"] == name
+    assert upload["fields"]["Content-Type"] == "image/png"
+    policy = json.loads(base64.b64decode(upload["fields"]["policy"]))
+    assert ["eq", "$key", name] in policy["conditions"]
+    assert ["content-length-range", 1, PICTURE_UPLOAD_MAX_SIZE] in policy["conditions"]
+
+
+def test_picture_upload_view_without_minio(client: Client) -> None:
+    client.force_login(cast(User, UserFactory()))
+    url = reverse("wishitem_picture_upload")
+
+    assert client.post(url, {"content_type": "text/html"}).status_code == 400
+    # в тестах FileSystemStorage: браузер откатится на обычную отправку формы
+    assert client.post(url, {"content_type": "image/png"}).status_code == 501
+
+
+def test_wishitem_create_view_direct_upload(
+    client: Client,
+    media_root: Any,
+    django_capture_on_commit_callbacks: Callable[..., Any],
+) -> None:
+    user = cast(User, UserFactory())
+    storage = WishItemModel._meta.get_field("picture").storage
+    # так файл оказывается в хранилище после presigned POST из браузера
+    picture = faker_image_file()
+    name = storage.save(upload_to_wishlist(None, "upload.png"), picture)
+    client.force_login(user)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(
+            reverse("wishitem_create"),
+            {
+                "title": VarStr.WISHITEM_TITLE,
+                "picture_upload": sign_upload(name, user.pk),
+            },
+        )
+
+    assert response.status_code == 302
+    wishitem = WishItemModel.objects.get(profile=user.profile)
+    # задача вариантов перевела загрузку на имя по хэшу содержимого
+    target = content_name(picture, name)
+    assert wishitem.picture.name == target
+    assert wishitem.picture_variants
+    assert storage.listdir(PICTURE_PREFIX)[1] == [target.removeprefix(PICTURE_PREFIX)]
+    assert list(StoredPictureModel.objects.values_list("name", "references")) == [
+        (target, 1)
+    ]
+
+
+def test_stale_edit_keeps_promoted_picture(media_root: Any) -> None:
+    storage = WishItemModel._meta.get_field("picture").storage
+    picture = faker_image_file()
+    name = storage.save(upload_to_wishlist(None, "upload.png"), picture)
+    wishitem = cast(WishItemModel, WishItemFactory(picture=name))
+    # форма редактирования открыта до того, как задача перевела загрузку
+    stale = WishItemModel.objects.get(pk=wishitem.pk)
+    generate_picture_variants(wishitem.id, name)
+    target = content_name(picture, name)
+
+    stale.title = VarStr.WISHITEM_TITLE
+    stale.save()
+
+    wishitem.refresh_from_db()
+    assert wishitem.title == VarStr.WISHITEM_TITLE
+    assert wishitem.picture.name == target
+    assert list(StoredPictureModel.objects.values_list("name", "references")) == [
+        (target, 1)
+    ]
+
+    stale.picture = ContentFile(faker_image_file().read(), "other.png")
+    stale.save()
+
+    # освобождена картинка из строки, а не из устаревшего снимка
+    assert list(StoredPictureModel.objects.values_list("name", flat=True)) == [
+        stale.picture.name
+    ]
+    assert OrphanedFileModel.objects.filter(name=target).exists()
+
+
+@pytest.mark.parametrize("case", ["foreign", "missing", "not_image"])
+def test_wishitem_form_direct_upload_rejected(media_root: Any, case: str) -> None:
+    user, other = UserFactory.create_batch(2)
+    storage = WishItemModel._meta.get_field("picture").storage
+    name = upload_to_wishlist(None, "upload.png")
+    if case == "not_image":
+        name = storage.save(name, ContentFile(b"<html></html>"))
+    elif case == "foreign":
+        name = storage.save(name, faker_image_file())
+    token = sign_upload(name, (other if case == "foreign" else user).pk)
+
+    form = WishItemForm(
+        data={"title": VarStr.WISHITEM_TITLE, "picture_upload": token},
+        uploader_id=user.pk,
+    )
+
+    assert not form.is_valid()
+    assert "picture_upload" in form.errors
+
+
+# CONTENT-ADDRESSED PICTURES
+def test_identical_pictures_stored_once(
+    media_root: Any, django_capture_on_commit_callbacks: Callable[..., Any]
+) -> None:
+    content = faker_image_file().read()
+    with django_capture_on_commit_callbacks(execute=True):
+        first, second = (
+            cast(WishItemModel, WishItemFactory(picture=ContentFile(content, name)))
+            for name in ("a.PNG", "b.png")
+        )
+    storage = first.picture.storage
+    name = cast(str, first.picture.name)
+
+    assert second.picture.name == name
+    assert storage.listdir(PICTURE_PREFIX)[1] == [name.removeprefix(PICTURE_PREFIX)]
+    assert StoredPictureModel.objects.get(name=name).references == 2
+
+    with django_capture_on_commit_callbacks(execute=True):
+        first.delete()
+    assert storage.exists(name)
+    assert StoredPictureModel.objects.get(name=name).references == 1
+    assert not OrphanedFileModel.objects.exists()
+
+    second.refresh_from_db()
+    variants = list(second.picture_variants["webp"].values())
+    with django_capture_on_commit_callbacks(execute=True):
+        second.delete()
+    assert not storage.exists(name)
+    assert not any(storage.exists(variant) for variant in variants)
+    assert not StoredPictureModel.objects.exists()
+
+
+def test_identical_picture_claimed_from_gc_queue(media_root: Any) -> None:
+    content = faker_image_file().read()
+    first = cast(WishItemModel, WishItemFactory(picture=ContentFile(content, "a.png")))
+    name = cast(str, first.picture.name)
+    first.delete()  # файл в очереди сборщика, сборщик еще не запускался
+    assert OrphanedFileModel.objects.filter(name=name).exists()
+
+    second = cast(WishItemModel, WishItemFactory(picture=ContentFile(content, "b.png")))
+
+    assert second.picture.name == name
+    assert not OrphanedFileModel.objects.filter(name=name).exists()
+    media_tasks.collect_media_garbage()
+    assert second.picture.storage.exists(name)
+
+
+def test_rebuild_picture_references(media_root: Any) -> None:
+    wishitem = cast(WishItemModel, WishItemFactory(picture=faker_image_file()))
+    WishItemModel.objects.filter(pk=wishitem.pk).update(picture="legacy.png")
+    WishItemFactory(picture="legacy.png")
+    StoredPictureModel.objects.all().delete()
+
+    call_command("rebuild_picture_references", stdout=io.StringIO())
+
+    assert dict(StoredPictureModel.objects.values_list("name", "references")) == {
+        "legacy.png": 2
+    }
+
+
+# MEDIA URLS
+def minio_storage(**kwargs: Any) -> MinioStorage:
+    client = Minio(
+        "minio.local:9000", "access", "secret", secure=False, region="us-east-1"
+    )
+    return MinioStorage(client, "media", assume_bucket_exists=True, **kwargs)
+
+
+def test_media_urls_public_bucket() -> None:
+    storage = minio_storage()
+    names = ["wishitems/picture/a b.png", "wishitems/variants/a b.png/320.webp"]
+
+    urls = media_urls([*names, None, ""], storage)
+
+    # склейка строк дает ровно то же, что и хранилище
+    assert urls == {name: storage.url(name) for name in names}
+    assert media_url_epoch(storage) == 0
+    assert media_page_timeout(600, storage) == 600
+
+
+def test_media_urls_presigned_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    storage = minio_storage(presign_urls=True)
+    signed = []
+    presign = storage.client.presigned_get_object
+
+    def counting_presign(*args: Any, **kwargs: Any) -> str:
+        signed.append(args[1])
+        return presign(*args, **kwargs)
+
+    monkeypatch.setattr(storage.client, "presigned_get_object", counting_presign)
+
+    first = media_urls(["a.png", "b.png"], storage)
+    second = media_urls(["a.png", "b.png", "c.png"], storage)
+
+    assert sorted(signed) == ["a.png", "b.png", "c.png"]
+    assert second["a.png"] == first["a.png"]
+    assert "X-Amz-Signature" in second["c.png"]
+    assert media_page_timeout(24 * 3600, storage) == 3600
+
+
+def test_attach_picture_urls(
+    media_root: Any,
+    monkeypatch: pytest.MonkeyPatch,
+    django_capture_on_commit_callbacks: Callable[..., Any],
+) -> None:
+    with django_capture_on_commit_callbacks(execute=True):
+        wishitems = [
+            cast(WishItemModel, WishItemFactory(picture=faker_image_file()))
+            for _ in range(3)
+        ]
+    items = list(WishItemModel.objects.filter(pk__in=[item.pk for item in wishitems]))
+    storage = items[0].picture.storage
+    calls = []
+    url = storage.url
+
+    def counting_url(name: str) -> str:
+        calls.append(name)
+        return url(name)
+
+    monkeypatch.setattr(storage, "url", counting_url)
+
+    attach_picture_urls(items)
+    rendered = [(item.picture_url, item.picture_sources) for item in items]
+
+    assert len(calls) == len({name for item in items for name in item.picture_names()})
+    assert rendered[0][0] == url(items[0].picture.name)
+    assert all(sources for _, sources in rendered)
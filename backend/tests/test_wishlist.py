@@ -2,6 +2,10 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, cast
 
+import base64
+import time
+import uuid
+
 import pytest
 
 from django.urls import reverse
@@ -9,11 +13,15 @@ from django.contrib.auth.models import User
 from django.http import HttpResponse, HttpResponseRedirect
 
 from tests.values import VarStr
+from profiles.models import FollowModel
+from wishitems.cache import WISHLIST_VERSION_TIMEOUT, wishlist_version
 from wishitems.models import WishItemModel
+from wishitems.pagination import WISHLIST_PAGE_SIZE
 from tests.factories import UserFactory, WishItemFactory
 
 if TYPE_CHECKING:
     from django.test import Client
+    from pytest_django import DjangoAssertNumQueries
     from tests.conftest import BasicAssertsTemplate, BasicAssertsReverse
 
 
@@ -99,6 +107,93 @@ def test_wishlist_profile_with_private_view(
     basic_asserts_template(cast(HttpResponse, response), VarStr.WISHILIST_PROFILE_EMPTY)
 
 
+# PAGINATION
+def test_wishlist_my_view_paginated(client: Client) -> None:
+    user = cast(User, UserFactory())
+    WishItemFactory.create_batch(WISHLIST_PAGE_SIZE + 3, profile=user.profile)
+    client.force_login(user)
+
+    response = client.get(reverse("wishlist_me"))
+    assert len(response.context["wishitems"]) == WISHLIST_PAGE_SIZE
+    next_page_url = response.context["next_page_url"]
+    assert next_page_url
+    assert next_page_url.encode() in response.content
+
+    response = client.get(next_page_url)
+    assert response.status_code == 200
+    assert len(response.context["wishitems"]) == 3
+    assert "X-Next-Page" not in response
+
+    titles = [item.title for item in WishItemModel.objects.order_by("title", "id")]
+    assert titles[-1].encode() in response.content
+
+
+def test_wishlist_items_view_keyset_order(client: Client) -> None:
+    user = cast(User, UserFactory())
+    # одинаковые title — порядок держится на id
+    WishItemFactory.create_batch(
+        WISHLIST_PAGE_SIZE * 2 + 1, profile=user.profile, title=VarStr.WISHITEM_TITLE
+    )
+
+    seen: list[WishItemModel] = []
+    url: str | None = reverse("wishlist_items", kwargs={"profile_id": user.profile.id})
+    while url:
+        response = client.get(url)
+        seen.extend(response.context["wishitems"])
+        url = response.get("X-Next-Page")
+
+    assert [item.id for item in seen] == list(
+        WishItemModel.objects.order_by("title", "id").values_list("id", flat=True)
+    )
+
+
+def test_wishlist_items_view_num_queries_flat(
+    client: Client, django_assert_num_queries: DjangoAssertNumQueries
+) -> None:
+    user = cast(User, UserFactory())
+    WishItemFactory.create_batch(WISHLIST_PAGE_SIZE * 3, profile=user.profile)
+
+    url: str | None = reverse("wishlist_items", kwargs={"profile_id": user.profile.id})
+    while url:
+        with django_assert_num_queries(1):
+            response = client.get(url)
+        url = response.get("X-Next-Page")
+
+
+def test_wishlist_items_view_hides_private(client: Client) -> None:
+    user_1, user_2 = UserFactory.create_batch(2)
+    WishItemFactory(profile=user_2.profile, title=VarStr.WISHITEM_TITLE)
+    WishItemFactory(
+        profile=user_2.profile, title=VarStr.WISHITEM_PRIVATE_TITLE, is_private=True
+    )
+    url = reverse("wishlist_items", kwargs={"profile_id": user_2.profile.id})
+
+    client.force_login(user_1)
+    response = client.get(url)
+    assert VarStr.WISHITEM_TITLE.encode() in response.content
+    assert VarStr.WISHITEM_PRIVATE_TITLE.encode() not in response.content
+
+    client.force_login(user_2)
+    response = client.get(url)
+    assert VarStr.WISHITEM_PRIVATE_TITLE.encode() in response.content
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not-a-cursor",
+        base64.urlsafe_b64encode(b'["a", 1]').decode(),
+        base64.urlsafe_b64encode(b'[1, "a"]').decode(),
+        base64.urlsafe_b64encode(b"{}").decode(),
+    ],
+)
+def test_wishlist_items_view_bad_cursor(client: Client, cursor: str) -> None:
+    user = cast(User, UserFactory())
+    url = reverse("wishlist_items", kwargs={"profile_id": user.profile.id})
+    response = client.get(url, {"cursor": cursor})
+    assert response.status_code == 400
+
+
 # ANONYMOUS
 def test_wishlist_profile_empty_view_anon(
     client: Client, basic_asserts_template: BasicAssertsTemplate
@@ -125,3 +220,128 @@ def test_wishlist_profile_view_anon(
     url = reverse("wishlist_profile", kwargs={"profile_id": user.profile.id})
     response = client.get(url)
     basic_asserts_template(cast(HttpResponse, response), VarStr.WISHITEM_TITLE)
+
+
+# PAGE CACHE
+def test_wishlist_profile_view_anon_cached(
+    client: Client, django_assert_num_queries: DjangoAssertNumQueries
+) -> None:
+    user = cast(User, UserFactory())
+    WishItemFactory(title=VarStr.WISHITEM_TITLE, profile=user.profile)
+    url = reverse("wishlist_profile", kwargs={"profile_id": user.profile.id})
+
+    response = client.get(url)
+    assert VarStr.WISHITEM_TITLE.encode() in response.content
+
+    with django_assert_num_queries(0):
+        cached = client.get(url)
+    assert cached.status_code == 200
+    assert cached.content == response.content
+
+
+def test_wishlist_profile_view_anon_cache_invalidation(client: Client) -> None:
+    user_1, user_2 = UserFactory.create_batch(2)
+    url = reverse("wishlist_profile", kwargs={"profile_id": user_2.profile.id})
+    response = client.get(url)
+    assert VarStr.WISHITEM_TITLE.encode() not in response.content
+
+    wishitem = cast(
+        WishItemModel,
+        WishItemFactory(title=VarStr.WISHITEM_TITLE, profile=user_2.profile),
+    )
+    response = client.get(url)
+    assert VarStr.WISHITEM_TITLE.encode() in response.content
+
+    wishitem.is_private = True
+    wishitem.save()
+    response = client.get(url)
+    assert VarStr.WISHITEM_TITLE.encode() not in response.content
+
+    user_2.first_name = VarStr.USER_NAME
+    user_2.save()
+    response = client.get(url)
+    assert VarStr.USER_NAME.encode() in response.content
+
+
+def test_wishlist_profile_view_cache_bumped_by_follow(client: Client) -> None:
+    user_1, user_2 = UserFactory.create_batch(2)
+    url = reverse("wishlist_profile", kwargs={"profile_id": user_2.profile.id})
+    client.get(url)
+    version = wishlist_version(user_2.profile.id)
+
+    FollowModel.objects.create(  # pyright: ignore[reportAttributeAccessIssue]
+        follower=user_1.profile, following=user_2.profile
+    )
+    assert wishlist_version(user_2.profile.id) != version
+
+
+def test_wishlist_version_expires(
+    client: Client, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    profile_id = uuid.uuid4()
+    url = reverse("wishlist_profile", kwargs={"profile_id": profile_id})
+    assert client.get(url).status_code == 404
+    version = wishlist_version(profile_id)
+
+    later = time.time() + WISHLIST_VERSION_TIMEOUT + 1
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    # перебор несуществующих профилей не копит в кэше вечные ключи,
+    # а новая версия после вытеснения не совпадает со старой
+    assert wishlist_version(profile_id) > version
+
+
+def test_wishlist_profile_view_auth_not_cached(client: Client) -> None:
+    user_1, user_2 = UserFactory.create_batch(2)
+    url = reverse("wishlist_profile", kwargs={"profile_id": user_2.profile.id})
+    client.get(url)
+
+    client.force_login(user_1)
+    response = client.get(url)
+    assert "подписаться".encode() in response.content
+
+
+# CONDITIONAL GET
+def test_wishlist_profile_view_anon_not_modified(
+    client: Client, django_assert_num_queries: DjangoAssertNumQueries
+) -> None:
+    user = cast(User, UserFactory())
+    url = reverse("wishlist_profile", kwargs={"profile_id": user.profile.id})
+
+    response = client.get(url)
+    etag = response["ETag"]
+
+    with django_assert_num_queries(0):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+
+    WishItemFactory(profile=user.profile)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def test_wishlist_profile_view_not_modified(client: Client) -> None:
+    user_1, user_2 = UserFactory.create_batch(2)
+    wishitem_1, _ = WishItemFactory.create_batch(2, profile=user_2.profile)
+    url = reverse("wishlist_profile", kwargs={"profile_id": user_2.profile.id})
+    client.force_login(user_1)
+    client.get(url)  # первый ответ выставляет csrf-cookie, она входит в ETag
+
+    response = client.get(url)
+    etag, last_modified = response["ETag"], response["Last-Modified"]
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    response = client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == 304
+
+    # удаление не двигает max(updated_at), но меняет количество
+    wishitem_1.delete()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    etag = response["ETag"]
+
+    client.post(reverse("follow_create", kwargs={"profile_id": user_2.profile.id}))
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
@@ -0,0 +1,40 @@
+import time
+import uuid
+
+from django.core.cache import cache
+
+
+WISHLIST_PAGE_CACHE_TIMEOUT: int = 60 * 60 * 24
+# версия живет дольше страниц, чтобы не сбрасывать их раньше срока, но не вечно:
+# ключ появляется и на запрос несуществующего профиля
+WISHLIST_VERSION_TIMEOUT: int = WISHLIST_PAGE_CACHE_TIMEOUT * 2
+
+
+def _version_key(profile_id: uuid.UUID) -> str:
+    return f"wishlist:version:{profile_id}"
+
+
+def wishlist_version(profile_id: uuid.UUID) -> int:
+    # стартуем со времени, а не с 1: если ключ версии вытеснят из кэша,
+    # старые страницы не воскреснут под совпавшей версией
+    version = cache.get(_version_key(profile_id))
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(
+            _version_key(profile_id), version, timeout=WISHLIST_VERSION_TIMEOUT
+        ):
+            version = cache.get(_version_key(profile_id), version)
+    return int(version)
+
+
+def bump_wishlist_version(profile_id: uuid.UUID) -> None:
+    try:
+        cache.incr(_version_key(profile_id))
+    except ValueError:
+        cache.set(
+            _version_key(profile_id), time.time_ns(), timeout=WISHLIST_VERSION_TIMEOUT
+        )
+
+
+def wishlist_page_key(profile_id: uuid.UUID, version: int) -> str:
+    return f"wishlist:page:{profile_id}:{version}"
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, cast
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.db.models import Count, Exists, Max, OuterRef, Q
+from django.http import HttpRequest, HttpResponse, HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from profiles.models import FollowModel, ProfileModel
+
+from .media import media_url_epoch
+from .models import WishItemModel
+
+
+Validators = tuple[str, datetime | None]
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return quote_etag(digest)
+
+
+def viewer_key(request: HttpRequest) -> tuple[Any, ...]:
+    # страница зависит от того, кто смотрит: шапка, кнопки и csrf-токен.
+    # У анонимов токен тоже есть — в форме брони; вход и выход его меняют
+    return request.user.pk, request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+
+
+def not_modified(
+    request: HttpRequest, etag: str, last_modified: datetime | None = None
+) -> HttpResponseBase | None:
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def set_validators(
+    response: HttpResponseBase, etag: str, last_modified: datetime | None = None
+) -> None:
+    if response.status_code not in (200, 304):
+        return
+    response.headers.setdefault("ETag", etag)
+    if last_modified:
+        response.headers.setdefault(
+            "Last-Modified", http_date(last_modified.timestamp())
+        )
+
+
+def wishlist_validators(
+    request: HttpRequest, profile_id: uuid.UUID
+) -> Validators | None:
+    viewer_id = request.user.pk or 0
+    visible = Q(wishitems__is_private=False) | Q(user_id=viewer_id)
+
+    # count нужен для удалений: max(updated_at) их не замечает
+    row = (
+        ProfileModel.objects.filter(id=profile_id)
+        .values("id", "updated_at", "user__first_name")
+        .annotate(
+            items_updated_at=Max("wishitems__updated_at", filter=visible),
+            items_count=Count("wishitems", filter=visible),
+            follows=Exists(
+                FollowModel.objects.filter(  # pyright: ignore[reportAttributeAccessIssue]
+                    follower__user_id=viewer_id, following=OuterRef("pk")
+                )
+            ),
+        )
+        .first()
+    )
+    if row is None:
+        return None
+
+    last_modified = max(filter(None, (row["updated_at"], row["items_updated_at"])))
+    return make_etag(
+        viewer_key(request), media_url_epoch(), *row.values()
+    ), last_modified
+
+
+def wishitem_validators(
+    request: HttpRequest, wishitem_id: uuid.UUID
+) -> Validators | None:
+    row = (
+        WishItemModel.objects.filter(id=wishitem_id)
+        .values("updated_at", "reserved_id", "profile__updated_at")
+        .first()
+    )
+    if row is None:
+        return None
+
+    last_modified = max(row["updated_at"], row["profile__updated_at"])
+    return make_etag(
+        viewer_key(request), media_url_epoch(), *row.values()
+    ), last_modified
+
+
+class ConditionalGetMixin:
+    request: HttpRequest
+
+    def get_validators(self) -> Validators | None:
+        raise NotImplementedError
+
+    def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        validators = self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)  # type: ignore[misc, no-any-return]
+
+        response = cast(HttpResponse | None, not_modified(request, *validators))
+        if response is None:
+            response = super().get(request, *args, **kwargs)  # type: ignore[misc]
+        set_validators(response, *validators)
+        return response
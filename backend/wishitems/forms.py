@@ -1,9 +1,15 @@
-from typing import cast
+from typing import Any, cast
+
+import io
+
 from django import forms
+from django.core import signing
 from django.forms.widgets import ClearableFileInput
+from PIL import Image
 
 from profiles.models import ProfileModel
 
+from .media import PICTURE_UPLOAD_MAX_SIZE, inspect_upload, unsign_upload
 from .models import WishItemModel
 
 
@@ -17,6 +23,9 @@ class CustomClearableFileInput(ClearableFileInput):
 
 
 class WishItemForm(forms.ModelForm):  # type: ignore[type-arg]
+    # токен файла, который браузер сам загрузил в MinIO по presigned POST
+    picture_upload = forms.CharField(required=False, widget=forms.HiddenInput())
+
     class Meta:
         model = WishItemModel
         labels = {
@@ -33,6 +42,10 @@ class WishItemForm(forms.ModelForm):  # type: ignore[type-arg]
             "profile",
             "reserved",
             "reserved_at",
+            "picture_width",
+            "picture_height",
+            "picture_blurhash",
+            "picture_variants",
             "created_at",
             "updated_at",
         ]
@@ -46,12 +59,41 @@ class WishItemForm(forms.ModelForm):  # type: ignore[type-arg]
             "is_private": forms.CheckboxInput(),
         }
 
+    def __init__(self, *args: Any, uploader_id: int | None = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.uploader_id = uploader_id
+
+    def clean_picture_upload(self) -> str:
+        token = self.cleaned_data["picture_upload"]
+        if not token:
+            return ""
+
+        try:
+            name = unsign_upload(token, self.uploader_id)
+            size, head = inspect_upload(self.instance.picture.storage, name)
+        except (signing.BadSignature, FileNotFoundError):
+            raise forms.ValidationError(
+                "Изображение не загрузилось, попробуйте еще раз"
+            )
+
+        if size > PICTURE_UPLOAD_MAX_SIZE:
+            raise forms.ValidationError("Изображение слишком большое")
+        try:
+            with Image.open(io.BytesIO(head)):
+                pass
+        except Exception:
+            raise forms.ValidationError("Загрузите правильное изображение")
+        return name
+
     def save(
         self,
         commit: bool = True,
         profile: ProfileModel | None = None,
     ) -> WishItemModel:
         instance = super().save(commit=False)
+        if self.cleaned_data.get("picture_upload"):
+            # файл уже лежит в хранилище, FileField его повторно не загружает
+            instance.picture = self.cleaned_data["picture_upload"]
         if profile:
             instance.profile = profile
         if commit:
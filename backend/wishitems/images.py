@@ -0,0 +1,124 @@
+from dataclasses import dataclass, field
+from typing import IO
+
+import io
+import math
+
+from PIL import Image, ImageOps, features
+
+
+# карточки вишлиста — 250px в высоту, 640 покрывает 2x-экраны
+PICTURE_VARIANT_WIDTHS: tuple[int, ...] = (320, 640)
+PICTURE_VARIANT_FORMATS: dict[str, dict[str, int]] = {
+    "avif": {"quality": 55},
+    "webp": {"quality": 80, "method": 6},
+}
+
+_BLURHASH_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+_BLURHASH_SAMPLE = 32
+
+
+@dataclass
+class Rendition:
+    width: int
+    height: int
+    blurhash: str
+    # формат -> ширина -> байты
+    files: dict[str, dict[int, bytes]] = field(default_factory=dict)
+
+
+def render_variants(file: IO[bytes]) -> Rendition:
+    with Image.open(file) as original:
+        # телефоны пишут поворот в EXIF, браузер в <img> его учитывает, а Pillow нет
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+    rendition = Rendition(image.width, image.height, blurhash(image))
+    # не увеличиваем: маленькая картинка получает один вариант в своем размере
+    widths = [width for width in PICTURE_VARIANT_WIDTHS if width < image.width]
+    widths = widths or [image.width]
+
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt, options in PICTURE_VARIANT_FORMATS.items():
+            if not features.check(fmt):
+                continue
+            buffer = io.BytesIO()
+            resized.save(buffer, fmt.upper(), **options)
+            rendition.files.setdefault(fmt, {})[width] = buffer.getvalue()
+    return rendition
+
+
+def _encode83(value: int, length: int) -> str:
+    return "".join(
+        _BLURHASH_CHARS[value // 83 ** (length - i) % 83] for i in range(1, length + 1)
+    )
+
+
+def _to_linear(value: int) -> float:
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _to_srgb(value: float) -> int:
+    v = min(1.0, max(0.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exp: float) -> float:
+    return math.copysign(abs(value) ** exp, value)
+
+
+def blurhash(image: Image.Image, x_components: int = 4, y_components: int = 3) -> str:
+    # https://github.com/woltapp/blurhash/blob/master/Algorithm.md
+    # косинусное разложение по уменьшенной копии: точность тут не нужна
+    sample = image.convert("RGB")
+    sample.thumbnail((_BLURHASH_SAMPLE, _BLURHASH_SAMPLE))
+    width, height = sample.size
+    linear = [_to_linear(channel) for channel in range(256)]
+    data = sample.tobytes()
+    pixels = [
+        (linear[data[k]], linear[data[k + 1]], linear[data[k + 2]])
+        for k in range(0, len(data), 3)
+    ]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                cos_y = math.cos(math.pi * j * y / height)
+                for x in range(width):
+                    basis = cos_y * math.cos(math.pi * i * x / width)
+                    pr, pg, pb = pixels[y * width + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = normalisation / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(value) for factor in ac for value in factor)
+        quantised_max = max(0, min(82, math.floor(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max, max_value = 0, 1.0
+    result += _encode83(quantised_max, 1)
+
+    r, g, b = (_to_srgb(value) for value in dc)
+    result += _encode83((r << 16) + (g << 8) + b, 4)
+
+    for factor in ac:
+        qr, qg, qb = (
+            max(0, min(18, math.floor(_sign_pow(value / max_value, 0.5) * 9 + 9.5)))
+            for value in factor
+        )
+        result += _encode83(qr * 19 * 19 + qg * 19 + qb, 2)
+    return result
@@ -0,0 +1,37 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+
+def rebuild_references(
+    wishitem_model: type[models.Model], stored_picture_model: type[models.Model]
+) -> int:
+    # модели передаются снаружи, чтобы функцию можно было звать из миграций
+    counts = (
+        wishitem_model._default_manager.exclude(picture="")
+        .exclude(picture__isnull=True)
+        .order_by()
+        .values("picture")
+        .annotate(count=models.Count("pk"))
+    )
+    stored_picture_model._default_manager.all().delete()
+    stored = stored_picture_model._default_manager.bulk_create(
+        [
+            stored_picture_model(name=row["picture"], references=row["count"])
+            for row in counts.iterator()
+        ],
+        batch_size=1000,
+    )
+    return len(stored)
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает число ссылок на файлы картинок"
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        from wishitems.models import StoredPictureModel, WishItemModel
+
+        with transaction.atomic():
+            stored = rebuild_references(WishItemModel, StoredPictureModel)
+        self.stdout.write(self.style.SUCCESS(f"Картинок в учете: {stored}"))
@@ -0,0 +1,236 @@
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta
+from typing import Any
+from urllib.parse import quote
+
+import hashlib
+import posixpath
+import time
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.base import File
+from django.core.files.storage import Storage, default_storage
+from django.utils import timezone
+from minio.commonconfig import CopySource
+from minio.datatypes import PostPolicy
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+from minio_storage.storage import MinioStorage
+
+
+PICTURE_PREFIX: str = "wishitems/picture/"
+# варианты лежат в каталоге с именем исходника: владелец находится без запросов
+VARIANTS_PREFIX: str = "wishitems/variants/"
+
+# S3 DeleteObjects принимает не больше 1000 ключей за запрос
+MEDIA_GC_BATCH_SIZE: int = 1000
+# даем удалениям накопиться, чтобы каскад из сотен желаний ушел одной пачкой
+MEDIA_GC_DELAY: int = 30
+
+_MEDIA_GC_SCHEDULED_KEY = "media_gc:scheduled"
+
+PICTURE_UPLOAD_MAX_SIZE: int = 10 * 1024 * 1024
+PICTURE_UPLOAD_TYPES: dict[str, str] = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+    "image/avif": "avif",
+}
+# столько живет подпись POST-формы: за это время браузер должен начать загрузку
+PICTURE_UPLOAD_EXPIRES: timedelta = timedelta(minutes=15)
+# токен загрузки должен истечь раньше, чем сборщик утечек сочтет файл ничьим
+PICTURE_UPLOAD_TOKEN_MAX_AGE: timedelta = timedelta(hours=6)
+# Pillow определяет формат и размеры по заголовку, весь файл не нужен
+PICTURE_UPLOAD_HEAD_SIZE: int = 64 * 1024
+
+_UPLOAD_SALT = "wishitems.media.upload"
+
+# срок жизни подписанной ссылки на картинку
+PRESIGNED_URL_TTL: timedelta = timedelta(hours=6)
+# из кэша отдаем только ссылки, которым осталось жить не меньше этого;
+# страницы с такими ссылками тоже нельзя держать дольше
+PRESIGNED_URL_MIN_LIFETIME: timedelta = timedelta(hours=1)
+
+
+def content_name(content: "File[Any]", filename: str) -> str:
+    # одинаковые байты получают одно имя: файл хранится один раз
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    ext = posixpath.splitext(filename)[1].lower().lstrip(".")
+    ext = {"jpeg": "jpg", "": "bin"}.get(ext, ext)
+    return f"{PICTURE_PREFIX}{digest.hexdigest()}.{ext}"
+
+
+def is_content_name(name: str) -> bool:
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    return name.startswith(PICTURE_PREFIX) and len(stem) == 64
+
+
+def copy_file(storage: Storage, source: str, target: str) -> None:
+    # копия внутри бакета: байты не проходят через воркер
+    if isinstance(storage, MinioStorage):
+        storage.client.copy_object(
+            storage.bucket_name, target, CopySource(storage.bucket_name, source)
+        )
+        return
+    with storage.open(source) as file:
+        storage.save(target, file)
+
+
+def variant_name(picture_name: str, width: int, fmt: str) -> str:
+    return f"{VARIANTS_PREFIX}{posixpath.basename(picture_name)}/{width}.{fmt}"
+
+
+def owner_picture_name(name: str) -> str:
+    # для варианта — имя исходной картинки, для самой картинки — она же
+    if name.startswith(VARIANTS_PREFIX):
+        return PICTURE_PREFIX + name.removeprefix(VARIANTS_PREFIX).split("/")[0]
+    return name
+
+
+def _is_presigned(storage: Storage) -> bool:
+    return isinstance(storage, MinioStorage) and storage.presign_urls
+
+
+def media_urls(
+    names: Iterable[str | None], storage: Storage = default_storage
+) -> dict[str, str]:
+    # ссылки на всю сетку разом: публичный бакет — склейка строк,
+    # приватный — подписи из кэша одним get_many, подписываем только промахи
+    wanted = {name for name in names if name}
+    if not isinstance(storage, MinioStorage):
+        return {name: storage.url(name) for name in wanted}
+
+    if not storage.presign_urls:
+        base = storage.base_url or f"{storage.endpoint_url}/{storage.bucket_name}"
+        base = base.rstrip("/") + "/"
+        return {name: base + quote(name.lstrip("/")) for name in wanted}
+
+    keys = {f"media:url:{name}": name for name in wanted}
+    urls = {keys[key]: url for key, url in cache.get_many(list(keys)).items()}
+    missing = {
+        key: storage.url(name, max_age=PRESIGNED_URL_TTL)
+        for key, name in keys.items()
+        if name not in urls
+    }
+    if missing:
+        timeout = PRESIGNED_URL_TTL - PRESIGNED_URL_MIN_LIFETIME
+        cache.set_many(missing, timeout=int(timeout.total_seconds()))
+        urls.update((keys[key], url) for key, url in missing.items())
+    return urls
+
+
+def media_url_epoch(storage: Storage = default_storage) -> int:
+    # меняется, когда закэшированные ссылки могли устареть: входит в ETag страниц
+    if not _is_presigned(storage):
+        return 0
+    return int(time.time() // PRESIGNED_URL_MIN_LIFETIME.total_seconds())
+
+
+def media_page_timeout(timeout: int, storage: Storage = default_storage) -> int:
+    if not _is_presigned(storage):
+        return timeout
+    return min(timeout, int(PRESIGNED_URL_MIN_LIFETIME.total_seconds()))
+
+
+def presigned_upload(
+    storage: Storage, name: str, content_type: str
+) -> dict[str, Any] | None:
+    # None — хранилище не умеет прямые загрузки, браузер шлет файл через форму
+    if not isinstance(storage, MinioStorage):
+        return None
+
+    policy = PostPolicy(storage.bucket_name, timezone.now() + PICTURE_UPLOAD_EXPIRES)
+    policy.add_equals_condition("key", name)
+    policy.add_equals_condition("Content-Type", content_type)
+    policy.add_content_length_range_condition(1, PICTURE_UPLOAD_MAX_SIZE)
+    fields = storage.client.presigned_post_policy(policy)
+
+    bucket_url = storage.base_url or f"{storage.endpoint_url}/{storage.bucket_name}"
+    return {
+        "url": bucket_url.rstrip("/") + "/",
+        "fields": {**fields, "key": name, "Content-Type": content_type},
+    }
+
+
+def sign_upload(name: str, user_id: int) -> str:
+    return signing.dumps({"name": name, "user": user_id}, salt=_UPLOAD_SALT)
+
+
+def unsign_upload(token: str, user_id: int | None) -> str:
+    # ключ выдан конкретному пользователю: чужой токен не подцепит чужой файл
+    data = signing.loads(token, salt=_UPLOAD_SALT, max_age=PICTURE_UPLOAD_TOKEN_MAX_AGE)
+    if data.get("user") != user_id or not str(data.get("name", "")).startswith(
+        PICTURE_PREFIX
+    ):
+        raise signing.BadSignature("Загрузка выдана другому пользователю")
+    return str(data["name"])
+
+
+def inspect_upload(storage: Storage, name: str) -> tuple[int, bytes]:
+    # размер и начало файла без скачивания целиком
+    if not isinstance(storage, MinioStorage):
+        with storage.open(name) as file:
+            return storage.size(name), file.read(PICTURE_UPLOAD_HEAD_SIZE)
+
+    try:
+        size = storage.client.stat_object(storage.bucket_name, name).size or 0
+        response = storage.client.get_object(
+            storage.bucket_name, name, length=PICTURE_UPLOAD_HEAD_SIZE
+        )
+    except S3Error as error:
+        raise FileNotFoundError(name) from error
+    try:
+        return size, response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def delete_files(storage: Storage, names: Iterable[str]) -> list[str]:
+    # возвращает имена, которые удалить не получилось
+    if isinstance(storage, MinioStorage):
+        errors = storage.client.remove_objects(
+            storage.bucket_name, (DeleteObject(name) for name in names)
+        )
+        # remove_objects ленивый: запросы уходят только при обходе ошибок
+        return [error.name for error in errors if error.name]
+
+    failed = []
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            failed.append(name)
+    return failed
+
+
+def list_files(storage: Storage, prefix: str) -> Iterator[tuple[str, datetime]]:
+    if isinstance(storage, MinioStorage):
+        objects = storage.client.list_objects(
+            storage.bucket_name, prefix=prefix, recursive=True
+        )
+        for obj in objects:
+            if not obj.is_dir and obj.object_name and obj.last_modified:
+                yield obj.object_name, obj.last_modified
+        return
+
+    if not storage.exists(prefix):
+        return
+    dirs, files = storage.listdir(prefix)
+    for file in files:
+        name = posixpath.join(prefix, file)
+        yield name, storage.get_modified_time(name)
+    for directory in dirs:
+        yield from list_files(storage, posixpath.join(prefix, directory))
+
+
+def schedule_media_gc() -> None:
+    # одна отложенная задача на окно MEDIA_GC_DELAY, сколько бы файлов ни пришло
+    if cache.add(_MEDIA_GC_SCHEDULED_KEY, 1, timeout=MEDIA_GC_DELAY):
+        from tasks.media import collect_media_garbage
+
+        collect_media_garbage.apply_async(countdown=MEDIA_GC_DELAY)
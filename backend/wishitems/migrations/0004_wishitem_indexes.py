@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from yourmirror.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # индексы строятся CONCURRENTLY, а это невозможно внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ("profiles", "0002_profilemodel_counters"),
+        ("wishitems", "0003_alter_wishitemmodel_reserved_at"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="wishitemmodel",
+            index=models.Index(
+                fields=["profile", "title", "id"], name="wishitem_profile_title_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="wishitemmodel",
+            index=models.Index(
+                condition=models.Q(("is_private", False)),
+                fields=["profile", "title", "id"],
+                name="wishitem_public_title_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="wishitemmodel",
+            index=models.Index(
+                condition=models.Q(("reserved__isnull", False)),
+                fields=["profile"],
+                name="wishitem_reserved_idx",
+            ),
+        ),
+        # индекс FK по profile_id покрыт wishitem_profile_title_idx;
+        # удаляем только после того, как тот построен
+        migrations.AlterField(
+            model_name="wishitemmodel",
+            name="profile",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="wishitems",
+                to="profiles.profilemodel",
+            ),
+        ),
+    ]
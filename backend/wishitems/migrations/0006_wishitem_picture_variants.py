@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("wishitems", "0005_orphanedfilemodel"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="wishitemmodel",
+            name="picture_blurhash",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="wishitemmodel",
+            name="picture_height",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="wishitemmodel",
+            name="picture_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="wishitemmodel",
+            name="picture_width",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:14
+
+from django.db import migrations, models
+
+from wishitems.management.commands.rebuild_picture_references import (
+    rebuild_references,
+)
+
+
+def fill_references(apps, schema_editor):  # type: ignore[no-untyped-def]
+    rebuild_references(
+        apps.get_model("wishitems", "WishItemModel"),
+        apps.get_model("wishitems", "StoredPictureModel"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("wishitems", "0006_wishitem_picture_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredPictureModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("references", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(fill_references, migrations.RunPython.noop),
+    ]
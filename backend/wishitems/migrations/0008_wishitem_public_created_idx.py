@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+from yourmirror.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("profiles", "0003_profile_follow_digest_at"),
+        ("wishitems", "0007_storedpicturemodel"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="wishitemmodel",
+            index=models.Index(
+                condition=models.Q(("is_private", False)),
+                fields=["profile", "created_at"],
+                name="wishitem_public_created_idx",
+            ),
+        ),
+    ]
@@ -1,17 +1,34 @@
+from collections.abc import Collection, Iterable
 from typing import Any
 
+import math
 import uuid
 
-from django.db import models
-from django.db.models.signals import pre_save, post_delete
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.db.models.signals import pre_delete, post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from profiles.models import ProfileModel
+from profiles.models import FollowModel, ProfileModel, adjust_counters
 
+from .cache import bump_wishlist_version
+from .images import PICTURE_VARIANT_FORMATS
+from .media import PICTURE_PREFIX, content_name, media_urls, schedule_media_gc
 
-def upload_to_wishlist(instance: "WishItemModel", filename: str) -> str:
+
+PICTURE_CARD_HEIGHT: int = 250
+PICTURE_GENERATED_FIELDS: tuple[str, ...] = (
+    "picture_width",
+    "picture_height",
+    "picture_blurhash",
+    "picture_variants",
+)
+
+
+def upload_to_wishlist(instance: "WishItemModel | None", filename: str) -> str:
     ext = filename.split(".")[-1]
-    return f"wishitems/picture/{uuid.uuid4()}.{ext}"
+    return f"{PICTURE_PREFIX}{uuid.uuid4()}.{ext}"
 
 
 class WishItemModel(models.Model):
@@ -26,6 +43,12 @@ class WishItemModel(models.Model):
     description = models.TextField(blank=True)
     link = models.URLField(blank=True)
     picture = models.ImageField(upload_to=upload_to_wishlist, blank=True, null=True)
+    # заполняет tasks.images.generate_picture_variants после загрузки картинки
+    picture_width = models.PositiveIntegerField(null=True, blank=True)
+    picture_height = models.PositiveIntegerField(null=True, blank=True)
+    picture_blurhash = models.CharField(max_length=64, blank=True)
+    # {"webp": {"320": "wishitems/variants/...", ...}, "avif": {...}}
+    picture_variants = models.JSONField(default=dict, blank=True)
     price = models.CharField(max_length=100, blank=True)
     price_currency = models.CharField(choices=PRICE_CURRENCY_CHOICES, blank=True)
 
@@ -33,6 +56,8 @@ class WishItemModel(models.Model):
         ProfileModel,
         on_delete=models.CASCADE,
         related_name="wishitems",
+        # поиск по profile_id идет по wishitem_profile_title_idx
+        db_index=False,
     )
 
     reserved = models.ForeignKey(
@@ -45,8 +70,204 @@ class WishItemModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    _loaded_values: dict[str, Any]
+    _picture_urls: dict[str, str]
+
     class Meta:
         ordering = ["title"]
+        indexes = [
+            # вишлист владельца и keyset-пагинация по (title, id)
+            models.Index(
+                fields=["profile", "title", "id"], name="wishitem_profile_title_idx"
+            ),
+            # публичный вишлист: приватные желания в индекс не попадают
+            models.Index(
+                fields=["profile", "title", "id"],
+                condition=models.Q(is_private=False),
+                name="wishitem_public_title_idx",
+            ),
+            models.Index(
+                fields=["profile"],
+                condition=models.Q(reserved__isnull=False),
+                name="wishitem_reserved_idx",
+            ),
+            # новые публичные желания для сводки подписок
+            models.Index(
+                fields=["profile", "created_at"],
+                condition=models.Q(is_private=False),
+                name="wishitem_public_created_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(
+        cls,
+        db: str | None,
+        field_names: Collection[str],
+        values: Collection[Any],
+        **kwargs: Any,
+    ) -> "WishItemModel":
+        instance = super().from_db(db, field_names, values, **kwargs)
+        # состояние из БД: по нему сигналы понимают, что именно поменял save()
+        instance._loaded_values = {
+            name: value
+            for name, value in zip(field_names, values)
+            if value is not models.DEFERRED
+        }
+        return instance
+
+    def picture_changed(self) -> bool:
+        if "picture" in self.get_deferred_fields():
+            return False
+        return getattr(self, "_loaded_values", {}).get("picture") != self.picture.name
+
+    def store_picture(self) -> None:
+        # новая загрузка кладется под хэшем содержимого; если такие байты уже
+        # есть в хранилище, загрузки нет вовсе, FileField увидит _committed
+        file = self.picture
+        if not file or file._committed:  # type: ignore[attr-defined]
+            return
+        name = content_name(file, file.name or "")
+        claim_file(name)
+        if not file.storage.exists(name):
+            name = file.storage.save(name, file.file)
+        file.name = name
+        file._committed = True  # type: ignore[attr-defined]
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        self.store_picture()
+        if self._state.adding or not self.picture_changed():
+            self._save_fields(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                self._lock_stored_picture()
+                self._save_fields(*args, **kwargs)
+        # сигналы уже отработали по старому снимку, теперь сохраненное — новая база
+        self._update_snapshot()
+
+    def _save_fields(self, *args: Any, **kwargs: Any) -> None:
+        if self.picture_changed():
+            # варианты и размеры старой картинки новой не подходят
+            self.picture_width = self.picture_height = None
+            self.picture_blurhash = ""
+            self.picture_variants = {}
+        elif not self._state.adding and kwargs.get("update_fields") is None:
+            # эти поля пишет фоновая задача: устаревший экземпляр их не затирает.
+            # Картинку тоже — задача переводит прямую загрузку на хэш-имя
+            skipped = {
+                "picture",
+                *PICTURE_GENERATED_FIELDS,
+                *self.get_deferred_fields(),
+            }
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+    def _lock_stored_picture(self) -> None:
+        # снимок мог устареть: пока форма была открыта, задача вариантов перевела
+        # картинку на хэш-имя. Освобождать надо то, что лежит в строке сейчас,
+        # а блокировка не дает задаче сделать это между чтением и записью
+        stored = (
+            type(self)
+            ._base_manager.select_for_update()
+            .filter(pk=self.pk)
+            .values("picture", "picture_variants")
+            .first()
+        )
+        if stored is not None:
+            self._loaded_values = {**getattr(self, "_loaded_values", {}), **stored}
+
+    def refresh_from_db(self, *args: Any, **kwargs: Any) -> None:
+        # значения копируются мимо from_db, снимок сам не обновится
+        super().refresh_from_db(*args, **kwargs)
+        self._update_snapshot()
+
+    def _update_snapshot(self) -> None:
+        deferred = self.get_deferred_fields()
+        snapshot = {
+            name: getattr(self, name)
+            for name in ("is_private", "reserved_id", "picture", "picture_variants")
+            if name not in deferred
+        }
+        if "picture" in snapshot:
+            snapshot["picture"] = snapshot["picture"].name
+        self._loaded_values = {**getattr(self, "_loaded_values", {}), **snapshot}
+
+    def reserve(self, profile: ProfileModel) -> bool:
+        # compare-and-set: выигрывает только тот, кто застал reserved IS NULL
+        return self._set_reserved(profile, models.Q(reserved__isnull=True))
+
+    def unreserve(self, profile: ProfileModel) -> bool:
+        return self._set_reserved(None, models.Q(reserved=profile))
+
+    def _set_reserved(self, profile: ProfileModel | None, expected: models.Q) -> bool:
+        now = timezone.now()
+        with transaction.atomic():
+            won = bool(
+                WishItemModel.objects.filter(expected, pk=self.pk).update(
+                    reserved=profile, reserved_at=now, updated_at=now
+                )
+            )
+            if won:
+                # update() не шлет сигналов: счетчик и версию кэша двигаем сами
+                adjust_counters(
+                    self.profile_id,
+                    wishitems_reserved_count=1 if profile else -1,
+                )
+                bump_wishlist_version(self.profile_id)
+
+        if won:
+            self.reserved = profile
+            self.reserved_at = self.updated_at = now
+            if hasattr(self, "_loaded_values"):
+                self._loaded_values["reserved_id"] = self.reserved_id
+        return won
+
+    def picture_names(self) -> list[str]:
+        names = [self.picture.name, *_variant_names(self.picture_variants)]
+        return [name for name in names if name]
+
+    def media_url(self, name: str) -> str:
+        # сетки проставляют ссылки пачкой через attach_picture_urls,
+        # одиночное желание считает свои при первом обращении
+        urls = getattr(self, "_picture_urls", None)
+        if urls is None or name not in urls:
+            urls = self._picture_urls = media_urls(
+                self.picture_names(), self.picture.storage
+            )
+        return urls[name]
+
+    @property
+    def picture_url(self) -> str:
+        return self.media_url(self.picture.name) if self.picture.name else ""
+
+    @property
+    def picture_sources(self) -> list[tuple[str, str]]:
+        # для <source>: avif первым, браузер берет первый поддерживаемый тип
+        return [
+            (
+                f"image/{fmt}",
+                ", ".join(
+                    f"{self.media_url(name)} {width}w"
+                    for width, name in sorted(
+                        self.picture_variants[fmt].items(), key=lambda v: int(v[0])
+                    )
+                ),
+            )
+            for fmt in PICTURE_VARIANT_FORMATS
+            if self.picture_variants.get(fmt)
+        ]
+
+    @property
+    def picture_sizes(self) -> str:
+        # карточка фиксирована по высоте, ширина картинки следует из пропорций
+        if not (self.picture_width and self.picture_height):
+            return f"{PICTURE_CARD_HEIGHT}px"
+        width = PICTURE_CARD_HEIGHT * self.picture_width / self.picture_height
+        return f"{math.ceil(width)}px"
 
     @property
     def get_price(self) -> str:
@@ -56,27 +277,193 @@ class WishItemModel(models.Model):
         return f"<WishItemModel {self.title}>"
 
 
-@receiver(pre_save, sender=WishItemModel)
-def delete_old_picture_on_update(
-    sender: WishItemModel, instance: WishItemModel, **kwargs: Any
+def attach_picture_urls(wishitems: Iterable[WishItemModel]) -> None:
+    wishitems = list(wishitems)
+    urls = media_urls(
+        (name for wishitem in wishitems for name in wishitem.picture_names()),
+        WishItemModel._meta.get_field("picture").storage,
+    )
+    for wishitem in wishitems:
+        wishitem._picture_urls = urls
+
+
+class OrphanedFileModel(models.Model):
+    # файлы, на которые больше не ссылается ни одна запись; строка пишется
+    # в той же транзакции, что и удаление, а сами файлы пачками удаляет
+    # tasks.media.collect_media_garbage
+    name = models.CharField(max_length=255, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"<OrphanedFileModel {self.name}>"
+
+
+def discard_files(names: Iterable[str | None]) -> None:
+    orphans = [OrphanedFileModel(name=name) for name in set(names) if name]
+    if orphans:
+        OrphanedFileModel.objects.bulk_create(orphans, ignore_conflicts=True)
+        transaction.on_commit(schedule_media_gc)
+
+
+def claim_file(name: str) -> None:
+    # те же байты могли ждать сборщика: снимаем имя с очереди до проверки
+    # хранилища. Если сборщик уже держит строку, DELETE дождется его коммита,
+    # и exists() после этого честно скажет, что файла больше нет
+    OrphanedFileModel.objects.filter(name=name).delete()
+
+
+def _variant_names(variants: dict[str, dict[str, str]]) -> list[str]:
+    return [name for widths in variants.values() for name in widths.values()]
+
+
+class StoredPictureModel(models.Model):
+    # картинки адресуются хэшем содержимого и делятся между желаниями;
+    # файл удаляется, только когда уходит последняя ссылка
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"<StoredPictureModel {self.name} x{self.references}>"
+
+
+def acquire_picture(name: str) -> None:
+    stored = StoredPictureModel.objects.filter(name=name)
+    if not stored.update(references=models.F("references") + 1):
+        StoredPictureModel.objects.bulk_create(
+            [StoredPictureModel(name=name)], ignore_conflicts=True
+        )
+        stored.update(references=models.F("references") + 1)
+
+
+def release_picture(name: str, variants: dict[str, dict[str, str]]) -> None:
+    stored = StoredPictureModel.objects.filter(name=name)
+    while not stored.filter(references__gt=1).update(
+        references=models.F("references") - 1
+    ):
+        # последняя ссылка; удаляем тем же условием, что и уменьшаем:
+        # между запросами картинку мог взять кто-то еще
+        deleted, _ = stored.filter(references__lte=1).delete()
+        if deleted or not stored.exists():
+            # сборщик еще раз сверится с таблицей желаний перед удалением
+            discard_files([name, *_variant_names(variants)])
+            return
+
+
+@receiver(post_save, sender=WishItemModel)
+def track_picture_references_on_save(
+    sender: WishItemModel, instance: WishItemModel, created: bool, **kwargs: Any
+) -> None:
+    # старое имя берем из снимка from_db, а не лишним SELECT;
+    # save() обновит снимок уже после сигналов
+    if not instance.picture_changed():
+        return
+    loaded = getattr(instance, "_loaded_values", {})
+    if instance.picture.name:
+        acquire_picture(instance.picture.name)
+    if loaded.get("picture"):
+        release_picture(loaded["picture"], loaded.get("picture_variants") or {})
+
+
+@receiver(post_save, sender=WishItemModel)
+def generate_variants_on_picture_change(
+    sender: WishItemModel, instance: WishItemModel, created: bool, **kwargs: Any
 ) -> None:
-    if not instance.pk:
+    if not instance.picture or not instance.picture_changed():
         return
+    from tasks.images import generate_picture_variants
+
+    wishitem_id, picture_name = instance.pk, instance.picture.name
+    transaction.on_commit(
+        lambda: generate_picture_variants.delay(wishitem_id, picture_name)
+    )
+
+
+@receiver(post_delete, sender=WishItemModel)
+def release_picture_on_delete(
+    sender: WishItemModel, instance: WishItemModel, **kwargs: Any
+) -> None:
+    if instance.picture.name:
+        release_picture(instance.picture.name, instance.picture_variants)
+
+
+def _counters(is_private: bool, reserved_id: uuid.UUID | None) -> dict[str, int]:
+    return {
+        "wishitems_count": 1,
+        "wishitems_public_count": int(not is_private),
+        "wishitems_reserved_count": int(reserved_id is not None),
+    }
 
-    try:
-        old_file = sender.objects.get(pk=instance.pk).picture
-    except sender.DoesNotExist:
+
+@receiver(post_save, sender=WishItemModel)
+def update_counters_on_save(
+    sender: WishItemModel, instance: WishItemModel, created: bool, **kwargs: Any
+) -> None:
+    loaded = getattr(instance, "_loaded_values", None)
+    if created:
+        old = dict.fromkeys(_counters(False, None), 0)
+    elif loaded is None:
+        # прежнее состояние неизвестно, расхождение починит rebuild
         return
+    else:
+        old = _counters(loaded["is_private"], loaded["reserved_id"])
+
+    new = _counters(instance.is_private, instance.reserved_id)
+    adjust_counters(
+        instance.profile_id, **{field: new[field] - old[field] for field in new}
+    )
+
+
+@receiver(post_delete, sender=WishItemModel)
+def update_counters_on_delete(
+    sender: WishItemModel, instance: WishItemModel, **kwargs: Any
+) -> None:
+    counters = _counters(instance.is_private, instance.reserved_id)
+    adjust_counters(
+        instance.profile_id, **{field: -delta for field, delta in counters.items()}
+    )
 
-    new_file = instance.picture
-    if old_file and old_file != new_file and old_file.storage.exists(old_file.name):
-        old_file.delete(save=False)
+
+@receiver(pre_delete, sender=ProfileModel)
+def release_reservations_on_profile_delete(
+    sender: ProfileModel, instance: ProfileModel, **kwargs: Any
+) -> None:
+    # SET_NULL у reserved — это UPDATE без сигналов, поправим счетчики владельцев
+    reserved = (
+        WishItemModel.objects.filter(reserved=instance)
+        .exclude(profile=instance)
+        .values("profile_id")
+        .annotate(count=models.Count("pk"))
+        .order_by()
+    )
+    for row in reserved:
+        adjust_counters(row["profile_id"], wishitems_reserved_count=-row["count"])
 
 
+@receiver(post_save, sender=WishItemModel)
 @receiver(post_delete, sender=WishItemModel)
-def delete_picture_on_delete(
+def bump_version_on_wishitem_change(
     sender: WishItemModel, instance: WishItemModel, **kwargs: Any
 ) -> None:
-    pic = instance.picture
-    if pic and pic.storage.exists(pic.name):
-        pic.delete(save=False)
+    bump_wishlist_version(instance.profile_id)
+
+
+@receiver(post_save, sender=FollowModel)
+@receiver(post_delete, sender=FollowModel)
+def bump_version_on_follow_change(
+    sender: FollowModel, instance: FollowModel, **kwargs: Any
+) -> None:
+    bump_wishlist_version(instance.following_id)
+
+
+@receiver(post_save, sender=User)
+def bump_version_on_user_change(
+    sender: User, instance: User, created: bool, **kwargs: Any
+) -> None:
+    # имя владельца есть в шапке вишлиста; last_login при входе не важен
+    update_fields = kwargs.get("update_fields")
+    if created or (update_fields and "first_name" not in update_fields):
+        return
+    profile = getattr(instance, "profile", None)
+    if profile is not None:
+        bump_wishlist_version(profile.id)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+import base64
+import binascii
+import json
+import uuid
+
+from django.core.exceptions import BadRequest
+from django.db.models import Q, QuerySet
+from django.http import HttpRequest
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .models import attach_picture_urls
+
+if TYPE_CHECKING:
+    from .models import WishItemModel
+
+
+WISHLIST_PAGE_SIZE: int = 24
+
+
+def encode_cursor(item: WishItemModel) -> str:
+    raw = json.dumps([item.title, str(item.id)], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, uuid.UUID]:
+    try:
+        title, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        # курсор приходит от клиента: сам JSON может быть любым
+        if not isinstance(title, str) or not isinstance(item_id, str):
+            raise ValueError(cursor)
+        return title, uuid.UUID(item_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise BadRequest("Некорректный курсор")
+
+
+def keyset_page(
+    queryset: QuerySet[WishItemModel],
+    cursor: str | None = None,
+    size: int = WISHLIST_PAGE_SIZE,
+) -> tuple[list[WishItemModel], str | None]:
+    # keyset по (title, id): стоимость страницы не зависит от глубины,
+    # в отличие от OFFSET
+    queryset = queryset.order_by("title", "id")
+    if cursor:
+        title, item_id = decode_cursor(cursor)
+        # title__gte дублирует условие, но дает планировщику диапазон по индексу
+        # (profile, title, id) вместо фильтрации OR по всему вишлисту
+        queryset = queryset.filter(title__gte=title).filter(
+            Q(title__gt=title) | Q(title=title, id__gt=item_id)
+        )
+
+    items = list(queryset[: size + 1])
+    if len(items) > size:
+        items = items[:size]
+        return items, encode_cursor(items[-1])
+    return items, None
+
+
+class KeysetPaginationMixin:
+    page_size: int = WISHLIST_PAGE_SIZE
+    object_list: Any
+    request: HttpRequest
+
+    def get_wishlist_profile_id(self) -> uuid.UUID:
+        raise NotImplementedError
+
+    def get_next_page_url(self, cursor: str | None) -> str | None:
+        if cursor is None:
+            return None
+        url = reverse(
+            "wishlist_items", kwargs={"profile_id": self.get_wishlist_profile_id()}
+        )
+        return f"{url}?{urlencode({'cursor': cursor})}"
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        items, next_cursor = keyset_page(
+            self.object_list, self.request.GET.get("cursor"), self.page_size
+        )
+        attach_picture_urls(items)
+        context: dict[str, Any] = super().get_context_data(  # type: ignore[misc]
+            object_list=items, **kwargs
+        )
+        context["next_page_url"] = self.get_next_page_url(next_cursor)
+        return context
@@ -4,6 +4,8 @@ from .views import (
     WishItemCreateView,
     WishItemUpdateView,
     WishItemDeleteView,
+    WishItemPictureUploadView,
+    WishlistItemsView,
     WishlistMyView,
     WishlistProfileView,
 )
@@ -16,7 +18,17 @@ urlpatterns = [
         WishlistProfileView.as_view(),
         name="wishlist_profile",
     ),
+    path(
+        "wishlist/<uuid:profile_id>/items/",
+        WishlistItemsView.as_view(),
+        name="wishlist_items",
+    ),
     path("wishitem/add/", WishItemCreateView.as_view(), name="wishitem_create"),
+    path(
+        "wishitem/picture/upload/",
+        WishItemPictureUploadView.as_view(),
+        name="wishitem_picture_upload",
+    ),
     path(
         "wishitem/<uuid:wishitem_id>/",
         WishItemDetailView.as_view(),
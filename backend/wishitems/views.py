@@ -5,9 +5,12 @@ import uuid
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models import QuerySet
-from django.http import HttpRequest, HttpResponse, HttpResponseBase
+from django.http import HttpRequest, HttpResponse, HttpResponseBase, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.response import TemplateResponse
 from django.utils import timezone
 from django.views.generic import (
     CreateView,
@@ -15,22 +18,50 @@ from django.views.generic import (
     DetailView,
     ListView,
     UpdateView,
+    View,
 )
 from django.urls import reverse, reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
 from profiles.models import ProfileModel
 from services.models import RegistrationTokenModel
-from tasks.email import send_first_reservation_email, send_reservation_email
+from services.outbox import enqueue
+from tasks.email import (
+    reservation_email_payload,
+    send_first_reservation_email,
+    send_reservation_email,
+)
 
-from .models import WishItemModel
+from .cache import WISHLIST_PAGE_CACHE_TIMEOUT, wishlist_page_key, wishlist_version
+from .conditional import (
+    ConditionalGetMixin,
+    Validators,
+    make_etag,
+    not_modified,
+    set_validators,
+    wishitem_validators,
+    wishlist_validators,
+)
+from .media import (
+    PICTURE_UPLOAD_TYPES,
+    media_page_timeout,
+    media_url_epoch,
+    presigned_upload,
+    sign_upload,
+)
+from .models import WishItemModel, upload_to_wishlist
 from .forms import WishItemForm, EmailReserveForm
+from .pagination import KeysetPaginationMixin
 
 
-class WishlistMyView(LoginRequiredMixin, ListView):  # type: ignore[type-arg]
+class WishlistMyView(LoginRequiredMixin, KeysetPaginationMixin, ListView):  # type: ignore[type-arg]
     template_name = "wishlist/my.html"
     context_object_name = "wishitems"
 
+    def get_wishlist_profile_id(self) -> uuid.UUID:
+        user = cast(User, self.request.user)
+        return user.profile.id
+
     def get_queryset(self) -> QuerySet[WishItemModel]:
         user = cast(User, self.request.user)
         return user.profile.wishitems.all()
@@ -45,9 +76,10 @@ class WishlistMyView(LoginRequiredMixin, ListView):  # type: ignore[type-arg]
         return context
 
 
-class WishlistProfileView(ListView):  # type: ignore[type-arg]
+class WishlistProfileView(KeysetPaginationMixin, ConditionalGetMixin, ListView):  # type: ignore[type-arg]
     template_name = "wishlist/profile.html"
     context_object_name = "wishitems"
+    page_etag: str | None = None
 
     def dispatch(
         self, request: HttpRequest, *args: Any, **kwargs: Any
@@ -57,7 +89,44 @@ class WishlistProfileView(ListView):  # type: ignore[type-arg]
         if request.user.is_authenticated and profile_id == request.user.profile.id:
             return redirect("wishlist_me")
 
-        return super().dispatch(request, *args, **kwargs)
+        # анонимы получают готовую страницу из кэша без ORM и рендера,
+        # версия профиля меняется сигналами при любых изменениях вишлиста
+        if request.user.is_authenticated or request.method != "GET" or request.GET:
+            return super().dispatch(request, *args, **kwargs)
+
+        # для анонимов валидатором служит сама версия: 304 без единого запроса
+        version = wishlist_version(cast(uuid.UUID, profile_id))
+        self.page_etag = make_etag(version, media_url_epoch())
+        response = not_modified(request, self.page_etag)
+        if response is not None:
+            set_validators(response, self.page_etag)
+            return response
+
+        cache_key = wishlist_page_key(cast(uuid.UUID, profile_id), version)
+        content = cache.get(cache_key)
+        if content is not None:
+            response = HttpResponse(content)
+            set_validators(response, self.page_etag)
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and isinstance(response, TemplateResponse):
+            response.add_post_render_callback(
+                lambda r: cache.set(
+                    cache_key,
+                    r.content,
+                    timeout=media_page_timeout(WISHLIST_PAGE_CACHE_TIMEOUT),
+                )
+            )
+        return response
+
+    def get_wishlist_profile_id(self) -> uuid.UUID:
+        return cast(uuid.UUID, self.kwargs["profile_id"])
+
+    def get_validators(self) -> Validators | None:
+        if self.page_etag:
+            return self.page_etag, None
+        return wishlist_validators(self.request, self.get_wishlist_profile_id())
 
     def get_profile(self) -> ProfileModel:
         return get_object_or_404(ProfileModel, id=self.kwargs["profile_id"])
@@ -83,12 +152,40 @@ class WishlistProfileView(ListView):  # type: ignore[type-arg]
         return context
 
 
-class WishItemDetailView(UserPassesTestMixin, DetailView):  # type: ignore[type-arg]
+class WishlistItemsView(KeysetPaginationMixin, ListView):  # type: ignore[type-arg]
+    template_name = "wishlist/items.html"
+    context_object_name = "wishitems"
+
+    def get_wishlist_profile_id(self) -> uuid.UUID:
+        return cast(uuid.UUID, self.kwargs["profile_id"])
+
+    def get_queryset(self) -> QuerySet[WishItemModel]:
+        profile_id = self.get_wishlist_profile_id()
+        wishitems = WishItemModel.objects.filter(profile_id=profile_id)
+        if self.request.user.is_authenticated and (
+            self.request.user.profile.id == profile_id
+        ):
+            return wishitems
+        return wishitems.filter(is_private=False)
+
+    def render_to_response(
+        self, context: dict[str, Any], **response_kwargs: Any
+    ) -> HttpResponse:
+        response = super().render_to_response(context, **response_kwargs)
+        if context["next_page_url"]:
+            response["X-Next-Page"] = context["next_page_url"]
+        return response
+
+
+class WishItemDetailView(UserPassesTestMixin, ConditionalGetMixin, DetailView):  # type: ignore[type-arg]
     model = WishItemModel
     template_name = "wishitem/detail.html"
     context_object_name = "wishitem"
     pk_url_kwarg = "wishitem_id"
 
+    def get_validators(self) -> Validators | None:
+        return wishitem_validators(self.request, self.kwargs["wishitem_id"])
+
     def test_func(self) -> bool:
         wishitem = self.get_object()
         return not wishitem.is_private or (wishitem.profile.user == self.request.user)
@@ -99,6 +196,8 @@ class WishItemDetailView(UserPassesTestMixin, DetailView):  # type: ignore[type-
             context["form"] = EmailReserveForm()
         return context
 
+    # письмо ставится в outbox в одной транзакции с бронью
+    @transaction.atomic
     def post(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
         self.object = self.get_object()
         wishitem = self.object
@@ -131,7 +230,7 @@ class WishItemDetailView(UserPassesTestMixin, DetailView):  # type: ignore[type-
 
                     # Отправка письма
                     confirmation_url = f"{settings.FULL_DOMAIN}/confirm_email/{registration_token.token}/"
-                    send_first_reservation_email.delay(email, confirmation_url)
+                    enqueue(send_first_reservation_email, email, confirmation_url)
                     return self.render_to_response(
                         self.get_context_data(form=EmailReserveForm(), email_sent=True)
                     )
@@ -145,27 +244,52 @@ class WishItemDetailView(UserPassesTestMixin, DetailView):  # type: ignore[type-
                 context={"message": "Вы не можете зарезервировать свое желание"},
                 status=403,
             )
-        else:
-            if wishitem.reserved == user.profile:
-                wishitem.reserved = None
-            elif wishitem.reserved is None:
-                wishitem.reserved = user.profile
-            else:
-                return render(
-                    request,
-                    template_name="403.html",
-                    context={"message": "Это желание уже кто-то зарезервировал"},
-                    status=403,
-                )
-            wishitem.reserved_at = timezone.now()
-            wishitem.save()
+        elif wishitem.reserved_id == user.profile.id:
+            if not wishitem.unreserve(user.profile):
+                return redirect("wishitem_detail", wishitem_id=wishitem.id)
+        elif not wishitem.reserve(user.profile):
+            return render(
+                request,
+                template_name="403.html",
+                context={"message": "Это желание уже кто-то зарезервировал"},
+                status=403,
+            )
 
         # Отправка письма
-        send_reservation_email.delay(user.email, wishitem.id)
+        enqueue(
+            send_reservation_email, user.email, reservation_email_payload(wishitem.id)
+        )
         return redirect("wishitem_detail", wishitem_id=wishitem.id)
 
 
-class WishItemCreateView(LoginRequiredMixin, CreateView):  # type: ignore[type-arg]
+class WishItemFormMixin:
+    request: HttpRequest
+
+    def get_form_kwargs(self) -> dict[str, Any]:
+        kwargs: dict[str, Any] = super().get_form_kwargs()  # type: ignore[misc]
+        kwargs["uploader_id"] = self.request.user.pk
+        return kwargs
+
+
+class WishItemPictureUploadView(LoginRequiredMixin, View):
+    # выдает браузеру presigned POST: файл идет прямо в MinIO, минуя воркер
+    def post(self, request: HttpRequest) -> JsonResponse:
+        ext = PICTURE_UPLOAD_TYPES.get(request.POST.get("content_type", ""))
+        if ext is None:
+            return JsonResponse({"error": "Неподдерживаемый формат"}, status=400)
+
+        storage = WishItemModel._meta.get_field("picture").storage
+        name = upload_to_wishlist(None, f"upload.{ext}")
+        upload = presigned_upload(storage, name, request.POST["content_type"])
+        if upload is None:
+            return JsonResponse({"error": "Прямая загрузка недоступна"}, status=501)
+
+        user = cast(User, request.user)
+        upload["token"] = sign_upload(name, user.pk)
+        return JsonResponse(upload)
+
+
+class WishItemCreateView(LoginRequiredMixin, WishItemFormMixin, CreateView):  # type: ignore[type-arg]
     model = WishItemModel
     form_class = WishItemForm
     template_name = "wishitem/form.html"
@@ -177,7 +301,12 @@ class WishItemCreateView(LoginRequiredMixin, CreateView):  # type: ignore[type-a
         return super().form_valid(form)
 
 
-class WishItemUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):  # type: ignore[type-arg]
+class WishItemUpdateView(
+    LoginRequiredMixin,
+    UserPassesTestMixin,
+    WishItemFormMixin,
+    UpdateView,  # type: ignore[type-arg]
+):
     model = WishItemModel
     form_class = WishItemForm
     template_name = "wishitem/form.html"
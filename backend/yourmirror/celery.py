@@ -1,6 +1,10 @@
+import logging
 import os
+import time
+from typing import Any
 
-from celery import Celery
+from celery import Celery, Task
+from celery.signals import task_postrun, task_prerun
 
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yourmirror.settings.dev")
@@ -10,3 +14,52 @@ app = Celery("yourmirror")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks()
+
+
+logger = logging.getLogger("tasks.metrics")
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.queries = 0
+        self.started = time.perf_counter()
+
+    def __call__(
+        self, execute: Any, sql: str, params: Any, many: bool, context: Any
+    ) -> Any:
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+# id задачи -> счетчик; соединение потоковое, как и выполнение задачи
+_counters: dict[str, QueryCounter] = {}
+
+
+def start_task_metrics(task_id: str, **kwargs: Any) -> None:
+    from django.db import connection
+
+    counter = _counters[task_id] = QueryCounter()
+    connection.execute_wrappers.append(counter)
+
+
+def report_task_metrics(task_id: str, task: Task, state: str, **kwargs: Any) -> None:
+    from django.db import connection
+
+    counter = _counters.pop(task_id, None)
+    if counter is None:
+        return
+    if counter in connection.execute_wrappers:
+        connection.execute_wrappers.remove(counter)
+    duration = (time.perf_counter() - counter.started) * 1000
+    logger.info(
+        "%s %s: %d db queries, %.1f ms",
+        task.name,
+        state,
+        counter.queries,
+        duration,
+        extra={"task": task.name, "db_queries": counter.queries, "duration": duration},
+    )
+
+
+task_prerun.connect(start_task_metrics)
+task_postrun.connect(report_task_metrics)
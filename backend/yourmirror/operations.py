@@ -0,0 +1,30 @@
+from typing import Any
+
+from django.contrib.postgres import operations
+from django.db import migrations
+
+
+class AddIndexConcurrently(operations.AddIndexConcurrently):
+    # CREATE INDEX CONCURRENTLY не блокирует запись в таблицу на время
+    # построения — на миллионах желаний это минуты. Тесты идут на sqlite,
+    # там индекс строится обычным AddIndex
+
+    def database_forwards(
+        self, app_label: str, schema_editor: Any, from_state: Any, to_state: Any
+    ) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(
+        self, app_label: str, schema_editor: Any, from_state: Any, to_state: Any
+    ) -> None:
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
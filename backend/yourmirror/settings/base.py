@@ -1,6 +1,7 @@
 import environ
 import os
 
+from celery.schedules import crontab
 from pathlib import Path
 
 env = environ.Env(DEBUG=(bool, False))
@@ -101,3 +102,40 @@ LOGIN_URL = "login"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 SITE_ID = 1
+
+# tasks не django-приложение, autodiscover его не видит
+CELERY_IMPORTS = [
+    "tasks.digest",
+    "tasks.email",
+    "tasks.images",
+    "tasks.media",
+    "tasks.outbox",
+]
+
+CELERY_BEAT_SCHEDULE = {
+    # страховка на случай, если отложенный запуск после удаления потерялся
+    "collect-media-garbage": {
+        "task": "tasks.media.collect_media_garbage",
+        "schedule": 60 * 15,
+    },
+    "flush-mail-queue": {
+        "task": "tasks.email.flush_mail_queue",
+        "schedule": 60,
+    },
+    "send-stale-reservation-digests": {
+        "task": "tasks.email.send_stale_reservation_digests",
+        "schedule": 60,
+    },
+    "send-follow-digests": {
+        "task": "tasks.digest.send_follow_digests",
+        "schedule": crontab(minute=0, hour=10, day_of_week="mon"),
+    },
+    "relay-outbox": {
+        "task": "tasks.outbox.relay_outbox_task",
+        "schedule": 60,
+    },
+    "sweep-media-leaks": {
+        "task": "tasks.media.sweep_media_leaks",
+        "schedule": 60 * 60 * 24,
+    },
+}
@@ -1,6 +1,8 @@
 from .base import (
     AUTH_PASSWORD_VALIDATORS as AUTH_PASSWORD_VALIDATORS,
     BASE_DIR,
+    CELERY_BEAT_SCHEDULE as CELERY_BEAT_SCHEDULE,
+    CELERY_IMPORTS as CELERY_IMPORTS,
     DEBUG,
     DEFAULT_AUTO_FIELD as DEFAULT_AUTO_FIELD,
     INSTALLED_APPS,
@@ -75,3 +77,10 @@ DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL", default="")
 
 CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://localhost:6379/1",
+    }
+}
@@ -1,6 +1,8 @@
 from .base import (
     AUTH_PASSWORD_VALIDATORS as AUTH_PASSWORD_VALIDATORS,
     BASE_DIR,
+    CELERY_BEAT_SCHEDULE as CELERY_BEAT_SCHEDULE,
+    CELERY_IMPORTS as CELERY_IMPORTS,
     DEFAULT_AUTO_FIELD as DEFAULT_AUTO_FIELD,
     INSTALLED_APPS as INSTALLED_APPS,
     LANGUAGE_CODE as LANGUAGE_CODE,
@@ -41,6 +43,12 @@ STORAGES = {
     },
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
 FULL_DOMAIN = "http://127.0.0.1:8000"
 
 MEDIA_ROOT = BASE_DIR / "test_media"
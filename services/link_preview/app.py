@@ -1,55 +1,62 @@
-from litestar import Litestar, get
-# from litestar.config.cors import CORSConfig
-# from litestar.logging import LoggingConfig
-# from litestar.openapi import OpenAPIConfig
-# from litestar.config.response_cache import ResponseCacheConfig
-# from litestar.stores.redis import RedisStore
-#
-# from server.auth import jwt_auth
-# from server.config import settings
-# from server.instances import AppLitestar
-# from server.database import database_contextmanager
-# from server.deps import session_transaction
-# from .routing import api_router
-# from server.crud import init_base_manager
-# from server.admin import admin
-#
-# openapi_config = OpenAPIConfig(
-#     title='Portal ANS',
-#     version='1',
-# )
-#
-# cors_config = CORSConfig(allow_origins=['*'], allow_methods=['*'])
-#
-# logging_config = LoggingConfig(
-#     root={"level": "INFO", "handlers": ["queue_listener"]},
-#     formatters={
-#         "standard": {"format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"}
-#     },
-#     log_exceptions="always",
-# )
-
-# redis_store = RedisStore.with_client(url=settings.redis_url, db=0)
-# cache_config = ResponseCacheConfig(store="redis_backed_store")
-
-
-@get("/")
-async def hello_world() -> str:
-    return "Hello, world!"
-
-
-app = Litestar(
-    [hello_world]
-    # route_handlers=[api_router],
-    # on_app_init=[jwt_auth.on_app_init],
-    # on_startup=[init_base_manager],
-    # lifespan=[database_contextmanager],
-    # dependencies={'transaction': session_transaction},
-    # debug=settings.DEBUG,
-    # cors_config=cors_config,
-    # logging_config=logging_config,
-    # openapi_config=openapi_config,
-    # plugins=[admin],
-    # stores={"redis_backed_store": redis_store},
-    # response_cache_config=cache_config,
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import httpx
+from litestar import Litestar
+from litestar.logging import LoggingConfig
+from litestar.stores.base import Store
+from litestar.stores.redis import RedisStore
+
+from .cache import PreviewCache
+from .config import Settings, settings
+from .fetcher import PreviewFetcher, build_client
+from .images import ImageIngestor, MediaBucket
+from .parsing import ParsePool
+from .routing import api_router
+
+logging_config = LoggingConfig(
+    root={"level": "INFO", "handlers": ["queue_listener"]},
+    formatters={
+        "standard": {"format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"}
+    },
+    log_exceptions="always",
 )
+
+
+def create_app(
+    config: Settings = settings,
+    transport: httpx.AsyncBaseTransport | None = None,
+    store: Store | None = None,
+) -> Litestar:
+    # transport и store подменяют тесты и бенчмарки,
+    # в проде — пул с проверкой адресов и Redis
+    if store is None:
+        store = RedisStore.with_client(url=config.redis_url, namespace="link_preview")
+
+    @asynccontextmanager
+    async def previews(app: Litestar) -> AsyncIterator[None]:
+        store = app.stores.get("previews")
+        pool = ParsePool(config)
+        storage = httpx.AsyncClient(
+            timeout=httpx.Timeout(config.image_timeout, connect=config.connect_timeout)
+        )
+        async with store, storage, build_client(config, transport) as client:
+            fetcher = PreviewFetcher(client, config, pool)
+            app.state.previews = PreviewCache(store, fetcher.fetch, config)
+            bucket = MediaBucket(config, storage)
+            app.state.images = ImageIngestor(fetcher, bucket, config)
+            try:
+                yield
+            finally:
+                await app.state.previews.close()
+                pool.shutdown()
+
+    return Litestar(
+        route_handlers=[api_router],
+        lifespan=[previews],
+        logging_config=logging_config,
+        stores={"previews": store},
+    )
+
+
+app = create_app()
@@ -0,0 +1,39 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import msgspec
+
+from .cache import PreviewCache
+from .fetcher import PreviewError
+from .parser import Preview
+
+
+class BatchResult(msgspec.Struct, omit_defaults=True):
+    url: str
+    status_code: int = 200
+    preview: Preview | None = None
+    error: str = ""
+
+
+async def preview_lines(
+    previews: PreviewCache, urls: list[str]
+) -> AsyncIterator[bytes]:
+    # NDJSON в порядке готовности: медленный сайт не задерживает остальные
+    encoder = msgspec.json.Encoder()
+
+    async def preview(url: str) -> BatchResult:
+        try:
+            return BatchResult(url=url, preview=await previews.get(url))
+        except PreviewError as error:
+            return BatchResult(
+                url=url, status_code=error.status_code, error=error.detail
+            )
+
+    tasks = [asyncio.create_task(preview(url)) for url in urls]
+    try:
+        for result in asyncio.as_completed(tasks):
+            yield encoder.encode(await result) + b"\n"
+    finally:
+        # клиент отключился — недокачанное больше никому не нужно
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,83 @@
+"""Пропускная способность извлечения: общий разбор против правил магазинов.
+
+Гоняет parse_document по golden-страницам из tests/golden: только общий
+OpenGraph/JSON-LD (пустой реестр) и с правилами из sites.py. Затем
+сравнивает поиск правил по таблице хостов с линейным перебором
+на реестре из --sites магазинов.
+
+    uv run --package yourmirror.service.link_preview -- python -m services.link_preview.benchmarks.extraction
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from .. import extractors
+from ..extractors import ExtractorRegistry, SiteExtractor, parse_document
+from ..sites import SITES, SiteRules
+
+GOLDEN = Path(__file__).parents[1] / "tests" / "golden"
+
+
+def load_golden() -> list[tuple[bytes, str]]:
+    return [
+        (page.read_bytes(), json.loads(page.with_suffix(".json").read_text())["url"])
+        for page in sorted(GOLDEN.glob("*.html"))
+    ]
+
+
+def throughput(pages: list[tuple[bytes, str]], repeat: int) -> tuple[float, float]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for content, url in pages:
+            parse_document(content, None, url)
+    elapsed = time.perf_counter() - started
+    documents = len(pages) * repeat
+    size = sum(len(content) for content, _ in pages) * repeat
+    return documents / elapsed, size / elapsed / 2**20
+
+
+def linear_lookup(sites: list[tuple[str, SiteExtractor]], host: str) -> object:
+    for suffix, extractor in sites:
+        if host == suffix or host.endswith("." + suffix):
+            return extractor
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--sites", type=int, default=500)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+
+    pages = load_golden()
+    print(f"{len(pages)} golden pages, {args.repeat} rounds")
+    for name, registry in (
+        ("generic", ExtractorRegistry(())),
+        ("site rules", ExtractorRegistry(SITES)),
+    ):
+        extractors.registry = registry
+        documents, megabytes = throughput(pages, args.repeat)
+        print(f"  {name:10} {documents:9.0f} docs/s  {megabytes:6.1f} MiB/s")
+
+    rules = [SiteRules(hosts=(f"shop{n}.ru",)) for n in range(args.sites)]
+    registry = ExtractorRegistry([*rules, *SITES])
+    table = list(registry.hosts.items())
+    hosts = [f"www.shop{n % (args.sites * 2)}.ru" for n in range(args.lookups)]
+
+    print(f"\n{len(table)} hosts in registry, {args.lookups} lookups")
+    for name, lookup in (
+        ("table", registry.lookup),
+        ("linear", lambda host: linear_lookup(table, host)),
+    ):
+        started = time.perf_counter()
+        for host in hosts:
+            lookup(host)
+        elapsed = time.perf_counter() - started
+        print(f"  {name:10} {elapsed / args.lookups * 1e6:8.2f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
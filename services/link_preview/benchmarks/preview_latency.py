@@ -0,0 +1,200 @@
+"""Задержка и пропускная способность превью: разбор в loop против пула процессов.
+
+Локальный HTTP-сервер в отдельном процессе отдает страницы из benchmarks/corpus кусками по 16 КиБ;
+маркетплейсы раздуты до мегабайтов тегами в <head> и JSON-состоянием,
+как это делают SPA. PreviewFetcher качает их на разной конкурентности:
+«inline» разбирает в event loop, «pool» — в ParsePool. Печатает p50/p99,
+запросы в секунду и максимальную задержку loop (насколько разбор стопорит
+остальные запросы процесса).
+
+    uv run --package yourmirror.service.link_preview -- python -m services.link_preview.benchmarks.preview_latency
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import re
+import multiprocessing
+import statistics
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+
+from ..config import Settings
+from ..fetcher import PreviewFetcher, build_client
+from ..parsing import ParsePool
+
+CORPUS = Path(__file__).parent / "corpus"
+FILLER = re.compile(r"<!-- filler:.*?-->")
+CHUNK = 16 * 1024
+
+
+def tag_filler(size: int) -> str:
+    tags = (
+        '<link rel="preload" href="/static/js/chunk.{n}.js" as="script">'
+        '<meta name="counter:{n}" content="{n}">'
+        "<style>.c{n}{{display:flex;margin:0 {n}px}}</style>\n"
+    )
+    block = "".join(tags.format(n=n) for n in range(100))
+    return block * (size // len(block) + 1)
+
+
+def state_filler(size: int) -> str:
+    item = {"id": 0, "name": "Товар", "price": 1990, "tags": ["new", "sale"]}
+    line = json.dumps(item, ensure_ascii=False) + ",\n"
+    return line * (size // len(line.encode()) + 1)
+
+
+def load_corpus(heavy_kib: int) -> dict[str, bytes]:
+    fillers = {"marketplace": tag_filler, "state_in_head": state_filler}
+    pages = {}
+    for path in sorted(CORPUS.glob("*.html")):
+        fill = fillers.get(path.stem)
+        html = path.read_text()
+        filler = fill(heavy_kib * 1024) if fill else ""
+        pages[path.stem] = FILLER.sub(lambda _: filler, html).encode()
+    return pages
+
+
+class CorpusHandler(BaseHTTPRequestHandler):
+    server: "CorpusServer"
+
+    def do_GET(self) -> None:
+        page = self.server.pages.get(self.path.strip("/").partition("?")[0])
+        if page is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        try:
+            for start in range(0, len(page), CHUNK):
+                self.wfile.write(page[start : start + CHUNK])
+        except (BrokenPipeError, ConnectionResetError):
+            # клиент дочитал <head> и закрыл соединение — так и задумано
+            pass
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+class CorpusServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, pages: dict[str, bytes]) -> None:
+        super().__init__(("127.0.0.1", 0), CorpusHandler)
+        self.pages = pages
+
+
+def serve(pages: dict[str, bytes], ports: "multiprocessing.Queue[int]") -> None:
+    server = CorpusServer(pages)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+@contextmanager
+def corpus_server(pages: dict[str, bytes]) -> Iterator[str]:
+    # отдельный процесс: потоки сервера не делят GIL с разбором в loop
+    context = multiprocessing.get_context("spawn")
+    ports: multiprocessing.Queue[int] = context.Queue()
+    process = context.Process(target=serve, args=(pages, ports), daemon=True)
+    process.start()
+    try:
+        yield f"http://127.0.0.1:{ports.get(timeout=30)}"
+    finally:
+        process.terminate()
+        process.join()
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(
+    fetcher: PreviewFetcher, urls: list[str], concurrency: int
+) -> dict[str, float]:
+    latencies: list[float] = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(url: str) -> None:
+        async with slots:
+            started = time.perf_counter()
+            await fetcher.fetch(url)
+            latencies.append(time.perf_counter() - started)
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(url) for url in urls))
+    elapsed = time.perf_counter() - started
+    stop.set()
+
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {
+        "p50": percentiles[49] * 1000,
+        "p99": percentiles[98] * 1000,
+        "rps": len(urls) / elapsed,
+        "lag": await lag * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    pages = load_corpus(args.heavy_kib)
+    sizes = ", ".join(f"{name} {len(page) // 1024} KiB" for name, page in pages.items())
+    print(f"corpus: {sizes}")
+
+    settings = Settings(
+        # все страницы на одном хосте: меряем разбор, а не вежливость к сайту
+        per_host_limit=max(args.concurrency),
+        max_concurrent_fetches=max(args.concurrency),
+        head_max_bytes=8 * 1024 * 1024,
+        parse_workers=args.workers,
+        parse_timeout=60,
+        total_timeout=60,
+        read_timeout=60,
+    )
+    with corpus_server(pages) as base:
+        names = itertools.cycle(pages)
+        urls = [f"{base}/{next(names)}?n={n}" for n in range(args.requests)]
+
+        for mode in ("inline", "pool"):
+            pool = ParsePool(settings) if mode == "pool" else None
+            # сервер корпуса на 127.0.0.1: проверка адресов его бы отвергла
+            transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=settings.max_connections)
+            )
+            async with build_client(settings, transport) as client:
+                fetcher = PreviewFetcher(client, settings, pool)
+                # прогрев: соединения и процессы пула
+                await run(fetcher, urls[: len(pages) * 2], len(pages) * 2)
+                print(f"\n{mode}")
+                for concurrency in args.concurrency:
+                    result = await run(fetcher, urls, concurrency)
+                    print(
+                        f"  c={concurrency:<3} p50 {result['p50']:8.1f} ms"
+                        f"  p99 {result['p99']:8.1f} ms"
+                        f"  {result['rps']:7.1f} rps"
+                        f"  loop lag {result['lag']:7.1f} ms"
+                    )
+            if pool:
+                pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--heavy-kib", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=2)
+    asyncio.run(main(parser.parse_args()))
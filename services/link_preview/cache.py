@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+import msgspec
+from litestar.stores.base import Store
+
+from .config import Settings
+from .fetcher import PreviewError, normalize_url
+from .parser import Preview
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry(msgspec.Struct):
+    fetched_at: float
+    expires_at: float
+    preview: Preview | None = None
+    # негативная запись: сайт не отдал превью, не долбим его повторно
+    error: str = ""
+    status_code: int = 0
+
+    def result(self) -> Preview:
+        if self.preview is None:
+            raise PreviewError(self.error, status_code=self.status_code)
+        return self.preview
+
+
+class LRU:
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+
+    def get(self, key: str, now: float) -> CacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+
+class PreviewCache:
+    # LRU процесса → Redis → сайт; устаревшее отдаем сразу и обновляем в фоне
+    def __init__(
+        self,
+        store: Store,
+        fetch: Callable[[str], Awaitable[Preview]],
+        settings: Settings,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.store = store
+        self.fetch = fetch
+        self.settings = settings
+        self.clock = clock
+        self.lru = LRU(settings.cache_lru_size)
+        self.flights: SingleFlight[CacheEntry] = SingleFlight()
+        self._refreshing: dict[str, asyncio.Task[None]] = {}
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder(CacheEntry)
+
+    async def get(self, url: str) -> Preview:
+        url = normalize_url(url)
+        now = self.clock()
+        entry = self.lru.get(url, now) or await self.flights.do(
+            url, lambda: self._load_or_update(url, now)
+        )
+        if entry.preview and now - entry.fetched_at > self.settings.cache_fresh_ttl:
+            self._refresh_later(url)
+        return entry.result()
+
+    async def close(self) -> None:
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _load_or_update(self, url: str, now: float) -> CacheEntry:
+        return await self._load(url, now) or await self._update(url)
+
+    async def _update(self, url: str) -> CacheEntry:
+        try:
+            preview = await self.fetch(url)
+        except PreviewError as error:
+            now = self.clock()
+            entry = CacheEntry(
+                fetched_at=now,
+                expires_at=now + self.settings.cache_negative_ttl,
+                error=error.detail,
+                status_code=error.status_code,
+            )
+        else:
+            entry = self._positive(preview)
+        await self._remember(url, entry)
+        return entry
+
+    def _positive(self, preview: Preview) -> CacheEntry:
+        now = self.clock()
+        ttl = self.settings.cache_fresh_ttl + self.settings.cache_stale_ttl
+        return CacheEntry(fetched_at=now, expires_at=now + ttl, preview=preview)
+
+    def _refresh_later(self, url: str) -> None:
+        if url in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh(url))
+        self._refreshing[url] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(url, None))
+
+    async def _refresh(self, url: str) -> None:
+        try:
+            preview = await self.fetch(url)
+        except PreviewError as error:
+            # устаревшее превью лучше ошибки: доживет до expires_at
+            logger.info("preview refresh failed for %s: %s", url, error.detail)
+            return
+        await self._remember(url, self._positive(preview))
+
+    # недоступный Redis не должен ронять превью: работаем как без кеша
+
+    async def _load(self, url: str, now: float) -> CacheEntry | None:
+        try:
+            raw = await self.store.get(url)
+        except Exception:
+            logger.warning("preview cache read failed", exc_info=True)
+            return None
+        if raw is None:
+            return None
+        try:
+            entry = self._decoder.decode(raw)
+        except msgspec.DecodeError:
+            return None
+        if entry.expires_at <= now:
+            return None
+        self.lru.set(url, entry)
+        return entry
+
+    async def _remember(self, url: str, entry: CacheEntry) -> None:
+        self.lru.set(url, entry)
+        ttl = math.ceil(entry.expires_at - entry.fetched_at)
+        try:
+            await self.store.set(url, self._encoder.encode(entry), expires_in=ttl)
+        except Exception:
+            logger.warning("preview cache write failed", exc_info=True)
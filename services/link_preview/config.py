@@ -0,0 +1,65 @@
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_prefix="LINK_PREVIEW_", env_file=".env", extra="ignore"
+    )
+
+    redis_url: str = "redis://localhost:6379/2"
+
+    # бакет картинок backend: og:image сохраняется туда же
+    minio_endpoint: str = "localhost:9000"
+    minio_access_key: str = ""
+    minio_secret_key: str = ""
+    minio_secure: bool = False
+    minio_region: str = "us-east-1"
+    media_bucket: str = "media"
+    # POST /images пишет в общий бакет: вызывать его может только backend,
+    # с этим токеном в Authorization: Bearer. Пустой токен — ручка закрыта
+    images_token: str = ""
+
+    user_agent: str = (
+        "Mozilla/5.0 (compatible; YourMirrorBot/1.0; +https://yourmirror.ru)"
+    )
+
+    # общий пул соединений и лимит одновременных запросов к одному хосту:
+    # маркетплейсы быстро банят за пачку параллельных запросов
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    per_host_limit: int = 4
+    # исходящие загрузки всех запросов вместе, включая пакетные
+    max_concurrent_fetches: int = 50
+    max_redirects: int = 5
+
+    connect_timeout: float = 3.0
+    read_timeout: float = 5.0
+    # на весь превью, включая ожидание слота хоста и редиректы
+    total_timeout: float = 8.0
+
+    # ссылок в одном POST /previews
+    batch_max_urls: int = 200
+
+    # если </head> так и не встретился, дальше не читаем
+    head_max_bytes: int = 2 * 1024 * 1024
+
+    # документы больше parse_inline_bytes разбираются в пуле процессов
+    parse_workers: int = 2
+    parse_inline_bytes: int = 64 * 1024
+    parse_timeout: float = 2.0
+
+    # как PICTURE_UPLOAD_MAX_SIZE в backend
+    image_max_bytes: int = 10 * 1024 * 1024
+    # без Content-Length картинка копится во временном файле, в памяти — не больше
+    image_spool_bytes: int = 1024 * 1024
+    image_timeout: float = 30.0
+
+    # свежее превью отдаем как есть, устаревшее — сразу, но обновляем в фоне
+    cache_fresh_ttl: int = 60 * 60
+    cache_stale_ttl: int = 24 * 60 * 60
+    # ошибку сайта помним недолго, чтобы не долбить его повторами
+    cache_negative_ttl: int = 60
+    cache_lru_size: int = 2048
+
+
+settings = Settings()
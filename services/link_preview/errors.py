@@ -0,0 +1,5 @@
+class PreviewError(Exception):
+    def __init__(self, detail: str, status_code: int = 502) -> None:
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
@@ -0,0 +1,136 @@
+import re
+from collections.abc import Iterable
+from dataclasses import replace
+from typing import Any
+from urllib.parse import urlsplit
+
+from .errors import PreviewError
+from .parser import (
+    HeadParser,
+    Preview,
+    absolute,
+    decode,
+    extract,
+    json_ld_scripts,
+    normalize_price,
+    text,
+)
+from .sites import FIELDS, SITES, SiteRules
+
+
+class SiteExtractor:
+    def __init__(self, rules: SiteRules) -> None:
+        for source in (rules.meta, rules.json_ld, rules.patterns):
+            if unknown := set(source) - set(FIELDS):
+                raise ValueError(f"{rules.hosts}: неизвестные поля {unknown}")
+
+        self.hosts = rules.hosts
+        self.currency = rules.currency
+        self.meta = {
+            name: tuple(key.lower() for key in keys)
+            for name, keys in rules.meta.items()
+        }
+        self.json_ld = {
+            name: tuple(tuple(path.split(".")) for path in paths)
+            for name, paths in rules.json_ld.items()
+        }
+        self.patterns: dict[str, tuple[re.Pattern[str], ...]] = {}
+        for name, patterns in rules.patterns.items():
+            compiled = tuple(re.compile(pattern, re.DOTALL) for pattern in patterns)
+            if any(pattern.groups != 1 for pattern in compiled):
+                raise ValueError(f"{rules.hosts}: в регулярке {name} нужна одна группа")
+            self.patterns[name] = compiled
+
+    def apply(
+        self,
+        preview: Preview,
+        parser: HeadParser,
+        nodes: list[dict[str, Any]],
+        html: str,
+    ) -> Preview:
+        found: dict[str, str] = {}
+        for name in FIELDS:
+            if value := self.value(name, parser.meta, nodes, html):
+                found[name] = value
+        if "image" in found:
+            found["image"] = absolute(found["image"], preview.url)
+        if "price" in found:
+            found["price"] = normalize_price(found["price"])
+        if "currency" in found:
+            found["currency"] = found["currency"].upper()
+        preview = replace(preview, **found)
+        if preview.price and not preview.currency:
+            preview.currency = self.currency
+        return preview
+
+    def value(
+        self,
+        name: str,
+        meta: dict[str, str],
+        nodes: list[dict[str, Any]],
+        html: str,
+    ) -> str:
+        for key in self.meta.get(name, ()):
+            if value := meta.get(key):
+                return value
+        for path in self.json_ld.get(name, ()):
+            for node in nodes:
+                if value := text(follow(node, path)):
+                    return value
+        for pattern in self.patterns.get(name, ()):
+            if match := pattern.search(html):
+                return " ".join(match.group(1).split())
+        return ""
+
+
+def follow(value: Any, path: tuple[str, ...]) -> Any:
+    for key in path:
+        if isinstance(value, list):
+            if key.isdigit():
+                value = value[int(key)] if int(key) < len(value) else None
+                continue
+            # offers бывает и объектом, и списком: без индекса — первый элемент
+            value = value[0] if value else None
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+class ExtractorRegistry:
+    # хост → правила; поддомены (www., m.) находятся по суффиксу
+    def __init__(self, sites: Iterable[SiteRules]) -> None:
+        self.hosts: dict[str, SiteExtractor] = {}
+        for rules in sites:
+            extractor = SiteExtractor(rules)
+            for host in rules.hosts:
+                if host in self.hosts:
+                    raise ValueError(f"{host}: правила заданы дважды")
+                self.hosts[host] = extractor
+
+    def lookup(self, host: str) -> SiteExtractor | None:
+        labels = host.lower().split(".")
+        for start in range(len(labels) - 1):
+            if extractor := self.hosts.get(".".join(labels[start:])):
+                return extractor
+        return None
+
+
+def parse_document(content: bytes, charset: str | None, url: str) -> Preview:
+    # выполняется и в процессе пула: аргументы и результат должны пиклиться
+    try:
+        html = decode(content, charset)
+        parser = HeadParser()
+        parser.feed(html)
+        nodes = json_ld_scripts(parser.json_ld)
+        preview = extract(parser, url, nodes)
+        extractor = registry.lookup(urlsplit(url).hostname or "")
+        return extractor.apply(preview, parser, nodes, html) if extractor else preview
+    except Exception as error:
+        # HTMLParser падает AssertionError на битой разметке вроде <![foo —
+        # страница чужая, это ошибка сайта, а не 500
+        raise PreviewError("Не удалось разобрать страницу") from error
+
+
+# правила компилируются один раз при импорте — в процессах пула тоже
+registry = ExtractorRegistry(SITES)
@@ -0,0 +1,253 @@
+import asyncio
+import ipaddress
+import socket
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit, urlunsplit
+
+import httpcore
+import httpx
+from httpcore import SOCKET_OPTION
+
+from .config import Settings
+from .errors import PreviewError
+from .extractors import parse_document
+from .parser import Preview
+
+if TYPE_CHECKING:
+    from .parsing import ParsePool
+
+
+@dataclass
+class _HostSlot:
+    semaphore: asyncio.Semaphore
+    users: int = 0
+
+
+class HostLimiter:
+    # семафор на хост живет, пока к хосту есть запросы, — словарь не растет
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._slots: dict[str, _HostSlot] = {}
+
+    @asynccontextmanager
+    async def slot(self, host: str) -> AsyncIterator[None]:
+        slot = self._slots.get(host)
+        if slot is None:
+            slot = self._slots[host] = _HostSlot(asyncio.Semaphore(self.limit))
+        slot.users += 1
+        try:
+            async with slot.semaphore:
+                yield
+        finally:
+            slot.users -= 1
+            if not slot.users:
+                del self._slots[host]
+
+
+Resolver = Callable[[str, int], Awaitable[list[str]]]
+
+
+async def resolve_host(host: str, port: int) -> list[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(
+        host, port, type=socket.SOCK_STREAM
+    )
+    return [str(info[4][0]) for info in infos]
+
+
+def is_public(address: str) -> bool:
+    # fe80::1%eth0 — у link-local адреса бывает зона
+    ip = ipaddress.ip_address(address.partition("%")[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global
+
+
+class PublicOnlyBackend(httpcore.AsyncNetworkBackend):
+    # ссылки присылают пользователи: без проверки превью читает Redis, MinIO
+    # и метаданные облака изнутри сети. Адрес проверяется там же, где к нему
+    # подключаемся: имя разрешается один раз, и DNS с коротким TTL не отдаст
+    # соединению другой адрес, чем проверке. Каждый шаг редиректа — новое
+    # соединение и новая проверка
+    def __init__(
+        self,
+        resolve: Resolver = resolve_host,
+        backend: httpcore.AsyncNetworkBackend | None = None,
+    ) -> None:
+        self.resolve = resolve
+        self.backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: float | None = None,
+        local_address: str | None = None,
+        socket_options: Iterable[SOCKET_OPTION] | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        try:
+            addresses = await self.resolve(host, port)
+        except OSError as error:
+            raise httpcore.ConnectError(f"{host}: адрес не найден") from error
+        if not addresses or not all(map(is_public, addresses)):
+            raise PreviewError("Ссылка ведет во внутреннюю сеть", status_code=400)
+
+        # адресов бывает несколько (IPv4 и IPv6): пробуем по очереди
+        for address in addresses[:-1]:
+            try:
+                return await self.backend.connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except httpcore.ConnectError:
+                continue
+        return await self.backend.connect_tcp(
+            addresses[-1], port, timeout, local_address, socket_options
+        )
+
+    async def connect_unix_socket(
+        self,
+        path: str,
+        timeout: float | None = None,
+        socket_options: Iterable[SOCKET_OPTION] | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        raise PreviewError("Ссылка ведет во внутреннюю сеть", status_code=400)
+
+    async def sleep(self, seconds: float) -> None:
+        await self.backend.sleep(seconds)
+
+
+class PublicOnlyTransport(httpx.AsyncHTTPTransport):
+    def __init__(
+        self,
+        settings: Settings,
+        resolve: Resolver = resolve_host,
+        backend: httpcore.AsyncNetworkBackend | None = None,
+    ) -> None:
+        super().__init__()
+        # httpx не принимает network_backend: пул соединений собираем сами,
+        # с теми же параметрами, что и AsyncHTTPTransport
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=5.0,
+            network_backend=PublicOnlyBackend(resolve, backend),
+        )
+
+
+def build_client(
+    settings: Settings, transport: httpx.AsyncBaseTransport | None = None
+) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=transport or PublicOnlyTransport(settings),
+        # прокси из окружения httpx монтирует мимо транспорта и его проверки
+        trust_env=False,
+        headers={
+            "User-Agent": settings.user_agent,
+            "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.1",
+            "Accept-Language": "ru,en;q=0.8",
+        },
+        timeout=httpx.Timeout(
+            settings.read_timeout,
+            connect=settings.connect_timeout,
+            pool=settings.total_timeout,
+        ),
+        follow_redirects=True,
+        max_redirects=settings.max_redirects,
+    )
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAMS = frozenset(
+    {"fbclid", "gclid", "yclid", "ysclid", "_openstat", "mc_cid", "mc_eid"}
+)
+
+
+def normalize_url(url: str) -> str:
+    # одна и та же карточка товара приходит с utm-метками и якорями:
+    # нормализованная ссылка — ключ кеша и общей загрузки
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+        scheme = ""
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        raise PreviewError("Нужна ссылка http(s)", status_code=400)
+
+    host = parts.hostname
+    if ":" in host:
+        host = f"[{host}]"
+    if port is not None and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    query = "&".join(
+        pair
+        for pair in parts.query.split("&")
+        if pair and not is_tracking(pair.partition("=")[0])
+    )
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def is_tracking(param: str) -> bool:
+    param = param.lower()
+    return param.startswith("utm_") or param in TRACKING_PARAMS
+
+
+class PreviewFetcher:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        settings: Settings,
+        pool: "ParsePool | None" = None,
+    ) -> None:
+        self.client = client
+        self.settings = settings
+        self.pool = pool
+        self.hosts = HostLimiter(settings.per_host_limit)
+        self.slots = asyncio.Semaphore(settings.max_concurrent_fetches)
+
+    async def fetch(self, url: str) -> Preview:
+        url = normalize_url(url)
+        host = urlsplit(url).hostname or ""
+        try:
+            async with asyncio.timeout(self.settings.total_timeout):
+                # сначала слот хоста: ждущие занятый сайт не держат общий лимит
+                async with self.hosts.slot(host), self.slots:
+                    content, charset, url = await self._download(url)
+        except (TimeoutError, httpx.TimeoutException) as error:
+            raise PreviewError("Сайт не ответил вовремя", status_code=504) from error
+        except httpx.HTTPStatusError as error:
+            raise PreviewError(f"Сайт ответил {error.response.status_code}") from error
+        except httpx.HTTPError as error:
+            raise PreviewError("Не удалось загрузить страницу") from error
+
+        # слоты уже отпущены: разбор не держит соединения и лимиты хостов
+        if self.pool is None:
+            return parse_document(content, charset, url)
+        return await self.pool.parse(content, charset, url)
+
+    async def _download(self, url: str) -> tuple[bytes, str | None, str]:
+        async with self.client.stream("GET", url) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "text/html")
+            if "html" not in content_type.lower():
+                raise PreviewError("Ссылка ведет не на страницу", status_code=422)
+
+            chunks: list[bytes] = []
+            read = 0
+            tail = b""
+            # тело дальше </head> не нужно: выходим из stream, соединение закрывается
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                read += len(chunk)
+                window = tail + chunk.lower()
+                if b"</head" in window or b"<body" in window:
+                    break
+                if read >= self.settings.head_max_bytes:
+                    break
+                tail = window[-5:]
+            content = b"".join(chunks)[: self.settings.head_max_bytes]
+            return content, response.charset_encoding, str(response.url)
@@ -0,0 +1,175 @@
+import asyncio
+import tempfile
+import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import IO
+
+import httpx
+from minio import Minio
+
+from .config import Settings
+from .fetcher import PreviewError, PreviewFetcher, normalize_url
+
+# как PICTURE_PREFIX и PICTURE_UPLOAD_TYPES в backend wishitems.media:
+# ключ того же вида, что и при прямой загрузке из браузера, поэтому
+# непривязанные картинки подберет sweep_media_leaks
+PICTURE_PREFIX = "wishitems/picture/"
+IMAGE_TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+    "image/avif": "avif",
+}
+# столько байт начала файла хватает, чтобы узнать формат
+SNIFF_BYTES = 32
+
+
+def sniff_image_type(head: bytes) -> str | None:
+    # заголовку Content-Type не верим: CDN отдают и text/plain, и octet-stream
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis"):
+        return "image/avif"
+    return None
+
+
+@dataclass
+class StoredImage:
+    # key — имя для WishItemModel.picture
+    key: str
+    content_type: str
+    size: int
+
+
+class MediaBucket:
+    # бакет media того же MinIO, что и у backend; загрузка — одним PUT
+    # по подписанной ссылке, тело идет потоком. Клиент свой: MinIO живет
+    # во внутренней сети, куда клиенту превью ходить нельзя
+    def __init__(self, settings: Settings, client: httpx.AsyncClient) -> None:
+        self.client = client
+        self.bucket = settings.media_bucket
+        self.minio = Minio(
+            settings.minio_endpoint,
+            access_key=settings.minio_access_key,
+            secret_key=settings.minio_secret_key,
+            secure=settings.minio_secure,
+            # с регионом клиент не ходит в MinIO за его определением
+            region=settings.minio_region,
+        )
+
+    def upload_url(self, key: str) -> str:
+        return str(
+            self.minio.presigned_put_object(
+                self.bucket, key, expires=timedelta(minutes=5)
+            )
+        )
+
+    async def put(
+        self, key: str, content_type: str, size: int, body: AsyncIterator[bytes]
+    ) -> None:
+        response = await self.client.put(
+            self.upload_url(key),
+            content=body,
+            headers={"Content-Type": content_type, "Content-Length": str(size)},
+        )
+        if response.is_error:
+            raise PreviewError(f"Хранилище ответило {response.status_code}")
+
+
+class ImageIngestor:
+    def __init__(
+        self, fetcher: PreviewFetcher, bucket: MediaBucket, settings: Settings
+    ) -> None:
+        self.fetcher = fetcher
+        self.client = fetcher.client
+        self.bucket = bucket
+        self.settings = settings
+
+    async def ingest(self, url: str) -> StoredImage:
+        url = normalize_url(url)
+        host = httpx.URL(url).host
+        try:
+            async with asyncio.timeout(self.settings.image_timeout):
+                # к сайту картинки те же лимиты, что и к страницам
+                async with self.fetcher.hosts.slot(host), self.fetcher.slots:
+                    async with self.client.stream("GET", url) as response:
+                        response.raise_for_status()
+                        return await self._store(response)
+        except (TimeoutError, httpx.TimeoutException) as error:
+            raise PreviewError("Сайт не ответил вовремя", status_code=504) from error
+        except httpx.HTTPStatusError as error:
+            raise PreviewError(f"Сайт ответил {error.response.status_code}") from error
+        except httpx.HTTPError as error:
+            raise PreviewError("Не удалось загрузить картинку") from error
+
+    async def _store(self, response: httpx.Response) -> StoredImage:
+        limit = self.settings.image_max_bytes
+        declared = response.headers.get("content-length", "")
+        length = int(declared) if declared.isdigit() else None
+        if length is not None and length > limit:
+            raise PreviewError("Картинка слишком большая", status_code=413)
+        if response.headers.get("content-encoding", "identity") != "identity":
+            # сжатый ответ распакуется в другой размер
+            length = None
+
+        chunks = response.aiter_bytes()
+        head = b""
+        async for chunk in chunks:
+            head += chunk
+            if len(head) >= SNIFF_BYTES:
+                break
+        content_type = sniff_image_type(head)
+        if content_type is None:
+            raise PreviewError("Ссылка ведет не на картинку", status_code=415)
+
+        key = f"{PICTURE_PREFIX}{uuid.uuid4()}.{IMAGE_TYPES[content_type]}"
+        if length is not None:
+            await self.bucket.put(
+                key, content_type, length, capped(head, chunks, length, length)
+            )
+            return StoredImage(key, content_type, length)
+
+        # без Content-Length PUT не принимают: копим во временный файл,
+        # он держит в памяти только первые image_spool_bytes
+        with tempfile.SpooledTemporaryFile(self.settings.image_spool_bytes) as spool:
+            async for chunk in capped(head, chunks, limit):
+                spool.write(chunk)
+            size = spool.tell()
+            spool.seek(0)
+            await self.bucket.put(key, content_type, size, read_chunks(spool))
+        return StoredImage(key, content_type, size)
+
+
+async def capped(
+    head: bytes,
+    chunks: AsyncIterator[bytes],
+    limit: int,
+    expected: int | None = None,
+) -> AsyncIterator[bytes]:
+    # обрывает поток, как только сайт прислал больше обещанного или лимита;
+    # оборванный PUT хранилище не сохраняет
+    size = len(head)
+    if size > limit:
+        raise PreviewError("Картинка слишком большая", status_code=413)
+    yield head
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > limit:
+            raise PreviewError("Картинка слишком большая", status_code=413)
+        yield chunk
+    if expected is not None and size != expected:
+        raise PreviewError("Картинка загрузилась не полностью")
+
+
+async def read_chunks(file: IO[bytes], size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    while chunk := file.read(size):
+        yield chunk
@@ -0,0 +1,210 @@
+import codecs
+import json
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Any
+from urllib.parse import urljoin
+
+
+@dataclass
+class Preview:
+    url: str
+    title: str = ""
+    image: str = ""
+    price: str = ""
+    currency: str = ""
+
+
+# порядок важен: берем первый непустой
+TITLE_KEYS = ("og:title", "twitter:title")
+IMAGE_KEYS = (
+    "og:image:secure_url",
+    "og:image",
+    "og:image:url",
+    "twitter:image",
+    "twitter:image:src",
+)
+PRICE_KEYS = ("product:price:amount", "og:price:amount", "product:price", "price")
+CURRENCY_KEYS = ("product:price:currency", "og:price:currency", "pricecurrency")
+
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+class HeadParser(HTMLParser):
+    # потоковый разбор: feed по кускам, done — как только закрылся <head>
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.meta: dict[str, str] = {}
+        self.title = ""
+        self.image_src = ""
+        self.json_ld: list[str] = []
+        self.done = False
+        self._capture: str | None = None
+        self._buffer: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if self.done:
+            return
+        attributes = {name: value or "" for name, value in attrs}
+        if tag == "meta":
+            key = (
+                attributes.get("property")
+                or attributes.get("name")
+                or attributes.get("itemprop")
+                or ""
+            ).lower()
+            content = attributes.get("content", "").strip()
+            if key and content:
+                self.meta.setdefault(key, content)
+        elif tag == "title" and not self.title:
+            self._start("title")
+        elif tag == "script":
+            if attributes.get("type", "").lower() == "application/ld+json":
+                self._start("script")
+        elif tag == "link" and "image_src" in attributes.get("rel", "").lower():
+            self.image_src = self.image_src or attributes.get("href", "")
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag: str) -> None:
+        if self.done:
+            return
+        if tag == self._capture:
+            text = "".join(self._buffer).strip()
+            if tag == "title":
+                self.title = " ".join(text.split())
+            else:
+                self.json_ld.append(text)
+            self._capture = None
+        if tag == "head":
+            self.done = True
+
+    def handle_data(self, data: str) -> None:
+        if self._capture and not self.done:
+            self._buffer.append(data)
+
+    def _start(self, tag: str) -> None:
+        self._capture = tag
+        self._buffer = []
+
+
+def sniff_charset(head: bytes) -> str | None:
+    match = META_CHARSET.search(head[:2048])
+    return match.group(1).decode("ascii") if match else None
+
+
+def decode(content: bytes, charset: str | None) -> str:
+    charset = charset or sniff_charset(content) or "utf-8"
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = "utf-8"
+    return content.decode(charset, errors="replace")
+
+
+def extract(
+    parser: HeadParser, url: str, nodes: list[dict[str, Any]] | None = None
+) -> Preview:
+    if nodes is None:
+        nodes = json_ld_scripts(parser.json_ld)
+    product = json_ld_product(nodes)
+    offer = product_offer(product)
+
+    title = first(parser.meta, TITLE_KEYS) or text(product.get("name"))
+    image = (
+        first(parser.meta, IMAGE_KEYS) or json_ld_image(product.get("image"))
+    ) or parser.image_src
+    price = first(parser.meta, PRICE_KEYS) or text(
+        offer.get("price") or offer.get("lowPrice")
+    )
+    currency = first(parser.meta, CURRENCY_KEYS) or text(offer.get("priceCurrency"))
+
+    return Preview(
+        url=url,
+        title=title or parser.title,
+        image=absolute(image, url),
+        price=normalize_price(price),
+        currency=currency.upper(),
+    )
+
+
+def first(meta: dict[str, str], keys: tuple[str, ...]) -> str:
+    for key in keys:
+        if value := meta.get(key):
+            return value
+    return ""
+
+
+def text(value: Any) -> str:
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return str(value).strip()
+    return ""
+
+
+def absolute(link: str, base: str) -> str:
+    if not link:
+        return ""
+    link = urljoin(base, link)
+    return link if link.startswith(("http://", "https://")) else ""
+
+
+def normalize_price(price: str) -> str:
+    # «1 299,90» → «1299.90»: разделители разрядов бывают и неразрывными пробелами
+    price = "".join(price.split()).strip(".,")
+    # в «1,299.90» и «1.299,90» десятичный разделитель — последний
+    if price.rfind(",") > price.rfind("."):
+        price = price.replace(".", "").replace(",", ".")
+    else:
+        price = price.replace(",", "")
+    return price
+
+
+# JSON-LD
+
+
+def json_ld_nodes(value: Any) -> list[dict[str, Any]]:
+    if isinstance(value, list):
+        return [node for item in value for node in json_ld_nodes(item)]
+    if not isinstance(value, dict):
+        return []
+    return [value, *json_ld_nodes(value.get("@graph"))]
+
+
+def json_ld_scripts(scripts: list[str]) -> list[dict[str, Any]]:
+    nodes = []
+    for script in scripts:
+        try:
+            nodes.extend(json_ld_nodes(json.loads(script)))
+        except ValueError:
+            continue
+    return nodes
+
+
+def json_ld_product(nodes: list[dict[str, Any]]) -> dict[str, Any]:
+    for node in nodes:
+        types = node.get("@type")
+        if types == "Product" or (isinstance(types, list) and "Product" in types):
+            return node
+    return {}
+
+
+def product_offer(product: dict[str, Any]) -> dict[str, Any]:
+    offers = product.get("offers")
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    if not isinstance(offers, dict):
+        return {}
+    if "price" not in offers and isinstance(
+        specification := offers.get("priceSpecification"), dict
+    ):
+        return {**specification, **offers}
+    return offers
+
+
+def json_ld_image(image: Any) -> str:
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get("url") or image.get("contentUrl")
+    return text(image)
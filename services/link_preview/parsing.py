@@ -0,0 +1,77 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .config import Settings
+from .errors import PreviewError
+from .extractors import parse_document
+from .parser import Preview
+
+
+class ParsePool:
+    # разбор тяжелых страниц (мегабайты тегов в <head>) вне event loop,
+    # иначе один такой документ стопорит все остальные запросы
+    def __init__(self, settings: Settings, executor: Executor | None = None) -> None:
+        self.settings = settings
+        self.executor = executor or self._spawn()
+        # очередь к пулу ограничена: документы ждут в памяти процесса
+        self.queue = asyncio.Semaphore(settings.parse_workers * 2)
+
+    def _spawn(self) -> Executor:
+        # spawn, а не fork: форк процесса с живым loop и потоками небезопасен
+        return ProcessPoolExecutor(
+            max_workers=self.settings.parse_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    async def parse(self, content: bytes, charset: str | None, url: str) -> Preview:
+        if len(content) <= self.settings.parse_inline_bytes:
+            return parse_document(content, charset, url)
+
+        async with self.queue:
+            executor = self.executor
+            try:
+                future = executor.submit(parse_document, content, charset, url)
+                return await asyncio.wait_for(
+                    asyncio.wrap_future(future), self.settings.parse_timeout
+                )
+            except TimeoutError as error:
+                # документ, который еще ждал в очереди пула, отмена снимает;
+                # если разбор уже идет, воркер занят до конца документа —
+                # такой пул меняем целиком, иначе он тихо теряет воркеров
+                future.cancel()
+                if future.running():
+                    self._replace(executor)
+                raise PreviewError(
+                    "Страницу не удалось разобрать вовремя", status_code=504
+                ) from error
+            except BrokenProcessPool as error:
+                # воркер упал (например, OOM) — пул больше не принимает задачи
+                self._replace(executor)
+                raise PreviewError("Не удалось разобрать страницу") from error
+            except PreviewError:
+                raise
+            except Exception as error:
+                # например, результат не распиклился — запрос это ронять не должно
+                raise PreviewError("Не удалось разобрать страницу") from error
+
+    def _replace(self, executor: Executor) -> None:
+        # несколько запросов могут упасть на одном пуле — меняет первый
+        if self.executor is not executor:
+            return
+        self.executor = self._spawn()
+        terminate(executor)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def terminate(executor: Executor) -> None:
+    # shutdown ждет, пока воркер доделает задачу; зависший разбор не кончится,
+    # поэтому процессы убиваем. Остальные документы этого пула получат
+    # BrokenProcessPool. Список процессов берем до shutdown: он его обнуляет
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
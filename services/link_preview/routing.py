@@ -0,0 +1,99 @@
+import hmac
+from dataclasses import dataclass
+
+from litestar import Router, get, post
+from litestar.connection import ASGIConnection
+from litestar.datastructures import State
+from litestar.di import Provide
+from litestar.exceptions import HTTPException, NotAuthorizedException
+from litestar.handlers.base import BaseRouteHandler
+from litestar.response import Stream
+
+from .batch import preview_lines
+from .cache import PreviewCache
+from .fetcher import PreviewError
+from .images import ImageIngestor, StoredImage
+from .parser import Preview
+
+
+def provide_previews(state: State) -> PreviewCache:
+    previews: PreviewCache = state.previews
+    return previews
+
+
+def provide_images(state: State) -> ImageIngestor:
+    images: ImageIngestor = state.images
+    return images
+
+
+@get("/preview")
+async def preview(url: str, previews: PreviewCache) -> Preview:
+    try:
+        return await previews.get(url)
+    except PreviewError as error:
+        raise HTTPException(
+            status_code=error.status_code, detail=error.detail
+        ) from error
+
+
+@get("/metrics")
+async def metrics(previews: PreviewCache) -> dict[str, float]:
+    # доля запросов, которые дождались чужой загрузки вместо своей
+    return {
+        "preview_flights": previews.flights.flights,
+        "preview_coalesced": previews.flights.coalesced,
+        "preview_coalescing_ratio": round(previews.flights.ratio, 4),
+    }
+
+
+@dataclass
+class PreviewBatch:
+    urls: list[str]
+
+
+@post("/previews", status_code=200)
+async def preview_batch(data: PreviewBatch, previews: PreviewCache) -> Stream:
+    urls = list(dict.fromkeys(url.strip() for url in data.urls))
+    if len(urls) > previews.settings.batch_max_urls:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не больше {previews.settings.batch_max_urls} ссылок за раз",
+        )
+    return Stream(preview_lines(previews, urls), media_type="application/x-ndjson")
+
+
+@dataclass
+class ImageSource:
+    url: str
+
+
+def backend_only(connection: ASGIConnection, handler: BaseRouteHandler) -> None:
+    token = connection.app.state.images.settings.images_token
+    scheme, _, given = connection.headers.get("authorization", "").partition(" ")
+    if not (
+        token
+        and scheme.lower() == "bearer"
+        and hmac.compare_digest(given.encode(), token.encode())
+    ):
+        raise NotAuthorizedException()
+
+
+@post("/images", status_code=201, guards=[backend_only])
+async def store_image(data: ImageSource, images: ImageIngestor) -> StoredImage:
+    # og:image из превью — в бакет media, ключ backend кладет в picture
+    try:
+        return await images.ingest(data.url)
+    except PreviewError as error:
+        raise HTTPException(
+            status_code=error.status_code, detail=error.detail
+        ) from error
+
+
+api_router = Router(
+    path="/",
+    route_handlers=[preview, preview_batch, metrics, store_image],
+    dependencies={
+        "previews": Provide(provide_previews, sync_to_thread=False),
+        "images": Provide(provide_images, sync_to_thread=False),
+    },
+)
@@ -0,0 +1,36 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    # конкурентные вызовы с одним ключом ждут одну общую задачу
+    def __init__(self) -> None:
+        self._flights: dict[str, asyncio.Future[T]] = {}
+        self.flights = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            self.flights += 1
+            flight = self._flights[key] = asyncio.ensure_future(call())
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+            flight.add_done_callback(_retrieve)
+        else:
+            self.coalesced += 1
+        # отмена одного ожидающего не отменяет загрузку для остальных
+        return await asyncio.shield(flight)
+
+    @property
+    def ratio(self) -> float:
+        total = self.flights + self.coalesced
+        return self.coalesced / total if total else 0.0
+
+
+def _retrieve(flight: asyncio.Future[T]) -> None:
+    # ошибку забирают ожидающие; если все отменились — не шумим в лог
+    if not flight.cancelled():
+        flight.exception()
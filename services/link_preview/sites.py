@@ -0,0 +1,57 @@
+from dataclasses import dataclass, field
+
+FIELDS = ("title", "image", "price", "currency")
+
+
+@dataclass(frozen=True)
+class SiteRules:
+    # правила магазина: по каждому полю источники проверяются по порядку,
+    # найденное значение важнее общего OpenGraph/JSON-LD
+    hosts: tuple[str, ...]
+    # ключи <meta> (property, name или itemprop)
+    meta: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    # пути по узлам JSON-LD через точку, числа — индексы списков
+    json_ld: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    # регулярки по тексту до </head> с одной группой
+    patterns: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    # валюта, если цена нашлась, а валюты на странице нет
+    currency: str = ""
+
+
+# новый магазин: правила + страница и ожидаемый результат в tests/golden
+SITES: tuple[SiteRules, ...] = (
+    # og:title с хвостом «купить на OZON», цена только в JSON-LD
+    SiteRules(
+        hosts=("ozon.ru",),
+        json_ld={
+            "title": ("name",),
+            "price": ("offers.price", "offers.lowPrice"),
+            "currency": ("offers.priceCurrency",),
+        },
+        currency="RUB",
+    ),
+    # og:image — общая заглушка, фото карточки в twitter:image;
+    # цена со скидкой есть только в SSR-состоянии
+    SiteRules(
+        hosts=("wildberries.ru", "wb.ru"),
+        meta={"image": ("twitter:image",)},
+        patterns={"price": (r'"priceWithDiscount"\s*:\s*"?(\d[\d\s.,]*)',)},
+        currency="RUB",
+    ),
+    SiteRules(
+        hosts=("market.yandex.ru",),
+        patterns={
+            "title": (r"<title>\s*(.+?)\s+[—-]\s+купить",),
+            "price": (r'"price"\s*:\s*\{\s*"value"\s*:\s*"?(\d[\d\s.,]*)',),
+        },
+        currency="RUB",
+    ),
+    # цена строкой вместе с символом валюты, код валюты — отдельно
+    SiteRules(
+        hosts=("aliexpress.ru", "aliexpress.com"),
+        patterns={
+            "price": (r'"formatedActivityPrice"\s*:\s*"[^"\d]*(\d[\d\s.,]*)',),
+            "currency": (r'"currencyCode"\s*:\s*"([A-Z]{3})"',),
+        },
+    ),
+)
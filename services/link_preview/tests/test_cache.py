@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+from litestar.stores.memory import MemoryStore
+
+from services.link_preview.cache import LRU, CacheEntry, PreviewCache
+from services.link_preview.config import Settings
+from services.link_preview.fetcher import PreviewError
+from services.link_preview.parser import Preview
+from services.link_preview.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+URL = "https://shop.ru/item/1"
+SETTINGS = Settings(
+    cache_fresh_ttl=100, cache_stale_ttl=1000, cache_negative_ttl=10, cache_lru_size=2
+)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Site:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.title = "Кофемолка"
+        self.error: PreviewError | None = None
+
+    async def fetch(self, url: str) -> Preview:
+        self.calls += 1
+        await asyncio.sleep(0)
+        if self.error:
+            raise self.error
+        return Preview(url=url, title=self.title)
+
+
+class BrokenStore(MemoryStore):
+    async def get(self, key: str, renew_for: object = None) -> bytes | None:
+        raise ConnectionError
+
+    async def set(
+        self, key: str, value: str | bytes, expires_in: object = None
+    ) -> None:
+        raise ConnectionError
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+@pytest.fixture
+def site() -> Site:
+    return Site()
+
+
+@pytest.fixture
+def store() -> MemoryStore:
+    return MemoryStore()
+
+
+@pytest.fixture
+def previews(store: MemoryStore, site: Site, clock: Clock) -> PreviewCache:
+    return PreviewCache(store, site.fetch, SETTINGS, clock=clock)
+
+
+async def test_cache_tiers(
+    previews: PreviewCache, store: MemoryStore, site: Site, clock: Clock
+) -> None:
+    assert (await previews.get(URL)).title == "Кофемолка"
+    assert (await previews.get(URL)).title == "Кофемолка"
+    assert site.calls == 1
+    assert await store.exists(URL)
+
+    # другой процесс: своего LRU нет, но Redis уже прогрет
+    other = PreviewCache(store, site.fetch, SETTINGS, clock=clock)
+    assert (await other.get(URL)).title == "Кофемолка"
+    assert site.calls == 1
+
+
+async def test_cache_negative(previews: PreviewCache, site: Site, clock: Clock) -> None:
+    site.error = PreviewError("Сайт ответил 404")
+    for _ in range(3):
+        with pytest.raises(PreviewError) as error:
+            await previews.get(URL)
+        assert error.value.status_code == 502
+    assert site.calls == 1
+
+    site.error = None
+    clock.now += SETTINGS.cache_negative_ttl + 1
+    assert (await previews.get(URL)).title == "Кофемолка"
+    assert site.calls == 2
+
+
+async def test_cache_stale_while_revalidate(
+    previews: PreviewCache, site: Site, clock: Clock
+) -> None:
+    await previews.get(URL)
+    site.title = "Кофемолка 2.0"
+    clock.now += SETTINGS.cache_fresh_ttl + 1
+
+    stale = await asyncio.gather(*(previews.get(URL) for _ in range(5)))
+    assert {preview.title for preview in stale} == {"Кофемолка"}
+
+    await asyncio.gather(*previews._refreshing.values())
+    assert site.calls == 2
+    assert (await previews.get(URL)).title == "Кофемолка 2.0"
+
+
+async def test_cache_stale_refresh_failure_keeps_entry(
+    previews: PreviewCache, site: Site, clock: Clock
+) -> None:
+    await previews.get(URL)
+    site.error = PreviewError("Сайт не ответил вовремя", status_code=504)
+    clock.now += SETTINGS.cache_fresh_ttl + 1
+
+    await previews.get(URL)
+    await asyncio.gather(*previews._refreshing.values())
+    assert (await previews.get(URL)).title == "Кофемолка"
+
+    clock.now += SETTINGS.cache_stale_ttl
+    with pytest.raises(PreviewError):
+        await previews.get(URL)
+
+
+async def test_cache_without_store(site: Site, clock: Clock) -> None:
+    previews = PreviewCache(BrokenStore(), site.fetch, SETTINGS, clock=clock)
+    assert (await previews.get(URL)).title == "Кофемолка"
+    assert (await previews.get(URL)).title == "Кофемолка"
+    assert site.calls == 1
+
+
+def test_lru_evicts_least_recent() -> None:
+    lru = LRU(2)
+    entry = CacheEntry(fetched_at=0, expires_at=10)
+    lru.set("a", entry)
+    lru.set("b", entry)
+    lru.get("a", now=1)
+    lru.set("c", entry)
+
+    assert lru.get("a", now=1) is entry
+    assert lru.get("b", now=1) is None
+    assert lru.get("c", now=11) is None
+
+
+# SINGLE FLIGHT
+
+
+async def test_cache_coalesces_concurrent_misses(
+    previews: PreviewCache, site: Site
+) -> None:
+    urls = [URL, URL + "?utm_source=tg", URL + "#price"] * 10
+    results = await asyncio.gather(*(previews.get(url) for url in urls))
+
+    assert {preview.title for preview in results} == {"Кофемолка"}
+    assert site.calls == 1
+    assert previews.flights.flights == 1
+    assert previews.flights.coalesced == 29
+    assert previews.flights.ratio == pytest.approx(29 / 30)
+
+
+async def test_single_flight_shares_errors_and_survives_cancel() -> None:
+    flights: SingleFlight[str] = SingleFlight()
+    started = asyncio.Event()
+    release = asyncio.Event()
+    calls = 0
+
+    async def call() -> str:
+        nonlocal calls
+        calls += 1
+        started.set()
+        await release.wait()
+        raise PreviewError("Сайт ответил 500")
+
+    leader = asyncio.create_task(flights.do("key", call))
+    await started.wait()
+    follower = asyncio.create_task(flights.do("key", call))
+    await asyncio.sleep(0)
+    # запрос, который начал загрузку, ушел — остальные все равно ее дождутся
+    leader.cancel()
+    release.set()
+
+    with pytest.raises(PreviewError):
+        await follower
+    assert calls == 1
+    assert flights._flights == {}
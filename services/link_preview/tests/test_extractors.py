@@ -0,0 +1,102 @@
+import json
+import os
+from dataclasses import asdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import pytest
+
+from services.link_preview.extractors import ExtractorRegistry, parse_document
+from services.link_preview.parser import HeadParser, Preview
+from services.link_preview.sites import SITES, SiteRules
+
+GOLDEN = Path(__file__).parent / "golden"
+
+
+# GOLDEN
+
+
+@pytest.mark.parametrize(
+    "page", sorted(GOLDEN.glob("*.html")), ids=lambda page: page.stem
+)
+def test_golden(page: Path) -> None:
+    # UPDATE_GOLDEN=1 pytest — перезаписать ожидания после правки правил
+    expected_path = page.with_suffix(".json")
+    expected = json.loads(expected_path.read_text())
+    preview = asdict(parse_document(page.read_bytes(), None, expected["url"]))
+
+    if os.environ.get("UPDATE_GOLDEN"):
+        expected_path.write_text(
+            json.dumps(preview, ensure_ascii=False, indent=2) + "\n"
+        )
+    assert preview == expected
+
+
+def test_golden_covers_every_site() -> None:
+    hosts = [
+        urlsplit(json.loads(path.read_text())["url"]).hostname or ""
+        for path in GOLDEN.glob("*.json")
+    ]
+    registry = ExtractorRegistry(SITES)
+    for rules in SITES:
+        extractor = registry.hosts[rules.hosts[0]]
+        assert any(registry.lookup(host) is extractor for host in hosts), rules.hosts
+
+
+# REGISTRY
+
+
+def test_registry_lookup_by_host_suffix() -> None:
+    registry = ExtractorRegistry(
+        [SiteRules(hosts=("shop.ru",)), SiteRules(hosts=("market.yandex.ru",))]
+    )
+    shop = registry.hosts["shop.ru"]
+
+    assert registry.lookup("shop.ru") is shop
+    assert registry.lookup("WWW.m.Shop.ru") is shop
+    assert registry.lookup("notshop.ru") is None
+    assert registry.lookup("yandex.ru") is None
+    assert registry.lookup("ru") is None
+    assert registry.lookup("market.yandex.ru") is registry.hosts["market.yandex.ru"]
+
+
+@pytest.mark.parametrize(
+    "rules",
+    [
+        [SiteRules(hosts=("shop.ru",)), SiteRules(hosts=("shop.ru",))],
+        [SiteRules(hosts=("shop.ru",), meta={"description": ("og:description",)})],
+        [SiteRules(hosts=("shop.ru",), patterns={"price": (r"price: \d+",)})],
+    ],
+)
+def test_registry_rejects_bad_rules(rules: list[SiteRules]) -> None:
+    with pytest.raises(ValueError):
+        ExtractorRegistry(rules)
+
+
+def test_site_rules_override_generic() -> None:
+    rules = SiteRules(
+        hosts=("shop.ru",),
+        meta={"title": ("og:description",)},
+        json_ld={"price": ("offers.1.price",)},
+        currency="RUB",
+    )
+    parser = HeadParser()
+    parser.feed(
+        '<head><meta property="og:title" content="Купить по низкой цене">'
+        '<meta property="og:description" content="Кофемолка"></head>'
+    )
+    nodes = [{"offers": [{"price": 100}, {"price": "1 200"}]}]
+    preview = (
+        ExtractorRegistry([rules])
+        .hosts["shop.ru"]
+        .apply(
+            Preview(url="https://shop.ru/", title="Купить по низкой цене"),
+            parser,
+            nodes,
+            "",
+        )
+    )
+
+    assert preview == Preview(
+        url="https://shop.ru/", title="Кофемолка", price="1200", currency="RUB"
+    )
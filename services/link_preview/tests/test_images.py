@@ -0,0 +1,281 @@
+import hashlib
+import threading
+import tracemalloc
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import httpcore
+import httpx
+import pytest
+from litestar.stores.memory import MemoryStore
+from litestar.testing import TestClient
+
+from services.link_preview.app import create_app
+from services.link_preview.config import Settings
+from services.link_preview.fetcher import (
+    PreviewError,
+    PreviewFetcher,
+    PublicOnlyTransport,
+    Resolver,
+    build_client,
+    resolve_host,
+)
+from services.link_preview.images import (
+    ImageIngestor,
+    MediaBucket,
+    sniff_image_type,
+)
+
+pytestmark = pytest.mark.anyio
+
+PNG_HEAD = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR"
+# байты картинок заготовлены заранее: сервер отдает срезы, не копии
+FILLER = memoryview(bytes(16 * 1024 * 1024))
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # /image?size=N — источник картинки, PUT /media/<key> — S3-совместимое хранилище
+    server: "StandIn"
+
+    def do_GET(self) -> None:
+        self.server.requests += 1
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        size = int(query.get("size", ["4096"])[0])
+        head = b"<!doctype html>" if parts.path == "/page" else PNG_HEAD
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        if "undeclared" not in query:
+            self.send_header("Content-Length", str(size))
+        self.end_headers()
+        try:
+            self.wfile.write(head)
+            self.wfile.write(FILLER[: size - len(head)])
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_PUT(self) -> None:
+        self.server.requests += 1
+        parts = urlsplit(self.path)
+        bucket, _, key = parts.path.lstrip("/").partition("/")
+        if bucket != "media" or "X-Amz-Signature" not in parse_qs(parts.query):
+            self.send_error(403)
+            return
+        if "Content-Length" not in self.headers:
+            self.send_error(411)
+            return
+
+        length = int(self.headers["Content-Length"])
+        digest = hashlib.sha256()
+        received = 0
+        while received < length:
+            chunk = self.rfile.read(min(64 * 1024, length - received))
+            if not chunk:
+                # клиент оборвал загрузку: как и S3, объект не создаем
+                return
+            digest.update(chunk)
+            received += len(chunk)
+        self.server.objects[key] = (received, digest.hexdigest())
+        self.server.content_types[key] = self.headers["Content-Type"]
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+class StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.objects: dict[str, tuple[int, str]] = {}
+        self.content_types: dict[str, str] = {}
+        self.requests = 0
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self.server_address[1]}"
+
+
+@pytest.fixture
+def stand_in() -> Iterator[StandIn]:
+    server = StandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stand_in_settings(stand_in: StandIn, **settings: Any) -> Settings:
+    return Settings(
+        minio_endpoint=stand_in.address,
+        minio_access_key="access",
+        minio_secret_key="secret",
+        **{"images_token": "backend-token", **settings},
+    )
+
+
+# стенд слушает 127.0.0.1: для проверки адресов выдаем его за публичный
+# адрес, а подключаемся все равно к loopback
+PUBLIC_ADDRESS = "93.184.215.14"
+
+
+async def resolve(host: str, port: int) -> list[str]:
+    return [PUBLIC_ADDRESS]
+
+
+class StandInBackend(httpcore.AnyIOBackend):
+    async def connect_tcp(
+        self, host: str, port: int, *args: Any, **kwargs: Any
+    ) -> httpcore.AsyncNetworkStream:
+        if host == PUBLIC_ADDRESS:
+            host = "127.0.0.1"
+        return await super().connect_tcp(host, port, *args, **kwargs)
+
+
+def stand_in_transport(
+    config: Settings, resolve: Resolver = resolve
+) -> PublicOnlyTransport:
+    return PublicOnlyTransport(config, resolve, StandInBackend())
+
+
+def ingestor(config: Settings, resolve: Resolver = resolve) -> ImageIngestor:
+    client = build_client(config, stand_in_transport(config, resolve))
+    fetcher = PreviewFetcher(client, config)
+    return ImageIngestor(fetcher, MediaBucket(config, httpx.AsyncClient()), config)
+
+
+def png_digest(size: int) -> str:
+    return hashlib.sha256(PNG_HEAD + FILLER[: size - len(PNG_HEAD)]).hexdigest()
+
+
+@pytest.mark.parametrize(
+    "head, content_type",
+    [
+        (b"\xff\xd8\xff\xe0\x00\x10JFIF", "image/jpeg"),
+        (PNG_HEAD, "image/png"),
+        (b"GIF89a\x01\x00", "image/gif"),
+        (b"RIFF\x24\x00\x00\x00WEBPVP8 ", "image/webp"),
+        (b"\x00\x00\x00\x1cftypavif\x00\x00", "image/avif"),
+        (b"<!doctype html>", None),
+        (b"<svg xmlns=", None),
+    ],
+)
+def test_sniff_image_type(head: bytes, content_type: str | None) -> None:
+    assert sniff_image_type(head) == content_type
+
+
+@pytest.mark.parametrize("query", ["", "&undeclared"])
+async def test_ingest_streams_into_bucket(stand_in: StandIn, query: str) -> None:
+    size = 3 * 1024 * 1024
+    images = ingestor(stand_in_settings(stand_in))
+
+    tracemalloc.start()
+    try:
+        stored = await images.ingest(
+            f"http://{stand_in.address}/image?size={size}{query}&utm_source=tg"
+        )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        await images.client.aclose()
+        await images.bucket.client.aclose()
+
+    assert stored.key.startswith("wishitems/picture/")
+    assert stored.key.endswith(".png")
+    assert stored.content_type == "image/png"
+    assert stored.size == size
+    assert stand_in.objects == {stored.key: (size, png_digest(size))}
+    assert stand_in.content_types[stored.key] == "image/png"
+    # тело идет кусками: в памяти меньше трети картинки
+    assert peak < size / 3
+
+
+@pytest.mark.parametrize("query", ["", "&undeclared"])
+async def test_ingest_size_cap(stand_in: StandIn, query: str) -> None:
+    images = ingestor(stand_in_settings(stand_in, image_max_bytes=1024 * 1024))
+
+    with pytest.raises(PreviewError) as error:
+        await images.ingest(
+            f"http://{stand_in.address}/image?size={2 * 1024 * 1024}{query}"
+        )
+    await images.client.aclose()
+    await images.bucket.client.aclose()
+
+    assert error.value.status_code == 413
+    assert stand_in.objects == {}
+
+
+async def test_ingest_rejects_not_image(stand_in: StandIn) -> None:
+    images = ingestor(stand_in_settings(stand_in))
+
+    with pytest.raises(PreviewError) as error:
+        await images.ingest(f"http://{stand_in.address}/page")
+    await images.client.aclose()
+    await images.bucket.client.aclose()
+
+    assert error.value.status_code == 415
+    assert stand_in.objects == {}
+
+
+async def test_ingest_rejects_internal_address(stand_in: StandIn) -> None:
+    # настоящий DNS: стенд на 127.0.0.1 — внутренний адрес
+    images = ingestor(stand_in_settings(stand_in), resolve=resolve_host)
+
+    with pytest.raises(PreviewError) as error:
+        await images.ingest(f"http://{stand_in.address}/image")
+    await images.client.aclose()
+    await images.bucket.client.aclose()
+
+    assert error.value.status_code == 400
+    assert stand_in.requests == 0
+    assert stand_in.objects == {}
+
+
+def test_store_image_endpoint(stand_in: StandIn) -> None:
+    config = stand_in_settings(stand_in)
+    app = create_app(config, stand_in_transport(config), MemoryStore())
+    image = {"url": f"http://{stand_in.address}/image?size=4096"}
+    backend = {"Authorization": "Bearer backend-token"}
+    with TestClient(app) as client:
+        response = client.post("/images", json=image, headers=backend)
+        failed = client.post(
+            "/images", json={"url": "javascript:alert(1)"}, headers=backend
+        )
+
+    assert response.status_code == 201
+    assert response.json()["key"] in stand_in.objects
+    assert failed.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "token, authorization",
+    [
+        ("backend-token", None),
+        ("backend-token", "Bearer wrong-token"),
+        ("backend-token", "Basic backend-token"),
+        # токен не задан — ручка закрыта для всех
+        ("", "Bearer "),
+    ],
+)
+def test_store_image_requires_backend_token(
+    stand_in: StandIn, token: str, authorization: str | None
+) -> None:
+    config = stand_in_settings(stand_in, images_token=token)
+    app = create_app(config, stand_in_transport(config), MemoryStore())
+    headers = {"Authorization": authorization} if authorization else {}
+    with TestClient(app) as client:
+        response = client.post(
+            "/images",
+            json={"url": f"http://{stand_in.address}/image"},
+            headers=headers,
+        )
+
+    assert response.status_code == 401
+    assert stand_in.requests == 0
@@ -0,0 +1,574 @@
+import asyncio
+import ipaddress
+import json
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from collections.abc import AsyncIterator, Callable, Coroutine
+from typing import Any
+
+import httpcore
+import httpx
+import pytest
+from litestar.stores.memory import MemoryStore
+from litestar.testing import TestClient
+
+from services.link_preview.app import create_app
+from services.link_preview.config import Settings
+from services.link_preview.fetcher import (
+    PreviewError,
+    PreviewFetcher,
+    PublicOnlyTransport,
+    Resolver,
+    build_client,
+    is_public,
+    normalize_url,
+    resolve_host,
+)
+from services.link_preview.parser import HeadParser, extract
+from services.link_preview.parsing import ParsePool
+
+pytestmark = pytest.mark.anyio
+
+PRODUCT_PAGE = """<!doctype html>
+<html><head>
+<meta charset="utf-8">
+<title>  Кофемолка
+  ручная | Магазин </title>
+<meta property="og:title" content="Кофемолка ручная">
+<meta property="og:image" content="/images/grinder.jpg">
+<meta property="product:price:amount" content="4 990,00">
+<meta property="product:price:currency" content="rub">
+</head>
+<body><script>{"huge": "inline state"}</script></body></html>
+"""
+
+JSON_LD_PAGE = """<html><head>
+<title>Ботинки</title>
+<meta name="twitter:title" content="Ботинки зимние">
+<script type="application/ld+json">
+{"@context": "https://schema.org", "@graph": [
+  {"@type": "BreadcrumbList"},
+  {"@type": ["Product"], "name": "Ботинки",
+   "image": [{"url": "https://cdn.shop.ru/boots.webp"}],
+   "offers": [{"@type": "Offer", "price": 12500, "priceCurrency": "EUR"}]}
+]}
+</script>
+</head><body></body></html>
+"""
+
+
+# DNS тестов: IP-адреса как есть, остальные имена — на публичный адрес
+HOSTS = {
+    "localhost": ["127.0.0.1", "::1"],
+    "intranet.shop.ru": ["10.0.0.7"],
+    "mixed.shop.ru": ["93.184.215.14", "192.168.1.1"],
+}
+
+
+async def resolve(host: str, port: int) -> list[str]:
+    try:
+        return [str(ipaddress.ip_address(host))]
+    except ValueError:
+        return HOSTS.get(host, ["93.184.215.14"])
+
+
+def parse(html: str, url: str = "https://shop.ru/item/1") -> dict[str, str]:
+    parser = HeadParser()
+    parser.feed(html)
+    return extract(parser, url).__dict__
+
+
+class StuckExecutor(Executor):
+    def __init__(self, error: Exception | None = None) -> None:
+        self.error = error
+        self.submitted = 0
+
+    def submit(self, fn: Any, /, *args: Any, **kwargs: Any) -> Future[Any]:
+        self.submitted += 1
+        future: Future[Any] = Future()
+        if self.error:
+            future.set_exception(self.error)
+        return future
+
+
+class ChunkedBody(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[bytes]) -> None:
+        self.chunks = chunks
+        self.sent = 0
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for chunk in self.chunks:
+            self.sent += 1
+            yield chunk
+
+
+def fetcher_for(
+    handler: Callable[[httpx.Request], httpx.Response]
+    | Callable[[httpx.Request], Coroutine[Any, Any, httpx.Response]],
+    **settings: Any,
+) -> PreviewFetcher:
+    config = Settings(**settings)
+    client = build_client(config, httpx.MockTransport(handler))
+    return PreviewFetcher(client, config)
+
+
+class RecordingBackend(httpcore.AsyncMockBackend):
+    # отвечает заготовленными байтами и запоминает, куда подключались
+    def __init__(self, *responses: bytes) -> None:
+        super().__init__(list(responses))
+        self.connected: list[str] = []
+
+    async def connect_tcp(
+        self, host: str, port: int, *args: Any, **kwargs: Any
+    ) -> httpcore.AsyncNetworkStream:
+        self.connected.append(host)
+        return await super().connect_tcp(host, port, *args, **kwargs)
+
+
+def guarded_fetcher(
+    backend: RecordingBackend, resolve: Resolver = resolve
+) -> PreviewFetcher:
+    config = Settings()
+    transport = PublicOnlyTransport(config, resolve, backend)
+    return PreviewFetcher(build_client(config, transport), config)
+
+
+def raw_response(status: str, headers: str = "", body: str = "") -> bytes:
+    content = body.encode()
+    return (
+        f"HTTP/1.1 {status}\r\n{headers}Content-Type: text/html; charset=utf-8\r\n"
+        f"Content-Length: {len(content)}\r\n\r\n"
+    ).encode() + content
+
+
+# PARSER
+
+
+def test_parser_open_graph() -> None:
+    assert parse(PRODUCT_PAGE) == {
+        "url": "https://shop.ru/item/1",
+        "title": "Кофемолка ручная",
+        "image": "https://shop.ru/images/grinder.jpg",
+        "price": "4990.00",
+        "currency": "RUB",
+    }
+
+
+def test_parser_json_ld_and_twitter() -> None:
+    assert parse(JSON_LD_PAGE) == {
+        "url": "https://shop.ru/item/1",
+        "title": "Ботинки зимние",
+        "image": "https://cdn.shop.ru/boots.webp",
+        "price": "12500",
+        "currency": "EUR",
+    }
+
+
+def test_parser_falls_back_to_title() -> None:
+    preview = parse("<html><head><title>Просто &amp; страница</title></head>")
+    assert preview["title"] == "Просто & страница"
+    assert preview["image"] == preview["price"] == ""
+
+
+def test_parser_ignores_body() -> None:
+    parser = HeadParser()
+    parser.feed('<head></head><body><meta property="og:title" content="Нет">')
+    assert parser.done
+    assert parser.meta == {}
+
+
+# FETCHER
+
+
+@pytest.mark.parametrize(
+    "url, normalized",
+    [
+        ("HTTPS://Shop.RU:443/item/1#reviews", "https://shop.ru/item/1"),
+        (
+            "https://shop.ru/item?id=1&utm_source=tg&UTM_medium=x&fbclid=abc&color=red",
+            "https://shop.ru/item?id=1&color=red",
+        ),
+        (
+            "http://shop.ru:8080?q=%D1%87%D0%B0%D0%B9",
+            "http://shop.ru:8080/?q=%D1%87%D0%B0%D0%B9",
+        ),
+        ("http://[::1]:80/a", "http://[::1]/a"),
+    ],
+)
+def test_normalize_url(url: str, normalized: str) -> None:
+    assert normalize_url(url) == normalized
+
+
+@pytest.mark.parametrize(
+    "url", ["shop.ru/item", "ftp://shop.ru/", "https://shop.ru:99999/"]
+)
+def test_normalize_url_rejects(url: str) -> None:
+    with pytest.raises(PreviewError):
+        normalize_url(url)
+
+
+async def test_fetch_stops_reading_after_head() -> None:
+    body = ChunkedBody(
+        [PRODUCT_PAGE.encode()[:200], PRODUCT_PAGE.encode()[200:]]
+        + [b"<div>" * 1000] * 50
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"content-type": "text/html"}, stream=body)
+
+    fetcher = fetcher_for(handler)
+    preview = await fetcher.fetch("https://shop.ru/item/1")
+
+    assert preview.title == "Кофемолка ручная"
+    assert body.sent == 2
+
+
+async def test_fetch_decodes_meta_charset() -> None:
+    html = '<head><meta charset="windows-1251"><title>Чайник</title></head>'
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200, headers={"content-type": "text/html"}, content=html.encode("cp1251")
+        )
+
+    preview = await fetcher_for(handler).fetch("https://shop.ru/")
+    assert preview.title == "Чайник"
+
+
+async def test_fetch_per_host_limit() -> None:
+    running: dict[str, int] = {}
+    peak: dict[str, int] = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        running[host] = running.get(host, 0) + 1
+        peak[host] = max(peak.get(host, 0), running[host])
+        await asyncio.sleep(0.01)
+        running[host] -= 1
+        return httpx.Response(200, html="<head></head>")
+
+    fetcher = fetcher_for(handler, per_host_limit=2)
+    await asyncio.gather(
+        *(
+            fetcher.fetch(f"https://{host}/{n}")
+            for host in ("a.ru", "b.ru")
+            for n in range(6)
+        )
+    )
+
+    assert peak == {"a.ru": 2, "b.ru": 2}
+    assert fetcher.hosts._slots == {}
+
+
+async def test_fetch_global_limit() -> None:
+    running = peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return httpx.Response(200, html="<head></head>")
+
+    fetcher = fetcher_for(handler, max_concurrent_fetches=3)
+    await asyncio.gather(*(fetcher.fetch(f"https://shop{n}.ru/") for n in range(10)))
+
+    assert peak == 3
+
+
+@pytest.mark.parametrize(
+    "url, response, status_code",
+    [
+        ("ftp://shop.ru/file", None, 400),
+        ("https://shop.ru/gone", httpx.Response(404), 502),
+        (
+            "https://shop.ru/photo.jpg",
+            httpx.Response(200, headers={"content-type": "image/jpeg"}),
+            422,
+        ),
+    ],
+)
+async def test_fetch_errors(
+    url: str, response: httpx.Response | None, status_code: int
+) -> None:
+    fetcher = fetcher_for(lambda request: response or httpx.Response(200))
+    with pytest.raises(PreviewError) as error:
+        await fetcher.fetch(url)
+    assert error.value.status_code == status_code
+
+
+BROKEN_PAGE = b"<html><head><![foo bar"
+
+
+async def test_fetch_unparseable_page() -> None:
+    # HTMLParser отвечает на такую разметку AssertionError
+    fetcher = fetcher_for(
+        lambda request: httpx.Response(200, html=BROKEN_PAGE.decode())
+    )
+    with pytest.raises(PreviewError) as error:
+        await fetcher.fetch("https://shop.ru/")
+    assert error.value.status_code == 502
+
+
+async def test_fetch_timeout() -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1)
+        return httpx.Response(200)
+
+    fetcher = fetcher_for(handler, total_timeout=0.05)
+    with pytest.raises(PreviewError) as error:
+        await fetcher.fetch("https://slow.ru/")
+    assert error.value.status_code == 504
+
+
+@pytest.mark.parametrize(
+    "address, public",
+    [
+        ("93.184.215.14", True),
+        ("2a00:1450:4010:c02::64", True),
+        ("127.0.0.1", False),
+        ("10.1.2.3", False),
+        ("172.16.0.1", False),
+        ("192.168.0.10", False),
+        ("169.254.169.254", False),
+        ("100.64.0.1", False),
+        ("0.0.0.0", False),
+        ("::1", False),
+        ("fe80::1%eth0", False),
+        ("fd00::1", False),
+        ("::ffff:127.0.0.1", False),
+    ],
+)
+def test_is_public(address: str, public: bool) -> None:
+    assert is_public(address) is public
+
+
+async def test_resolve_host_localhost() -> None:
+    addresses = await resolve_host("localhost", 80)
+    assert addresses
+    assert not any(map(is_public, addresses))
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://127.0.0.1:6379/",
+        "http://localhost:9000/media/",
+        "http://10.0.0.1/",
+        "http://192.168.0.10/admin",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://[::1]/",
+        "http://[fe80::1]/",
+        "http://[::ffff:127.0.0.1]/",
+        "http://intranet.shop.ru/",
+        # хотя бы один внутренний адрес среди записей — отказ
+        "http://mixed.shop.ru/",
+    ],
+)
+async def test_fetch_rejects_internal_address(url: str) -> None:
+    backend = RecordingBackend(raw_response("200 OK", body=PRODUCT_PAGE))
+
+    with pytest.raises(PreviewError) as error:
+        await guarded_fetcher(backend).fetch(url)
+    assert error.value.status_code == 400
+    assert backend.connected == []
+
+
+@pytest.mark.parametrize(
+    "location", ["http://169.254.169.254/latest/", "http://intranet.shop.ru/"]
+)
+async def test_fetch_rejects_redirect_to_internal_address(location: str) -> None:
+    backend = RecordingBackend(
+        raw_response("302 Found", f"Location: {location}\r\n"),
+        raw_response("200 OK", body=PRODUCT_PAGE),
+    )
+
+    with pytest.raises(PreviewError) as error:
+        await guarded_fetcher(backend).fetch("http://shop.ru/go")
+    assert error.value.status_code == 400
+    assert backend.connected == ["93.184.215.14"]
+
+
+async def test_fetch_connects_to_checked_address() -> None:
+    # DNS rebinding: первый ответ публичный, следующий — loopback.
+    # Имя разрешается один раз, соединение идет на проверенный адрес
+    answers = iter([["93.184.215.14"], ["127.0.0.1"]])
+
+    async def rebinding(host: str, port: int) -> list[str]:
+        return next(answers)
+
+    backend = RecordingBackend(raw_response("200 OK", body=PRODUCT_PAGE))
+    preview = await guarded_fetcher(backend, rebinding).fetch("http://shop.ru/item/1")
+
+    assert preview.title == "Кофемолка ручная"
+    assert preview.url == "http://shop.ru/item/1"
+    assert backend.connected == ["93.184.215.14"]
+
+
+# PARSE POOL
+
+HEAVY_PAGE = PRODUCT_PAGE.replace(
+    "</head>", '<link rel="preload" href="/static/chunk.js">' * 2000 + "</head>"
+).encode()
+
+
+async def test_parse_pool_parses_heavy_page_in_process() -> None:
+    pool = ParsePool(Settings(parse_workers=1, parse_timeout=30))
+    try:
+        preview = await pool.parse(HEAVY_PAGE, None, "https://shop.ru/item/1")
+    finally:
+        pool.shutdown()
+    assert preview.title == "Кофемолка ручная"
+    assert preview.price == "4990.00"
+
+
+BROKEN_HEAVY_PAGE = BROKEN_PAGE.replace(
+    b"<![", b'<link rel="preload" href="/static/chunk.js">' * 2000 + b"<!["
+)
+
+
+async def test_parse_pool_unparseable_page() -> None:
+    pool = ParsePool(Settings(parse_workers=1, parse_timeout=30))
+    try:
+        with pytest.raises(PreviewError) as error:
+            await pool.parse(BROKEN_HEAVY_PAGE, None, "https://shop.ru/")
+    finally:
+        pool.shutdown()
+    assert error.value.status_code == 502
+
+
+async def test_parse_pool_small_page_stays_inline() -> None:
+    executor = StuckExecutor()
+    pool = ParsePool(Settings(), executor)
+    preview = await pool.parse(PRODUCT_PAGE.encode(), None, "https://shop.ru/")
+    assert preview.title == "Кофемолка ручная"
+    assert executor.submitted == 0
+
+
+async def test_parse_pool_timeout_frees_worker() -> None:
+    # такой <head> разбирается секунды — дольше parse_timeout
+    slow_page = PRODUCT_PAGE.replace(
+        "</head>", '<link rel="preload" href="/static/chunk.js">' * 300_000 + "</head>"
+    ).encode()
+    pool = ParsePool(Settings(parse_workers=1, parse_timeout=0.5))
+    try:
+        # процесс воркера запускается при первой задаче: запускаем заранее
+        pool.executor.submit(int).result()
+        stuck = pool.executor
+        [worker] = getattr(stuck, "_processes").values()
+
+        with pytest.raises(PreviewError) as error:
+            await pool.parse(slow_page, None, "https://shop.ru/")
+        assert error.value.status_code == 504
+
+        # воркер убит сразу, а не когда дочитает документ
+        worker.join(timeout=1)
+        assert not worker.is_alive()
+        assert pool.executor is not stuck
+
+        pool.executor.submit(int).result()
+        preview = await pool.parse(HEAVY_PAGE, None, "https://shop.ru/")
+        assert preview.title == "Кофемолка ручная"
+    finally:
+        pool.shutdown()
+
+
+async def test_parse_pool_timeout_in_queue_keeps_executor() -> None:
+    executor = StuckExecutor()
+    pool = ParsePool(Settings(parse_timeout=0.05), executor)
+    with pytest.raises(PreviewError) as error:
+        await pool.parse(HEAVY_PAGE, None, "https://shop.ru/")
+    assert error.value.status_code == 504
+    # документ не успел попасть к воркеру: пул исправен и остается
+    assert pool.executor is executor
+
+
+async def test_parse_pool_replaces_broken_executor() -> None:
+    broken = StuckExecutor(BrokenProcessPool())
+    pool = ParsePool(Settings(parse_workers=1), broken)
+    try:
+        with pytest.raises(PreviewError):
+            await pool.parse(HEAVY_PAGE, None, "https://shop.ru/")
+        assert pool.executor is not broken
+    finally:
+        pool.shutdown()
+
+
+# ENDPOINT
+
+
+def test_preview_endpoint() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/old":
+            return httpx.Response(301, headers={"location": "/item/1"})
+        if request.url.path == "/broken":
+            return httpx.Response(200, html=BROKEN_PAGE.decode())
+        return httpx.Response(200, html=PRODUCT_PAGE)
+
+    app = create_app(transport=httpx.MockTransport(handler), store=MemoryStore())
+    with TestClient(app) as client:
+        response = client.get("/preview", params={"url": "https://shop.ru/old"})
+        failed = client.get("/preview", params={"url": "shop.ru"})
+        broken = client.get("/preview", params={"url": "https://shop.ru/broken"})
+        metrics = client.get("/metrics").json()
+
+    assert response.status_code == 200
+    assert response.json()["url"] == "https://shop.ru/item/1"
+    assert response.json()["price"] == "4990.00"
+    assert failed.status_code == 400
+    assert broken.status_code == 502
+    assert metrics == {
+        "preview_flights": 2,
+        "preview_coalesced": 0,
+        "preview_coalescing_ratio": 0.0,
+    }
+
+
+# BATCH
+
+
+def test_preview_batch_streams_in_completion_order() -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "slow.ru":
+            await asyncio.sleep(0.2)
+        if request.url.path == "/gone":
+            return httpx.Response(404)
+        return httpx.Response(
+            200, html=f"<head><title>{request.url.host}</title></head>"
+        )
+
+    urls = [
+        "https://slow.ru/",
+        "https://fast.ru/",
+        " https://fast.ru/",
+        "https://fast.ru/gone",
+        "not a url",
+    ]
+    app = create_app(transport=httpx.MockTransport(handler), store=MemoryStore())
+    with TestClient(app) as client:
+        response = client.post("/previews", json={"urls": urls})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 4
+    assert lines[-1]["url"] == "https://slow.ru/"
+    results = {line["url"]: line for line in lines}
+    assert results["https://fast.ru/"]["preview"]["title"] == "fast.ru"
+    assert results["https://fast.ru/gone"]["status_code"] == 502
+    assert results["not a url"]["status_code"] == 400
+
+
+def test_preview_batch_limit() -> None:
+    app = create_app(
+        config=Settings(batch_max_urls=2),
+        transport=httpx.MockTransport(lambda request: httpx.Response(200)),
+        store=MemoryStore(),
+    )
+    with TestClient(app) as client:
+        response = client.post(
+            "/previews", json={"urls": [f"https://shop.ru/{n}" for n in range(3)]}
+        )
+
+    assert response.status_code == 400